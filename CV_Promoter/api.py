@@ -0,0 +1,398 @@
+import contextvars
+import hashlib
+import os
+import queue
+import threading
+import zipfile
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+import typer
+import uvicorn
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from CV_Promoter.cv_cache import CVStore, parsed_cv_cache
+from CV_Promoter.cv_diff import CVDiff
+from CV_Promoter.cv_parsing import ParsedCV
+from CV_Promoter.docx_render import render_docx
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.handler_cache import search_handler_cache
+from CV_Promoter.jobs import Job, get_job_queue
+from CV_Promoter.response_cache import get_response_cache
+from CV_Promoter.runner import WORKFLOWS, WorkflowRequest, build_workflow
+from CV_Promoter.workflows import FormFiller
+from CV_Promoter_config import api_config, config, instructions_config
+from CV_Promoter_config.config import logger
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Header carrying the id of the job a streamed draft is stored under
+JOB_ID_HEADER = "X-Job-Id"
+# Number of focus areas each workflow accepts
+FOCUS_LIMITS = {
+    "AnnualReviewDrafter": (1, len(instructions_config.section_instructions)),
+    "NarrativePortfolioDrafter": (1, 1),
+    "RecommendationLetterDrafter": (1, 2),
+}
+
+_STREAM_END = object()
+
+
+class CVUpload(BaseModel):
+    """
+    An uploaded CV: the hash drafts refer to it by, its paragraph count and, for a revision of an earlier
+    upload, a summary of the sections that changed.
+    """
+
+    cv_hash: str
+    paragraphs: int
+    changes: Optional[str] = None
+
+
+class DraftRequest(BaseModel):
+    """
+    A draft to prepare: the workflow, its focus areas, the faculty member's start date and the uploaded CV.
+    With `use_cache` false, a fresh draft is generated even if the same request was drafted before.
+    """
+
+    workflow: str
+    focus: List[str]
+    start_date: date = Field(default_factory=date.today)
+    cv_hash: str
+    use_cache: bool = True
+
+
+class JobStatus(BaseModel):
+    """
+    The state of a draft, as returned by the job endpoints.
+    """
+
+    id: str
+    workflow: str
+    focus: List[str]
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: Job) -> "JobStatus":
+        """
+        This function describes a job of the job store.
+        """
+        return cls(
+            id=job.id,
+            workflow=job.workflow,
+            focus=job.focus,
+            status=job.status,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            error=job.error,
+        )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The function `lifespan` prepares a worker process of the API: uploads are shared with the other workers
+    through the CV store, and the job queue is started, which fails the jobs of workers that exited.
+    """
+    cv_store = CVStore()
+    purged = cv_store.purge_expired()
+    parsed_cv_cache.store = cv_store
+    get_job_queue()
+    logger.info(f"API worker {os.getpid()} started ({purged} expired CVs deleted)")
+    yield
+
+
+app = FastAPI(
+    title="CV Promoter",
+    description="Draft annual review forms, narrative portfolios and recommendation letters from a CV.",
+    lifespan=lifespan,
+)
+
+
+def chat_context(
+    x_llm_provider: str = Header(..., description="Azure, OpenAI or Offline."),
+    x_llm_api_key: Optional[str] = Header(None),
+    x_llm_deployment: Optional[str] = Header(None),
+) -> ExecutionContext:
+    """
+    The function `chat_context` builds the execution context of a request from the chat model its headers
+    name. Users bring their own key, which is passed to the chat client of their requests only. Cached
+    responses are scoped to a fingerprint of the provider and key, so a draft made with one key is never
+    served to a request made with another. The offline model is only accepted when `ENABLE_OFFLINE` is set.
+
+    Args:
+      x_llm_provider (str): The provider of the chat model.
+      x_llm_api_key (Optional[str]): The user's API key, not needed for the offline model.
+      x_llm_deployment (Optional[str]): The Azure deployment or OpenAI model, by default the configured one.
+
+    Returns:
+      The execution context.
+    """
+    if x_llm_provider == "Offline" and not api_config.ENABLE_OFFLINE:
+        raise HTTPException(status_code=400, detail="The offline model is not enabled on this server.")
+    if x_llm_provider != "Offline" and not x_llm_api_key:
+        raise HTTPException(status_code=401, detail=f"An API key is required for {x_llm_provider}.")
+    try:
+        chat_config = api_config.get_chat_config(x_llm_provider, x_llm_api_key, x_llm_deployment)
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error)) from None
+    cache_scope = hashlib.sha256(f"{x_llm_provider}\n{x_llm_api_key or ''}".encode("utf-8")).hexdigest()
+    return ExecutionContext(chat_config, cache_scope=cache_scope)
+
+
+def draft_context(draft: DraftRequest, context: ExecutionContext = Depends(chat_context)) -> ExecutionContext:
+    """
+    The function `draft_context` is the execution context of a draft: that of its chat model, reusing
+    earlier drafts only if the request's `use_cache` allows it.
+
+    Args:
+      draft (DraftRequest): The draft requested.
+      context (ExecutionContext): The context of the chat model the request's headers name.
+
+    Returns:
+      The execution context.
+    """
+    context.use_cache = draft.use_cache
+    return context
+
+
+def _load_cv(cv_hash: str) -> ParsedCV:
+    """
+    This function returns an uploaded CV, from this worker's cache or from the CV store.
+    """
+    parsed_cv = parsed_cv_cache.load_hash(cv_hash)
+    if parsed_cv is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired CV. Please upload it again.")
+    return parsed_cv
+
+
+def _check_request(draft: DraftRequest):
+    """
+    This function rejects drafts of unknown workflows or focus areas.
+    """
+    if draft.workflow not in WORKFLOWS:
+        detail = f"Unknown workflow; expected one of {', '.join(WORKFLOWS)}."
+        raise HTTPException(status_code=422, detail=detail)
+    focus_areas = workflow_focus_areas()[draft.workflow]
+    unknown = [focus for focus in draft.focus if focus not in focus_areas]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown focus areas for {draft.workflow}: {unknown}.")
+    fewest, most = FOCUS_LIMITS[draft.workflow]
+    if not fewest <= len(draft.focus) <= most:
+        expected = str(most) if fewest == most else f"{fewest} to {most}"
+        raise HTTPException(status_code=422, detail=f"{draft.workflow} takes {expected} focus area(s).")
+
+
+def _job_or_404(job_id: str) -> Job:
+    """
+    This function returns a job of the job store, failing with 404 if it does not exist or has expired.
+    """
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
+
+@app.get("/health")
+def health() -> Dict:
+    """
+    Report that this worker is up, with its process id and the hit rates of its caches.
+    """
+    return {
+        "status": "ok",
+        "pid": os.getpid(),
+        "parsed_cv_hit_rate": parsed_cv_cache.hit_rate,
+        "response_cache_hit_rate": get_response_cache().hit_rate,
+    }
+
+
+@app.get("/workflows")
+def workflow_focus_areas() -> Dict[str, List[str]]:
+    """
+    List the focus areas of every workflow.
+    """
+    return {
+        "AnnualReviewDrafter": list(instructions_config.section_instructions),
+        "NarrativePortfolioDrafter": list(instructions_config.narrative_instructions),
+        "RecommendationLetterDrafter": list(instructions_config.narrative_instructions),
+    }
+
+
+@app.post("/cvs", response_model=CVUpload, status_code=201)
+async def upload_cv(request: Request, previous_cv_hash: Optional[str] = None) -> CVUpload:
+    """
+    Upload a CV as the raw bytes of a .docx file. The CV is parsed once and stored for every worker. Pass
+    the hash of the previous upload to learn which sections a revision changed and to release the state
+    built for it.
+    """
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="The request body must be a .docx file.")
+    if len(data) > config.MAX_CV_BYTES:
+        raise HTTPException(status_code=413, detail=f"CVs are limited to {config.MAX_CV_BYTES} bytes.")
+    return await run_in_threadpool(_parse_upload, data, previous_cv_hash)
+
+
+def _parse_upload(data: bytes, previous_cv_hash: Optional[str]) -> CVUpload:
+    """
+    This function parses and stores an uploaded CV and compares it with the previous upload, whose search
+    response handlers this worker then releases.
+    """
+    try:
+        parsed_cv = parsed_cv_cache.load(data)
+    except (zipfile.BadZipFile, KeyError):
+        raise HTTPException(status_code=400, detail="The file is not a Word document (.docx).") from None
+    changes = None
+    if previous_cv_hash and previous_cv_hash != parsed_cv.content_hash:
+        previous_cv = parsed_cv_cache.load_hash(previous_cv_hash)
+        if previous_cv is not None:
+            changes = CVDiff(previous_cv, parsed_cv).summary()
+        search_handler_cache.invalidate(previous_cv_hash)
+    return CVUpload(
+        cv_hash=parsed_cv.content_hash, paragraphs=len(parsed_cv.paragraph_texts), changes=changes
+    )
+
+
+@app.post("/jobs", response_model=JobStatus, status_code=202)
+def submit_job(draft: DraftRequest, context: ExecutionContext = Depends(draft_context)) -> JobStatus:
+    """
+    Queue a draft. Poll `GET /jobs/{job_id}` until it is done, then download it. Annual reviews of several
+    focus areas draft their sections concurrently.
+    """
+    _check_request(draft)
+    stored_cv = parsed_cv_cache.store.get(draft.cv_hash) if parsed_cv_cache.store is not None else None
+    if stored_cv is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired CV. Please upload it again.")
+    job_id = get_job_queue().submit(draft.workflow, draft.focus, draft.start_date, stored_cv.docx, context)
+    return JobStatus.from_job(_job_or_404(job_id))
+
+
+@app.post("/drafts/stream")
+def stream_draft(
+    draft: DraftRequest, context: ExecutionContext = Depends(draft_context)
+) -> StreamingResponse:
+    """
+    Draft and stream the text as it is generated. The draft is stored as a job, whose id is in the X-Job-Id
+    header, so its .docx can be downloaded once the stream ends; it is completed even if the client
+    disconnects. Annual reviews of several focus areas cannot be streamed.
+    """
+    _check_request(draft)
+    parsed_cv = _load_cv(draft.cv_hash)
+    workflow = build_workflow(draft.workflow, draft.focus, draft.start_date, parsed_cv, context)
+    if not isinstance(workflow, FormFiller):
+        raise HTTPException(status_code=422, detail="Submit annual reviews of several areas as a job.")
+    store = get_job_queue().store
+    request = WorkflowRequest(draft.workflow, tuple(draft.focus), draft.start_date, b"")
+    job_id = store.create(request, parsed_cv.content_hash)
+    return StreamingResponse(
+        _stream_job(job_id, workflow), media_type="text/markdown", headers={JOB_ID_HEADER: job_id}
+    )
+
+
+def _stream_job(job_id: str, workflow: FormFiller) -> Iterator[str]:
+    """
+    This function runs a streamed draft on a thread of its own and relays its chunks. The chat model's
+    stream stays on one thread, in one context, however the server iterates the response, and the draft is
+    stored when it ends whether or not the client is still reading.
+
+    Args:
+      job_id (str): The job the draft is stored under.
+      workflow (FormFiller): The workflow to stream.
+
+    Returns:
+      An iterator over the text chunks of the draft.
+    """
+    store = get_job_queue().store
+    chunks = queue.Queue()
+
+    def draft():
+        store.start(job_id)
+        try:
+            for chunk in workflow.stream():
+                chunks.put(chunk)
+            docx_data = render_docx(workflow.generated_text, type(workflow).__name__, workflow.run_id)
+            store.complete(job_id, workflow.generated_text, docx_data)
+            logger.info(f"Job {job_id} done")
+        except Exception as error:
+            logger.exception(f"Job {job_id} failed")
+            store.fail(job_id, repr(error))
+        finally:
+            chunks.put(_STREAM_END)
+
+    threading.Thread(
+        target=contextvars.copy_context().run,
+        args=(draft,),
+        name=f"cv-promoter-stream-{job_id[:8]}",
+        daemon=True,
+    ).start()
+    while True:
+        chunk = chunks.get()
+        if chunk is _STREAM_END:
+            return
+        yield chunk
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+def job_status(job_id: str) -> JobStatus:
+    """
+    Report the state of a draft: queued, running, done or failed.
+    """
+    return JobStatus.from_job(_job_or_404(job_id))
+
+
+@app.get("/jobs/{job_id}/markdown")
+def job_markdown(job_id: str) -> Response:
+    """
+    Download a finished draft as markdown.
+    """
+    _job_or_404(job_id)
+    markdown = get_job_queue().store.markdown(job_id)
+    if markdown is None:
+        raise HTTPException(status_code=409, detail="The draft is not finished.")
+    return Response(markdown, media_type="text/markdown")
+
+
+@app.get("/jobs/{job_id}/docx")
+def job_docx(job_id: str) -> Response:
+    """
+    Download a finished draft as a Word document.
+    """
+    job = _job_or_404(job_id)
+    docx_data = get_job_queue().store.artifact(job_id)
+    if docx_data is None:
+        raise HTTPException(status_code=409, detail="The draft is not finished.")
+    file_name = f"DRAFT_{job.workflow}_{job_id[:8]}.docx"
+    headers = {"Content-Disposition": f'attachment; filename="{file_name}"'}
+    return Response(docx_data, media_type=DOCX_MIME, headers=headers)
+
+
+server = typer.Typer(help="Serve the CV Promoter HTTP API.")
+
+
+@server.command()
+def serve(
+    host: str = typer.Option(config.API_HOST, help="Interface to listen on."),
+    port: int = typer.Option(config.API_PORT, help="Port to listen on."),
+    workers: int = typer.Option(config.API_WORKERS, min=1, help="Worker processes."),
+):
+    """
+    Serve the API with several uvicorn worker processes. The workers share uploaded CVs, jobs and the
+    response cache through SQLite, and each admits its share of the configured LLM rate limits, so that
+    together they keep to them. Keys travel in request headers: keep the default localhost binding, or put
+    the API behind a TLS-terminating proxy, when serving other machines.
+    """
+    # Read by the worker processes' configuration, which they import afresh
+    os.environ["CV_PROMOTER_LLM_RATE_LIMIT_SHARES"] = str(workers)
+    uvicorn.run("CV_Promoter.api:app", host=host, port=port, workers=workers)
+
+
+if __name__ == "__main__":
+    server()
@@ -0,0 +1,239 @@
+import time
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+# Job states, as reported by the API
+DONE = "done"
+FAILED = "failed"
+JOB_ID_HEADER = "X-Job-Id"
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# Hosts an API key may be sent to over plain HTTP
+LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
+
+
+class APIError(Exception):
+    """
+    An error reported by the API, with its HTTP status and the reason it gave.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+class StreamedDraft:
+    """
+    A draft being streamed by the API. Iterating over it yields the text as it is generated; `job_id`
+    identifies the job the finished draft is stored under.
+    """
+
+    def __init__(self, job_id: str, response: httpx.Response):
+        self.job_id = job_id
+        self._response = response
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            yield from self._response.iter_text()
+        finally:
+            self._response.close()
+
+
+class APIClient:
+    """
+    The `APIClient` class is the client of the CV Promoter HTTP API (see `CV_Promoter/api.py`) used by the
+    Streamlit front end and the API load test. It holds the user's chat model provider and key, which are
+    sent with every draft request, and needs none of the drafting dependencies itself. Keys should only be
+    sent over HTTPS or to the local host; the client logs a warning otherwise.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        api_key: Optional[str] = None,
+        deployment: Optional[str] = None,
+        base_url: str = config.API_URL,
+        timeout: float = config.API_TIMEOUT_SECONDS,
+    ):
+        headers = {"X-LLM-Provider": provider}
+        if api_key:
+            headers["X-LLM-API-Key"] = api_key
+            url = httpx.URL(base_url)
+            if url.scheme != "https" and url.host not in LOCAL_HOSTS:
+                logger.warning(f"Sending API keys to {base_url} unencrypted; serve the API over HTTPS.")
+        if deployment:
+            headers["X-LLM-Deployment"] = deployment
+        self._client = httpx.Client(base_url=base_url, headers=headers, timeout=timeout)
+
+    @staticmethod
+    def _check(response: httpx.Response) -> httpx.Response:
+        """
+        This function raises an `APIError` for an error response.
+        """
+        if response.is_error:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise APIError(response.status_code, str(detail))
+        return response
+
+    def health(self) -> Dict:
+        """
+        This function checks that the API is up.
+
+        Returns:
+          The health report of the worker that answered.
+        """
+        return self._check(self._client.get("/health")).json()
+
+    def focus_areas(self) -> Dict[str, List[str]]:
+        """
+        This function lists the focus areas of every workflow.
+
+        Returns:
+          A dictionary mapping each workflow to its focus areas.
+        """
+        return self._check(self._client.get("/workflows")).json()
+
+    def upload_cv(self, data: bytes, previous_cv_hash: Optional[str] = None) -> Dict:
+        """
+        This function uploads a CV.
+
+        Args:
+          data (bytes): The .docx file.
+          previous_cv_hash (Optional[str]): The hash of the previous upload, to learn what a revision changed.
+
+        Returns:
+          The upload: the CV's hash, its paragraph count and the summary of changes, if any.
+        """
+        params = {"previous_cv_hash": previous_cv_hash} if previous_cv_hash else {}
+        response = self._client.post("/cvs", content=data, params=params, headers={"Content-Type": DOCX_MIME})
+        return self._check(response).json()
+
+    @staticmethod
+    def _draft_request(
+        workflow: str, focus: List[str], start_date: date, cv_hash: str, use_cache: bool
+    ) -> Dict:
+        """
+        This function writes the body of a draft request.
+        """
+        return {
+            "workflow": workflow,
+            "focus": list(focus),
+            "start_date": start_date.isoformat(),
+            "cv_hash": cv_hash,
+            "use_cache": use_cache,
+        }
+
+    def submit(
+        self, workflow: str, focus: List[str], start_date: date, cv_hash: str, use_cache: bool = True
+    ) -> str:
+        """
+        This function queues a draft.
+
+        Args:
+          workflow (str): The workflow class name, such as "AnnualReviewDrafter".
+          focus (List[str]): The focus areas of the draft.
+          start_date (date): The faculty member's start date.
+          cv_hash (str): The hash of the uploaded CV.
+          use_cache (bool): Whether an earlier draft of the same request may be reused.
+
+        Returns:
+          The id of the job.
+        """
+        response = self._client.post(
+            "/jobs",
+            json=self._draft_request(workflow, focus, start_date, cv_hash, use_cache),
+        )
+        return self._check(response).json()["id"]
+
+    def stream(
+        self, workflow: str, focus: List[str], start_date: date, cv_hash: str, use_cache: bool = True
+    ) -> StreamedDraft:
+        """
+        This function starts a streamed draft. Takes the same arguments as `submit`.
+
+        Returns:
+          The streamed draft, to iterate over. Its job holds the finished draft once the stream ends.
+        """
+        request = self._client.build_request(
+            "POST",
+            "/drafts/stream",
+            json=self._draft_request(workflow, focus, start_date, cv_hash, use_cache),
+        )
+        response = self._client.send(request, stream=True)
+        if response.is_error:
+            response.read()
+            response.close()
+            self._check(response)
+        return StreamedDraft(response.headers[JOB_ID_HEADER], response)
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        """
+        This function returns the state of a job.
+
+        Args:
+          job_id (str): The id of the job.
+
+        Returns:
+          The job's state, or None if it does not exist or has expired.
+        """
+        response = self._client.get(f"/jobs/{job_id}")
+        if response.status_code == 404:
+            return None
+        return self._check(response).json()
+
+    def wait(self, job_id: str, poll_seconds: float = 1.0) -> Dict:
+        """
+        This function polls a job until it is done or failed.
+
+        Args:
+          job_id (str): The id of the job.
+          poll_seconds (float): The pause between polls.
+
+        Returns:
+          The final state of the job.
+        """
+        while True:
+            job = self.job(job_id)
+            if job is None:
+                raise APIError(404, "Unknown or expired job.")
+            if job["status"] in (DONE, FAILED):
+                return job
+            time.sleep(poll_seconds)
+
+    def docx(self, job_id: str) -> bytes:
+        """
+        This function downloads a finished draft as a Word document.
+
+        Args:
+          job_id (str): The id of the job.
+
+        Returns:
+          The .docx file.
+        """
+        return self._check(self._client.get(f"/jobs/{job_id}/docx")).content
+
+    def markdown(self, job_id: str) -> str:
+        """
+        This function downloads a finished draft as markdown.
+
+        Args:
+          job_id (str): The id of the job.
+
+        Returns:
+          The markdown of the draft.
+        """
+        return self._check(self._client.get(f"/jobs/{job_id}/markdown")).text
+
+    def close(self):
+        """
+        This function closes the client's connections.
+        """
+        self._client.close()
@@ -0,0 +1,247 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+from dateutil.relativedelta import relativedelta
+from llm_utils.login import AzureKeyHandler, OpenaiKeyHandler
+
+from CV_Promoter.cv_cache import load_parsed_cv
+from CV_Promoter.docx_render import render_docx
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.llm_scheduler import BATCH
+from CV_Promoter.runner import WORKFLOWS, build_workflow
+from CV_Promoter.workflows import AnnualReviewSectionsDrafter
+from CV_Promoter_config import api_config, instructions_config
+from CV_Promoter_config.config import logger
+
+app = typer.Typer(help="Draft promotion and review documents for a directory of CVs.")
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+class RequestPacer:
+    """
+    The `RequestPacer` class spaces out the start of workflow runs so that a batch stays under a
+    requests-per-minute limit no matter how many workers are running.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        This function blocks until the calling worker may start its next request.
+        """
+        with self._lock:
+            start = max(self._next_start, time.monotonic())
+            self._next_start = start + self.interval
+        time.sleep(max(0.0, start - time.monotonic()))
+
+
+class Manifest:
+    """
+    The `Manifest` class records the outcome of every job of a batch as one JSON line, so an interrupted
+    batch can be resumed by skipping the jobs that already completed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if path.exists():
+            with open(path) as manifest_file:
+                for line in manifest_file:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partially written line from an interrupted run
+                    if record.get("status") == "ok" and Path(record["output"]).exists():
+                        self.completed.add(record["job_key"])
+
+    def record(self, record: dict):
+        """
+        This function appends a job record to the manifest and flushes it to disk.
+
+        Args:
+          record (dict): The job record.
+        """
+        with self._lock, open(self.path, "a") as manifest_file:
+            manifest_file.write(json.dumps(record) + "\n")
+            manifest_file.flush()
+
+
+def get_chat_config(provider: str, api_key: Optional[str]):
+    """
+    The function `get_chat_config` validates an API key and returns the chat model for the provider, in
+    the same way the Home page does for interactive sessions.
+
+    Args:
+      provider (str): "Azure", "OpenAI", or "Offline" for the local stand-in model, which needs no key.
+      api_key (Optional[str]): The API key for the provider.
+
+    Returns:
+      The chat model.
+    """
+    if provider == "Offline":
+        return api_config.get_chat_config("Offline")
+    if not api_key:
+        raise typer.BadParameter("An API key is required for this provider.")
+    if provider == "Azure":
+        key_handler = AzureKeyHandler(api_config.get_chat_config("Azure", api_key))
+        initialized = key_handler.initialize_api_key(api_key, api_config.AZURE_END_POINT)
+    elif provider == "OpenAI":
+        key_handler = OpenaiKeyHandler(api_config.get_chat_config("OpenAI", api_key))
+        initialized = key_handler.initialize_api_key(api_key, api_config.OPENAI_END_POINT)
+    else:
+        raise typer.BadParameter("Provider must be 'Azure', 'OpenAI' or 'Offline'.")
+
+    if not initialized:
+        raise typer.BadParameter("The API key was not accepted.")
+    return key_handler.get_chat_function()
+
+
+def draft_markdown(
+    workflow: str, focus: List[str], start_date: date, cv_document, context: ExecutionContext
+) -> str:
+    """
+    The function `draft_markdown` runs one workflow on one CV and returns the generated markdown.
+
+    Args:
+      workflow (str): The name of the workflow class.
+      focus (List[str]): The focus areas for the workflow.
+      start_date (date): The faculty member's start date, used by the portfolio and letter workflows.
+      cv_document: The parsed CV.
+      context (ExecutionContext): The execution context shared by the batch.
+
+    Returns:
+      The generated markdown.
+    """
+    drafter = build_workflow(workflow, focus, start_date, cv_document, context)
+    if isinstance(drafter, AnnualReviewSectionsDrafter):
+        return drafter.combine(drafter.process())
+    return drafter.process().content
+
+
+def _validate_focus(workflow: str, focus: List[str]) -> List[str]:
+    """
+    This function checks the focus areas against the workflow's instructions, defaulting to every annual
+    review section.
+
+    Args:
+      workflow (str): The name of the workflow class.
+      focus (List[str]): The requested focus areas.
+
+    Returns:
+      The validated focus areas.
+    """
+    if workflow == "AnnualReviewDrafter":
+        available, limits = instructions_config.section_instructions, (1, None)
+        focus = focus or list(available)
+    elif workflow == "NarrativePortfolioDrafter":
+        available, limits = instructions_config.narrative_instructions, (1, 1)
+    else:
+        available, limits = instructions_config.narrative_instructions, (1, 2)
+
+    unknown = [area for area in focus if area not in available]
+    if unknown:
+        raise typer.BadParameter(f"Unknown focus area(s) {unknown}; choose from {list(available)}.")
+    if len(focus) < limits[0] or (limits[1] is not None and len(focus) > limits[1]):
+        raise typer.BadParameter(f"{workflow} takes between {limits[0]} and {limits[1]} focus areas.")
+    return focus
+
+
+def _slug(text: str) -> str:
+    """
+    This function turns focus area names into a file name fragment.
+    """
+    return re.sub(r"[^A-Za-z0-9]+", "_", text).strip("_")
+
+
+@app.command()
+def batch(
+    cv_dir: Path = typer.Argument(..., exists=True, file_okay=False, help="Directory of .docx CVs."),
+    workflow: str = typer.Option(..., help=f"One of {', '.join(WORKFLOWS)}."),
+    output_dir: Path = typer.Option(Path("drafts"), help="Where drafts and the manifest are written."),
+    focus: Optional[List[str]] = typer.Option(
+        None, help="Focus area; repeat for several. Annual reviews default to every section."
+    ),
+    start_date: Optional[datetime] = typer.Option(
+        None, formats=["%Y-%m-%d"], help="Start date for portfolios and letters. Defaults to five years ago."
+    ),
+    provider: str = typer.Option("Azure", help="Azure, OpenAI, or Offline for the local stand-in model."),
+    api_key: Optional[str] = typer.Option(None, envvar="OPENAI_API_KEY", help="API key for the provider."),
+    max_workers: int = typer.Option(4, min=1, help="CVs processed concurrently."),
+    requests_per_minute: float = typer.Option(20, help="Upper bound on workflow runs started per minute."),
+):
+    """
+    Draft one document per CV in `cv_dir` with the chosen workflow. Outputs are written as .docx files next
+    to a JSONL manifest; rerunning the command skips CVs that already completed.
+    """
+    if workflow not in WORKFLOWS:
+        raise typer.BadParameter(f"Workflow must be one of {', '.join(WORKFLOWS)}.")
+    focus = _validate_focus(workflow, list(focus or []))
+    start_date = (start_date or datetime.now() - relativedelta(years=5)).date()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(Path(output_dir, MANIFEST_NAME))
+    # Batch calls yield to interactive sessions sharing the process-wide scheduler
+    context = ExecutionContext(get_chat_config(provider, api_key), priority=BATCH)
+    pacer = RequestPacer(requests_per_minute)
+
+    def run(cv_path: Path) -> dict:
+        output = Path(output_dir, f"{cv_path.stem}__{workflow}__{_slug('_'.join(focus))}.docx")
+        # Failures are keyed by path, as a CV that cannot be read has no content hash
+        job_fields = [workflow, ",".join(focus), start_date.isoformat()]
+        record = {"cv": str(cv_path), "job_key": "|".join([str(cv_path), *job_fields]), "workflow": workflow}
+        record.update({"focus": focus, "start_date": start_date.isoformat(), "output": str(output)})
+        job_start = time.perf_counter()
+        try:
+            parsed_cv = load_parsed_cv(cv_path.read_bytes())
+            record["job_key"] = "|".join([parsed_cv.content_hash, *job_fields])
+            if record["job_key"] in manifest.completed:
+                return dict(record, status="skipped")
+
+            pacer.wait()
+            job_start = time.perf_counter()
+            markdown = draft_markdown(workflow, focus, start_date, parsed_cv, context)
+            output.write_bytes(render_docx(markdown, workflow))
+            record["status"] = "ok"
+        except Exception as error:  # one failed CV must not stop the batch
+            logger.exception(f"Failed to draft {cv_path}")
+            record.update({"status": "error", "error": repr(error)})
+        record.update({"seconds": round(time.perf_counter() - job_start, 3), "finished_at": time.time()})
+        manifest.record(record)
+        return record
+
+    cv_paths = sorted(path for path in cv_dir.glob("*.docx") if not path.name.startswith("~$"))
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in as_completed([executor.submit(run, cv_path) for cv_path in cv_paths]):
+            record = future.result()
+            counts[record["status"]] += 1
+            typer.echo(f"[{record['status']}] {record['cv']}")
+
+    typer.echo(f"{counts['ok']} drafted, {counts['skipped']} already done, {counts['error']} failed.")
+    typer.echo(
+        f"{context.costs.requests} model calls, {context.costs.prompt_tokens} prompt tokens, "
+        f"{context.costs.completion_tokens} completion tokens, ${context.costs.total_cost:.2f}."
+    )
+    for deployment, metrics in context.scheduler.metrics().items():
+        typer.echo(
+            f"{deployment}: {metrics['retries']} retries, {metrics['rate_limited']} rate limited, "
+            f"{metrics['queue_wait_seconds']:.1f}s waiting for rate limits."
+        )
+    if counts["error"]:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
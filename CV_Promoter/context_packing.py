@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, NamedTuple, Optional
+
+from CV_Promoter.cv_parsing import CVParser
+from CV_Promoter_config import config
+
+DEFAULT_ENCODING = "cl100k_base"
+PARAGRAPH_SEPARATOR = "\n\n"
+
+
+class PackedContext(NamedTuple):
+    """
+    The CV context selected for a prompt, with the accounting needed to tune the token budget.
+    """
+
+    paragraphs: List[str]
+    tokens: int
+    candidates: int
+    duplicates: int
+    dropped: int
+
+
+class ContextPacker:
+    """
+    The `ContextPacker` class selects the CV paragraphs that go into a prompt under a token budget. It
+    removes paragraphs pulled in by more than one instruction, ranks the rest by section priority and then
+    by recency using the years the parser found in each paragraph, and fills the budget greedily. The
+    selected paragraphs are returned in extraction order so the context still reads like the CV.
+    """
+
+    def __init__(self, token_budget: int = config.CONTEXT_TOKEN_BUDGET, model_name: Optional[str] = None):
+        self.token_budget = token_budget
+        self.encoding = self._get_encoding(model_name)
+        self.separator_tokens = len(self.encoding.encode(PARAGRAPH_SEPARATOR))
+
+    @staticmethod
+    def _get_encoding(model_name: Optional[str]):
+        """
+        This function returns the tiktoken encoding for the model, falling back to `cl100k_base` for
+        unknown or missing model names.
+
+        Args:
+          model_name (Optional[str]): The name of the chat model.
+
+        Returns:
+          The tiktoken encoding.
+        """
+        # tiktoken is only imported once tokens are counted, keeping it out of the app's cold start
+        import tiktoken
+
+        if model_name:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        This function counts the tokens in `text`.
+
+        Args:
+          text (str): The text to count.
+
+        Returns:
+          The number of tokens.
+        """
+        return len(self.encoding.encode(text))
+
+    def pack(self, cv_parser: CVParser, instruction_sets: List[Dict]) -> PackedContext:
+        """
+        This function extracts and packs the context for one prompt.
+
+        Args:
+          cv_parser (CVParser): The parser for the CV.
+          instruction_sets (List[Dict]): Extraction instructions in priority order, such as the
+        instructions for the primary area of a letter followed by those for the secondary area.
+
+        Returns:
+          The packed context.
+        """
+        # Rank: section priority first, then the most recent year mentioned. Undated paragraphs (headers,
+        # statements of interest, ongoing roles) rank with the most recent ones.
+        paragraph_years = cv_parser.paragraph_years
+        # offset -> (priority, position in extraction order), keeping the first occurrence of duplicates
+        placements = {}
+        candidates = 0
+        for set_priority, instructions in enumerate(instruction_sets):
+            offsets = cv_parser.extract_offsets(instructions)
+            candidates += len(offsets)
+            for offset in offsets:
+                placements.setdefault(offset, (set_priority, len(placements)))
+
+        def rank(offset):
+            years = paragraph_years[offset]
+            priority, position = placements[offset]
+            return priority, -(max(years) if years else cv_parser.present_year), position
+
+        selected = []
+        tokens = 0
+        for offset in sorted(placements, key=rank):
+            paragraph_tokens = self.count_tokens(cv_parser.paragraph_texts[offset]) + self.separator_tokens
+            if tokens + paragraph_tokens > self.token_budget:
+                continue
+            selected.append(offset)
+            tokens += paragraph_tokens
+
+        selected.sort(key=lambda offset: placements[offset])
+        return PackedContext(
+            paragraphs=[cv_parser.paragraph_texts[offset] for offset in selected],
+            tokens=tokens,
+            candidates=candidates,
+            duplicates=candidates - len(placements),
+            dropped=len(placements) - len(selected),
+        )
+
+
+class PackedContextCache:
+    """
+    The `PackedContextCache` class is a bounded, thread-safe LRU cache of packed contexts keyed by the
+    context fingerprint from `CVParser.context_fingerprint`. When a user uploads a revised CV, prompts whose
+    sections did not change reuse their packed context instead of extracting and tokenizing it again.
+    """
+
+    def __init__(self, max_entries: int = config.PACKED_CONTEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[PackedContext]:
+        """
+        This function returns the packed context stored under `key`, marking it as most recently used.
+
+        Args:
+          key (Hashable): The context fingerprint with the packing settings.
+
+        Returns:
+          The packed context, or None if it is not cached.
+        """
+        with self._lock:
+            packed_context = self._entries.get(key)
+            if packed_context is not None:
+                self._entries.move_to_end(key)
+            return packed_context
+
+    def put(self, key: Hashable, packed_context: PackedContext):
+        """
+        This function stores a packed context, evicting the least recently used entry once the cache is full.
+
+        Args:
+          key (Hashable): The context fingerprint with the packing settings.
+          packed_context (PackedContext): The packed context.
+        """
+        with self._lock:
+            self._entries[key] = packed_context
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+# Shared by every session served by this process
+packed_context_cache = PackedContextCache()
@@ -0,0 +1,285 @@
+import hashlib
+import io
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+from docx import Document
+
+from CV_Promoter.cv_parsing import ParsedCV
+from CV_Promoter.instrumentation import tracer
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+
+class StoredCV(NamedTuple):
+    """
+    An uploaded CV as kept by the `CVStore`: the .docx file and its paragraph texts.
+    """
+
+    docx: bytes
+    paragraph_texts: List[str]
+
+
+class CVStore:
+    """
+    The `CVStore` class keeps uploaded CVs and their paragraph texts in SQLite, keyed by the content hash of
+    the file, so that the worker processes of the API share them. A CV uploaded to one worker is parsed
+    there once; any other worker asked to draft from it reads the stored paragraphs instead of parsing the
+    file again. CVs are deleted once they have not been used for `ttl_seconds`.
+    """
+
+    def __init__(self, path: Path = config.CV_STORE_PATH, ttl_seconds: int = config.CV_STORE_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS cvs (
+                    content_hash TEXT PRIMARY KEY,
+                    docx BLOB NOT NULL,
+                    paragraphs TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cvs_expires ON cvs (expires_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        This function opens a connection to the CV database for one transaction, committing on success
+        and closing it afterwards.
+
+        Returns:
+          An iterator yielding the open SQLite connection.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def put(self, content_hash: str, data: bytes, paragraph_texts: List[str]):
+        """
+        This function stores an uploaded CV, replacing any earlier copy and restarting its expiry period,
+        then deletes the CVs that have expired.
+
+        Args:
+          content_hash (str): The hash of the file.
+          data (bytes): The raw bytes of the .docx file.
+          paragraph_texts (List[str]): The paragraph texts parsed from it.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cvs (content_hash, docx, paragraphs, expires_at) VALUES (?, ?, ?, ?)",
+                (content_hash, data, json.dumps(paragraph_texts), now + self.ttl_seconds),
+            )
+            purged = connection.execute("DELETE FROM cvs WHERE expires_at < ?", (now,)).rowcount
+        if purged:
+            logger.info(f"CV store: {purged} expired CVs deleted")
+
+    def get(self, content_hash: str) -> Optional[StoredCV]:
+        """
+        This function returns a stored CV and restarts its expiry period.
+
+        Args:
+          content_hash (str): The hash of the file.
+
+        Returns:
+          The stored CV, or None if it was never uploaded or has expired.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT docx, paragraphs FROM cvs WHERE content_hash = ? AND expires_at >= ?",
+                (content_hash, now),
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE cvs SET expires_at = ? WHERE content_hash = ?",
+                    (now + self.ttl_seconds, content_hash),
+                )
+        return StoredCV(row[0], json.loads(row[1])) if row else None
+
+    def purge_expired(self) -> int:
+        """
+        This function deletes the CVs that have expired.
+
+        Returns:
+          The number of CVs deleted.
+        """
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM cvs WHERE expires_at < ?", (time.time(),)).rowcount
+
+
+class ParsedCVCache:
+    """
+    The `ParsedCVCache` class is a bounded, thread-safe LRU cache of `ParsedCV` objects keyed by the
+    SHA-256 hash of the uploaded file. Streamlit reruns the app script on every widget interaction, so
+    without it every click would unzip and parse the same .docx again. With a `CVStore`, CVs missing from
+    memory are looked up in the store, which other processes share, before they are parsed.
+    """
+
+    def __init__(self, max_entries: int = config.PARSED_CV_CACHE_SIZE, store: Optional[CVStore] = None):
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """
+        This function returns the key used for an uploaded file.
+
+        Args:
+          data (bytes): The raw bytes of the uploaded .docx file.
+
+        Returns:
+          The hexadecimal SHA-256 digest of the file.
+        """
+        return hashlib.sha256(data).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups served from the cache since it was created.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, content_hash: str) -> Optional[ParsedCV]:
+        """
+        This function returns the cached `ParsedCV` for `content_hash`, marking it as most recently used
+        and counting the lookup as a hit or a miss.
+
+        Args:
+          content_hash (str): The hash of the uploaded file.
+
+        Returns:
+          The cached `ParsedCV`, or None if it is not cached.
+        """
+        with self._lock:
+            parsed_cv = self._entries.get(content_hash)
+            if parsed_cv is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(content_hash)
+            return parsed_cv
+
+    def put(self, parsed_cv: ParsedCV):
+        """
+        This function stores `parsed_cv` under its content hash, evicting the least recently used entry
+        once the cache is full.
+
+        Args:
+          parsed_cv (ParsedCV): The parsed CV to store.
+        """
+        with self._lock:
+            self._entries[parsed_cv.content_hash] = parsed_cv
+            self._entries.move_to_end(parsed_cv.content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def load(self, data: bytes) -> ParsedCV:
+        """
+        This function returns the parsed form of an uploaded .docx file, parsing it only if it is neither
+        cached nor in the shared store. Parse time and the running hit rate are logged.
+
+        Args:
+          data (bytes): The raw bytes of the uploaded .docx file.
+
+        Returns:
+          The `ParsedCV` for the file.
+        """
+        content_hash = self.content_hash(data)
+        parsed_cv = self.get(content_hash)
+        if parsed_cv is not None:
+            logger.info(f"Parsed CV cache hit {content_hash[:12]} (hit rate {self.hit_rate:.0%})")
+            return parsed_cv
+        parsed_cv = self._load_stored(content_hash)
+        if parsed_cv is not None:
+            return parsed_cv
+
+        with tracer.span("docx_parse", "cv_upload", content_hash[:12], docx_bytes=len(data)) as span:
+            parsed_cv = parse_docx(data, content_hash)
+            span.set(paragraphs=len(parsed_cv.paragraph_texts))
+        self.put(parsed_cv)
+        if self.store is not None:
+            self.store.put(content_hash, data, parsed_cv.paragraph_texts)
+        logger.info(
+            f"Parsed CV {content_hash[:12]} with {len(parsed_cv.paragraph_texts)} paragraphs in "
+            f"{span.duration_ms / 1000:.3f}s (hit rate {self.hit_rate:.0%})"
+        )
+        return parsed_cv
+
+    def load_hash(self, content_hash: str) -> Optional[ParsedCV]:
+        """
+        This function returns the parsed form of a CV uploaded earlier, by its content hash.
+
+        Args:
+          content_hash (str): The hash of the uploaded file.
+
+        Returns:
+          The `ParsedCV`, or None if the CV is neither cached nor in the shared store.
+        """
+        return self.get(content_hash) or self._load_stored(content_hash)
+
+    def _load_stored(self, content_hash: str) -> Optional[ParsedCV]:
+        """
+        This function rebuilds a CV from the paragraphs in the shared store, if there is one, and caches it.
+        """
+        stored_cv = self.store.get(content_hash) if self.store is not None else None
+        if stored_cv is None:
+            return None
+        parsed_cv = ParsedCV(
+            stored_cv.paragraph_texts,
+            content_hash=content_hash,
+            document_loader=lambda: Document(io.BytesIO(stored_cv.docx)),
+        )
+        self.put(parsed_cv)
+        logger.info(f"Loaded CV {content_hash[:12]} from the shared store")
+        return parsed_cv
+
+
+def parse_docx(data: bytes, content_hash: str) -> ParsedCV:
+    """
+    The function `parse_docx` parses the raw bytes of a .docx file into a `ParsedCV`.
+
+    Args:
+      data (bytes): The raw bytes of the .docx file.
+      content_hash (str): The hash identifying the file.
+
+    Returns:
+      The parsed CV. Paragraphs are streamed out of the package; the python-docx `Document` is only
+    built if a consumer asks for it.
+    """
+    return ParsedCV.from_docx(data, content_hash, document_loader=lambda: Document(io.BytesIO(data)))
+
+
+# Shared by every session served by this process
+parsed_cv_cache = ParsedCVCache()
+
+
+def load_parsed_cv(data: bytes) -> ParsedCV:
+    """
+    The function `load_parsed_cv` returns the parsed form of an uploaded .docx file from the process-wide
+    cache.
+
+    Args:
+      data (bytes): The raw bytes of the uploaded .docx file.
+
+    Returns:
+      The `ParsedCV` for the file.
+    """
+    return parsed_cv_cache.load(data)
@@ -0,0 +1,141 @@
+from difflib import SequenceMatcher
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from CV_Promoter.cv_parsing import ParsedCV
+from CV_Promoter.cv_schema import get_cv_schema
+
+# Name of the paragraphs before the first known section header
+PREAMBLE = "(top of CV)"
+
+
+class SectionChange(NamedTuple):
+    """
+    How one section of a CV changed between two uploads.
+    """
+
+    section: str
+    added: int
+    removed: int
+
+
+def section_headers() -> List[str]:
+    """
+    The function `section_headers` lists every section header of the configured CV schema.
+
+    Returns:
+      The canonical headers, in the order the schema declares them.
+    """
+    return get_cv_schema().headers
+
+
+def split_sections(parsed_cv: ParsedCV, headers: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+    """
+    The function `split_sections` divides a CV at the first occurrence of each known header, the same
+    boundaries the extraction ranges use.
+
+    Args:
+      parsed_cv (ParsedCV): The CV.
+      headers (Iterable[str]): The section headers.
+
+    Returns:
+      A dictionary mapping each section found, in document order, to its half-open span of paragraph
+    offsets. Paragraphs before the first header form the `PREAMBLE` section.
+    """
+    starts = {}
+    for header in headers:
+        offset = parsed_cv.first_header_offset(header)
+        if offset is not None:
+            starts.setdefault(offset, header)
+    offsets = sorted(starts)
+    boundaries = [0] + offsets + [len(parsed_cv.paragraph_texts)]
+    names = [PREAMBLE] + [starts[offset] for offset in offsets]
+    return {name: (start, end) for name, start, end in zip(names, boundaries, boundaries[1:]) if end > start}
+
+
+class CVDiff:
+    """
+    The `CVDiff` class compares two uploads of a CV paragraph by paragraph. The CVs are divided into
+    sections at the headers of the CV schema and each section is hashed; only sections whose hashes differ
+    are diffed paragraph by paragraph. It tells the user what changed in a revised CV; the workflows
+    themselves decide what to regenerate from `CVParser.context_fingerprint`.
+    """
+
+    def __init__(self, previous: ParsedCV, current: ParsedCV, headers: Optional[Iterable[str]] = None):
+        headers = list(section_headers() if headers is None else headers)
+        self.previous = previous
+        self.current = current
+        previous_sections = split_sections(previous, headers)
+        current_sections = split_sections(current, headers)
+        removed_sections = [section for section in previous_sections if section not in current_sections]
+        self.changes: List[SectionChange] = []
+        for section in list(current_sections) + removed_sections:
+            previous_span, current_span = previous_sections.get(section), current_sections.get(section)
+            if self._hash(previous, previous_span) == self._hash(current, current_span):
+                continue
+            added, removed = self._count_changes(
+                self._texts(previous, previous_span), self._texts(current, current_span)
+            )
+            self.changes.append(SectionChange(section, added, removed))
+
+    @staticmethod
+    def _texts(parsed_cv: ParsedCV, span) -> List[str]:
+        """
+        This function returns the paragraph texts of a section, or no paragraphs for a missing section.
+        """
+        return parsed_cv.paragraph_texts[span[0] : span[1]] if span else []
+
+    @staticmethod
+    def _hash(parsed_cv: ParsedCV, span) -> str:
+        """
+        This function returns the content hash of a section, or an empty string for a missing section.
+        """
+        return parsed_cv.span_hash(*span) if span else ""
+
+    @staticmethod
+    def _count_changes(previous_texts: List[str], current_texts: List[str]) -> Tuple[int, int]:
+        """
+        This function counts the paragraphs added to and removed from a section. An edited paragraph counts
+        as one removed and one added.
+
+        Args:
+          previous_texts (List[str]): The paragraphs of the section in the previous upload.
+          current_texts (List[str]): The paragraphs of the section in the current upload.
+
+        Returns:
+          The number of added and of removed paragraphs.
+        """
+        added = removed = 0
+        matcher = SequenceMatcher(None, previous_texts, current_texts, autojunk=False)
+        for tag, previous_start, previous_end, current_start, current_end in matcher.get_opcodes():
+            if tag != "equal":
+                removed += previous_end - previous_start
+                added += current_end - current_start
+        return added, removed
+
+    @property
+    def changed_sections(self) -> List[str]:
+        """
+        The sections that differ between the two uploads, in document order.
+        """
+        return [change.section for change in self.changes]
+
+    @property
+    def unchanged(self) -> bool:
+        """
+        Whether the two uploads hold the same text.
+        """
+        return not self.changes
+
+    def summary(self) -> str:
+        """
+        This function describes the changes for the user.
+
+        Returns:
+          One sentence per changed section, or a note that nothing changed.
+        """
+        if self.unchanged:
+            return "The text of this CV is the same as the previous upload."
+        return " ".join(
+            f"{change.section}: {change.added} paragraphs added, {change.removed} removed."
+            for change in self.changes
+        )
@@ -0,0 +1,379 @@
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+from CV_Promoter.cv_schema import CVSchema, normalize_header
+from CV_Promoter_config import config
+
+# Kind of the entries of sections the schema gives no kind
+DEFAULT_KIND = "entry"
+# Status of the entries of publication sections that no subheading or marker describes
+PUBLISHED = "published"
+# Four digit numbers outside this range are page numbers, counts or identifiers rather than years
+EARLIEST_YEAR = 1900
+# Longer paragraphs are entries, never subheadings
+SUBHEADING_MAX_CHARS = 200
+
+_ONGOING = re.compile(r"\b(present|current)\b", re.IGNORECASE)
+# Pages of a citation, such as "pp. 1987-1993" or the "1987-1993" of "2019;12(3):1987-1993", whose numbers
+# are not publication years
+_PAGES = re.compile(r"(?:\bpp?\.\s*\d+(?:\s*[-–]\s*\d+)?|(?<=[\d)]):\s*\d+\s*[-–]\s*\d+)")
+_AMOUNT = re.compile(r"\$\s?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(k|m|mm|thousand|million)?\b", re.IGNORECASE)
+_AMOUNT_MULTIPLIERS = {"k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6}
+_LABELLED_ROLE = re.compile(r"\brole\s*[:\-]\s*([A-Za-z][\w\-/ ]*?)\s*(?=[,;.(]|\d|$)", re.IGNORECASE)
+_GRANT_ROLE = re.compile(
+    r"\b(Co-Principal Investigator|Principal Investigator|Co-Investigator|Multiple PI|Co-PI|MPI|Co-I|PI)\b"
+)
+
+
+class CVEntry:
+    """
+    One entry of a CV, such as a publication, grant or presentation: a non-empty paragraph under a section
+    header, with the facts downstream code filters and counts on parsed out of its text. `status` is the
+    publication status ("published", "in press", ...) of entries of publication sections, and `category`
+    whether an entry of a section the schema divides is "research" or "education"; both are None for other
+    entries.
+    """
+
+    __slots__ = (
+        "offset",
+        "section",
+        "kind",
+        "text",
+        "years",
+        "ongoing",
+        "role",
+        "amount",
+        "status",
+        "category",
+    )
+
+    def __init__(
+        self,
+        offset: int,
+        section: str,
+        kind: str,
+        text: str,
+        years: Tuple[int, ...],
+        ongoing: bool = False,
+        role: Optional[str] = None,
+        amount: Optional[float] = None,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+    ):
+        self.offset = offset
+        self.section = section
+        self.kind = kind
+        self.text = text
+        self.years = years
+        self.ongoing = ongoing
+        self.role = role
+        self.amount = amount
+        self.status = status
+        self.category = category
+
+    @property
+    def first_year(self) -> Optional[int]:
+        """
+        The earliest year the entry mentions, or None if it is undated.
+        """
+        return min(self.years) if self.years else None
+
+    @property
+    def last_year(self) -> Optional[int]:
+        """
+        The latest year the entry mentions, or None if it is undated. Ongoing entries are not extended to
+        the present here; `CVEntries` does that when it indexes them.
+        """
+        return max(self.years) if self.years else None
+
+    def __repr__(self) -> str:
+        return f"CVEntry({self.kind!r}, {self.section!r}, offset={self.offset}, years={self.years})"
+
+
+class CVEntries:
+    """
+    The `CVEntries` class holds the entries of a CV as typed records alongside array columns of their
+    section, kind and first and last year. Every section header and entry is found in one pass over the
+    paragraphs, which also indexes the entries by kind and by section. For each kind the entries are also
+    kept sorted by last year, so that "publications since 2019" or "grants active between 2023 and 2024"
+    are answered with a binary search followed by a scan of the matching entries only, and counts for the
+    review forms cost no tokens.
+    """
+
+    def __init__(self, parsed_cv, present_year: int, cv_schema: CVSchema):
+        self.present_year = present_year
+        latest_year = present_year + config.NIH_FUNDING_WINDOW
+        matcher = cv_schema.matcher
+        paragraph_years = parsed_cv.paragraph_years(present_year)
+
+        self.sections: List[str] = []
+        self.kinds: List[str] = []
+        self.entries: List[CVEntry] = []
+        self.section_ids = array("H")
+        self.kind_ids = array("B")
+        # 0 marks an undated entry
+        self.first_years = array("H")
+        self.last_years = array("H")
+        section_ids: Dict[str, int] = {}
+        kind_ids: Dict[str, int] = {}
+        kind_indices: Dict[str, List[int]] = {}
+        section_indices: Dict[str, List[int]] = {}
+
+        section = subheading_status = subheading_category = None
+        for offset, text in enumerate(parsed_cv.paragraph_texts):
+            header = matcher.match(text)
+            if header is not None:
+                section, subheading_status, subheading_category = header, None, None
+                continue
+            if section is None or not text.strip():
+                continue  # the preamble and blank paragraphs are not entries
+            has_status = section in cv_schema.status_sections
+            has_category = section in cv_schema.category_sections
+            if (has_status or has_category) and len(text) <= SUBHEADING_MAX_CHARS:
+                status = _subheading(text, cv_schema.status_subheadings) if has_status else None
+                if status is not None:
+                    subheading_status = status
+                    continue
+                category = _subheading(text, cv_schema.category_subheadings) if has_category else None
+                if category is not None:
+                    # A category groups its own status subheadings
+                    subheading_status, subheading_category = None, category
+                    continue
+            kind = cv_schema.entry_kinds.get(section, DEFAULT_KIND)
+            # Entries with a publication status are citations, whose page numbers can look like years
+            pages = citation_pages(text) if has_status else ()
+            years = tuple(
+                sorted(
+                    {
+                        year
+                        for year in paragraph_years[offset]
+                        if EARLIEST_YEAR <= year <= latest_year and year not in pages
+                    }
+                )
+            )
+            lowered = text.lower()
+            entry = CVEntry(
+                offset,
+                section,
+                kind,
+                text,
+                years,
+                ongoing=("present" in lowered or "current" in lowered) and _ONGOING.search(text) is not None,
+                role=parse_role(text, kind),
+                amount=parse_amount(text),
+                status=(
+                    parse_status(text, cv_schema.status_markers) or subheading_status or PUBLISHED
+                    if has_status
+                    else None
+                ),
+                category=(
+                    parse_tag(text, cv_schema.category_tags)
+                    or subheading_category
+                    or cv_schema.default_category
+                    if has_category
+                    else None
+                ),
+            )
+            kind_indices.setdefault(kind, []).append(len(self.entries))
+            section_indices.setdefault(section, []).append(len(self.entries))
+            self.entries.append(entry)
+            if section not in section_ids:
+                section_ids[section] = len(self.sections)
+                self.sections.append(section)
+            if kind not in kind_ids:
+                kind_ids[kind] = len(self.kinds)
+                self.kinds.append(kind)
+            self.section_ids.append(section_ids[section])
+            self.kind_ids.append(kind_ids[kind])
+            first_year = entry.first_year or (present_year if entry.ongoing else 0)
+            last_year = present_year if entry.ongoing else (entry.last_year or 0)
+            self.first_years.append(first_year)
+            self.last_years.append(max(first_year, last_year))
+
+        # Entry indices per kind and per section, in document order
+        self._kind_indices = {kind: array("I", indices) for kind, indices in kind_indices.items()}
+        self._section_indices = {section: array("I", indices) for section, indices in section_indices.items()}
+        self._by_last_year: Dict[str, Tuple[array, array]] = {}
+        for kind, indices in kind_indices.items():
+            indices.sort(key=self.last_years.__getitem__)
+            self._by_last_year[kind] = (
+                array("H", [self.last_years[index] for index in indices]),
+                array("I", indices),
+            )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def of_kind(self, kind: str) -> List[CVEntry]:
+        """
+        This function returns every entry of a kind.
+
+        Args:
+          kind (str): The entry kind, such as "publication" or "grant".
+
+        Returns:
+          The entries, in document order.
+        """
+        return [self.entries[index] for index in self._kind_indices.get(kind, ())]
+
+    def in_section(self, section: str) -> List[CVEntry]:
+        """
+        This function returns every entry under a section header.
+
+        Args:
+          section (str): The canonical section header.
+
+        Returns:
+          The entries, in document order.
+        """
+        return [self.entries[index] for index in self._section_indices.get(section, ())]
+
+    def since(self, kind: str, year: int) -> List[CVEntry]:
+        """
+        This function returns the entries of a kind that mention `year` or a later year, or are ongoing,
+        e.g. the publications since the start year.
+
+        Args:
+          kind (str): The entry kind.
+          year (int): The earliest year of interest.
+
+        Returns:
+          The entries, in document order.
+        """
+        return [self.entries[index] for index in self._since(kind, year)]
+
+    def active(self, kind: str, start_year: int, end_year: int) -> List[CVEntry]:
+        """
+        This function returns the entries of a kind whose span of years overlaps a window, e.g. the grants
+        active during the review period. An ongoing entry runs up to the present year.
+
+        Args:
+          kind (str): The entry kind.
+          start_year (int): The first year of the window.
+          end_year (int): The last year of the window.
+
+        Returns:
+          The entries, in document order.
+        """
+        return [
+            self.entries[index]
+            for index in self._since(kind, start_year)
+            if self.first_years[index] <= end_year
+        ]
+
+    def _since(self, kind: str, year: int) -> List[int]:
+        """
+        This function returns the indices of the entries of a kind whose last year is `year` or later, in
+        document order, by bisecting the kind's entries sorted by last year.
+        """
+        if kind not in self._by_last_year:
+            return []
+        last_years, indices = self._by_last_year[kind]
+        return sorted(indices[bisect_left(last_years, max(year, 1)) :])
+
+
+def _subheading(text: str, subheadings: Dict[str, str]) -> Optional[str]:
+    """
+    This function returns the status or category a paragraph sets if it is one of the subheadings of a
+    section, such as "Manuscripts in Press" or "Education Manuscripts", possibly followed by a note.
+    """
+    normalized = normalize_header(text)
+    for subheading, status in subheadings.items():
+        following = normalized[len(subheading) : len(subheading) + 1]
+        if normalized.startswith(subheading) and not following.isalnum():
+            return status
+    return None
+
+
+def citation_pages(text: str) -> Set[int]:
+    """
+    The function `citation_pages` reads the page numbers of a citation, such as 1987 and 1993 from
+    "pp. 1987-1993" or from "2019;12(3):1987-1993".
+
+    Args:
+      text (str): The entry text.
+
+    Returns:
+      The page numbers, or an empty set if the entry gives no pages.
+    """
+    if "p." not in text and ":" not in text:
+        return set()
+    return {int(number) for pages in _PAGES.findall(text) for number in re.findall(r"\d+", pages)}
+
+
+def parse_status(text: str, markers: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    The function `parse_status` reads the publication status an entry states about itself, such as
+    "in press" or "submitted".
+
+    Args:
+      text (str): The entry text.
+      markers (List[Tuple[str, str]]): Lower case markers and the status each sets, in priority order.
+
+    Returns:
+      The status of the first marker found as a whole phrase, or None.
+    """
+    lowered = text.lower()
+    for marker, status in markers:
+        if marker in lowered and re.search(rf"\b{re.escape(marker)}\b", lowered):
+            return status
+    return None
+
+
+def parse_tag(text: str, tags: List[Tuple[str, str]]) -> Optional[str]:
+    """
+    The function `parse_tag` reads the category an entry is tagged with, such as "[Education]".
+
+    Args:
+      text (str): The entry text.
+      tags (List[Tuple[str, str]]): Lower case tags and the category each sets, in priority order.
+
+    Returns:
+      The category of the first tag found, or None.
+    """
+    lowered = text.lower()
+    for tag, category in tags:
+        if tag in lowered:
+            return category
+    return None
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    The function `parse_amount` reads the first dollar amount in an entry, such as "$1,250,000" or "$2.5M".
+
+    Args:
+      text (str): The entry text.
+
+    Returns:
+      The amount in dollars, or None if the entry states none.
+    """
+    match = _AMOUNT.search(text) if "$" in text else None
+    if match is None:
+        return None
+    amount = float(match.group(1).replace(",", "") + (match.group(2) or ""))
+    return amount * _AMOUNT_MULTIPLIERS.get((match.group(3) or "").lower(), 1)
+
+
+def parse_role(text: str, kind: str) -> Optional[str]:
+    """
+    The function `parse_role` reads the faculty member's role in an entry. A role given after "Role:" is
+    read from any entry; grants are also searched for the usual investigator titles.
+
+    Args:
+      text (str): The entry text.
+      kind (str): The entry kind.
+
+    Returns:
+      The role as written, or None if the entry states none.
+    """
+    match = _LABELLED_ROLE.search(text) if "role" in text.lower() else None
+    if match is not None:
+        return match.group(1)
+    if kind == "grant":
+        match = _GRANT_ROLE.search(text)
+        if match is not None:
+            return match.group(1)
+    return None
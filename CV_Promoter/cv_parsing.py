@@ -1,14 +1,244 @@
+import hashlib
 import re
 from datetime import datetime
-from typing import Dict, List
-
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from CV_Promoter.cv_entries import CVEntries
+from CV_Promoter.cv_schema import (
+    CVSchema,
+    HeaderMatcher,
+    get_cv_schema,
+    normalize_header,
+)
+from CV_Promoter.docx_reader import DocxSource, iter_paragraph_texts
 from CV_Promoter_config import config
 
+# Date grammar. Every date format carrying a four digit year (MM/DD/YYYY, MM-YYYY, "March 29, 2023",
+# bare YYYY) yields a standalone four digit token, so a single token scan covers all of them. The formats
+# that can carry a short year are kept as separate patterns so that their matching is unchanged.
+_DIGIT = re.compile(r"\d")
+_FOUR_DIGIT_YEAR = re.compile(r"\b(\d{4})\b")
+_SHORT_YEAR_PATTERNS = (
+    re.compile(r"\b(0?[1-9]|1[0-2])[-/–](0?[1-9]|[12]\d|3[01])[-/–](\d{2})\b"),  # MM/DD/YY
+    re.compile(r"\b(0[1-9]|1[0-2])[-/](0[1-9]|[12]\d|3[01])[-/](\d{2})\b"),  # MM/DD/YY, zero padded
+    re.compile(r"\b(0[1-9]|1[0-2])[-/](\d{2})\b(?![-/]\d{2})"),  # MM-YY not followed by more numbers
+    re.compile(r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+(\d{2})\b"),
+)
+YEAR_CACHE_SIZE = 65536
+
+
+class ParsedCV:
+    """
+    The `ParsedCV` class holds everything about a CV that does not depend on the requested start year:
+    the paragraph texts, the section header index, header lookups, the years found in each paragraph and
+    the typed entries (see `cv_entries`). It is built once per uploaded document and shared by every
+    parser and workflow that reads it.
+    """
+
+    def __init__(
+        self,
+        paragraph_texts: Iterable[str],
+        document=None,
+        content_hash: Optional[str] = None,
+        document_loader: Optional[Callable] = None,
+        cv_schema: Optional[CVSchema] = None,
+    ):
+        self.paragraph_texts = list(paragraph_texts)
+        self.content_hash = content_hash or hash_paragraphs(self.paragraph_texts)
+        self.section_index = self._build_section_index(self.paragraph_texts)
+        self._document = document
+        self._document_loader = document_loader
+        self._cv_schema = cv_schema
+        self._section_offsets = None
+        self._header_offsets = {}
+        self._paragraph_years = {}
+        self._entries = {}
+        self._span_hashes = {}
+
+    @property
+    def document(self):
+        """
+        The python-docx `Document` for this CV. When the CV was read with the streaming reader the full
+        object model is only built here, on first access, for consumers that need more than paragraph text.
+        """
+        if self._document is None and self._document_loader is not None:
+            self._document = self._document_loader()
+        return self._document
+
+    @classmethod
+    def from_document(cls, document, content_hash: Optional[str] = None) -> "ParsedCV":
+        """
+        This function builds a `ParsedCV` from any object exposing `.paragraphs` with a `.text` attribute,
+        such as a python-docx `Document`.
+
+        Args:
+          document: The source document.
+          content_hash (Optional[str]): Hash identifying the document content. Computed from the paragraph
+        texts when omitted.
+
+        Returns:
+          The parsed CV.
+        """
+        return cls([paragraph.text for paragraph in document.paragraphs], document, content_hash)
+
+    @classmethod
+    def from_docx(
+        cls,
+        source: DocxSource,
+        content_hash: Optional[str] = None,
+        document_loader: Optional[Callable] = None,
+    ) -> "ParsedCV":
+        """
+        This function builds a `ParsedCV` straight from a .docx file with the streaming paragraph reader,
+        which also picks up paragraphs inside table cells.
+
+        Args:
+          source (DocxSource): A path to a .docx file, its raw bytes, or a binary file-like object.
+          content_hash (Optional[str]): Hash identifying the document content. Computed from the paragraph
+        texts when omitted.
+          document_loader (Optional[Callable]): Builds the python-docx `Document` if it is ever requested.
+
+        Returns:
+          The parsed CV.
+        """
+        return cls(iter_paragraph_texts(source), content_hash=content_hash, document_loader=document_loader)
+
+    @property
+    def cv_schema(self) -> CVSchema:
+        """
+        The schema of this CV's format, by default the configured one.
+        """
+        if self._cv_schema is None:
+            self._cv_schema = get_cv_schema()
+        return self._cv_schema
+
+    @property
+    def header_matcher(self) -> HeaderMatcher:
+        """
+        The matcher recognizing the section headers of this CV's format.
+        """
+        return self.cv_schema.matcher
+
+    @staticmethod
+    def _build_section_index(paragraph_texts: List[str]) -> Dict[str, List[int]]:
+        """
+        This function builds a one-time index from normalized paragraph text (see `normalize_header`) to the
+        offsets of the paragraphs carrying that text, so that headers the CV schema does not declare can be
+        located without rescanning the CV.
+
+        Args:
+          paragraph_texts (List[str]): The text of every paragraph in the CV, in document order.
+
+        Returns:
+          A dictionary mapping each normalized paragraph text to its offsets in ascending order.
+        """
+        section_index = {}
+        for offset, text in enumerate(paragraph_texts):
+            section_index.setdefault(normalize_header(text), []).append(offset)
+        return section_index
+
+    def first_header_offset(self, section_header: str) -> Optional[int]:
+        """
+        This function returns the offset of the first paragraph matching `section_header`. Headers the CV
+        schema declares, under any of their aliases, are answered from the offsets the header matcher finds
+        in a single pass over the CV on first use; any other header must equal a whole paragraph once both
+        are normalized, and is answered from the section index. Results are memoized per header.
+
+        Args:
+          section_header (str): The section header to locate.
+
+        Returns:
+          The offset of the first matching paragraph, or None if the header does not occur.
+        """
+        if section_header in self._header_offsets:
+            return self._header_offsets[section_header]
+
+        canonical = self.header_matcher.canonical(section_header)
+        if canonical is not None:
+            if self._section_offsets is None:
+                self._section_offsets = self.header_matcher.first_offsets(self.paragraph_texts)
+            offset = self._section_offsets.get(canonical)
+        else:
+            offsets = self.section_index.get(normalize_header(section_header))
+            offset = offsets[0] if offsets else None
+
+        self._header_offsets[section_header] = offset
+        return offset
+
+    def paragraph_years(self, present_year: int) -> List[Tuple[int, ...]]:
+        """
+        This function returns the years mentioned in each paragraph, computed on first request for a
+        given `present_year` and reused afterwards.
+
+        Args:
+          present_year (int): The current year, used to expand two digit years.
+
+        Returns:
+          A list holding one tuple of years per paragraph, aligned with `paragraph_texts`.
+        """
+        if present_year not in self._paragraph_years:
+            self._paragraph_years[present_year] = [
+                extract_years(text, present_year) for text in self.paragraph_texts
+            ]
+        return self._paragraph_years[present_year]
+
+    def entries(self, present_year: int) -> CVEntries:
+        """
+        This function returns the typed entries of the CV, built on first request for a given
+        `present_year` and reused afterwards.
+
+        Args:
+          present_year (int): The current year, used to expand two digit years and date ongoing entries.
+
+        Returns:
+          The CV's entries with their column index.
+        """
+        if present_year not in self._entries:
+            self._entries[present_year] = CVEntries(self, present_year, self.cv_schema)
+        return self._entries[present_year]
+
+    def span_hash(self, start: int, end: int) -> str:
+        """
+        This function returns the content hash of the paragraphs in the half-open span `[start, end)`,
+        memoized per span. Spans of two revisions of a CV with equal hashes hold the same text, wherever
+        they sit in the document.
+
+        Args:
+          start (int): Offset of the first paragraph in the span.
+          end (int): Offset one past the last paragraph in the span.
+
+        Returns:
+          The hexadecimal SHA-256 digest of the span.
+        """
+        key = (start, end)
+        if key not in self._span_hashes:
+            self._span_hashes[key] = hash_paragraphs(self.paragraph_texts[start:end])
+        return self._span_hashes[key]
+
+
+def hash_paragraphs(paragraph_texts: List[str]) -> str:
+    """
+    The function `hash_paragraphs` computes a stable content hash over a sequence of paragraph texts.
+
+    Args:
+      paragraph_texts (List[str]): The paragraph texts, in document order.
+
+    Returns:
+      The hexadecimal SHA-256 digest.
+    """
+    digest = hashlib.sha256()
+    for text in paragraph_texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
 
 class CVParser:
     """
     The `CVParser` class in Python is designed to extract text from a CV document based on specified
-    sections and date ranges.
+    sections and date ranges. The CV may be a python-docx `Document`, an already parsed `ParsedCV`, or an
+    iterable of paragraph texts such as `docx_reader.iter_paragraph_texts`.
     """
 
     def __init__(self, cv, start_year: int):
@@ -16,6 +246,14 @@ class CVParser:
         self.present_year = datetime.now().year
         self.start_year = start_year
         self.differential = self.present_year - self.start_year + config.NIH_FUNDING_WINDOW
+        if isinstance(cv, ParsedCV):
+            self.parsed_cv = cv
+        elif hasattr(cv, "paragraphs"):
+            self.parsed_cv = ParsedCV.from_document(cv)
+        else:
+            self.parsed_cv = ParsedCV(cv)
+        self.paragraph_texts = self.parsed_cv.paragraph_texts
+        self.section_index = self.parsed_cv.section_index
 
     def extract_text(self, instructions: Dict) -> List[str]:
         """
@@ -33,22 +271,91 @@ class CVParser:
           The function `extract_text` returns a list of strings that have been extracted based on the
         provided instructions.
         """
-        extracted_text = []
+        return self._texts(self.extract_offsets(instructions))
+
+    def extract_offsets(self, instructions: Dict) -> List[int]:
+        """
+        This function follows the same instructions as `extract_text` but returns the offsets of the
+        extracted paragraphs, so that callers can relate them to `paragraph_years` or remove paragraphs
+        pulled in by more than one instruction.
 
+        Args:
+          instructions (Dict): The extraction instructions, as for `extract_text`.
+
+        Returns:
+          The offsets of the extracted paragraphs, in extraction order. An offset appears once per
+        instruction that selected it.
+        """
+        extracted_offsets = []
+        for start, end, filter_years in self.extract_spans(instructions):
+            extracted_offsets += self._span_offsets(start, end, filter_years)
+
+        if not extracted_offsets:
+            # Fallback mechanism
+            extracted_offsets = self._offsets_after_section("", True)
+
+        return extracted_offsets
+
+    def extract_spans(self, instructions: Dict) -> List[Tuple[int, int, bool]]:
+        """
+        This function locates the parts of the CV the instructions read, before any paragraph is filtered.
+        Instructions give them as a `(group, category)` of the CV's schema under "schema_ranges", as a list
+        of `cv_schema.SectionRange` under "ranges" or, as before CV schemas, under "between" and "after" keys
+        with an optional "_filter_years" suffix.
+
+        Args:
+          instructions (Dict): The extraction instructions, as for `extract_text`.
+
+        Returns:
+          One `(start, end, filter_years)` tuple per range whose start header occurs in the CV, giving the
+        half-open span of paragraph offsets and whether its paragraphs are filtered by year.
+        """
+        spans = []
         for instruction_type, value in instructions.items():
+            if instruction_type in ("ranges", "schema_ranges"):
+                if instruction_type == "schema_ranges":
+                    value = self.parsed_cv.cv_schema.ranges(*value)
+                for section_range in value:
+                    if section_range.end is None:
+                        span = self._span_after_section(section_range.start)
+                    else:
+                        span = self._span_between_sections(section_range.start, section_range.end)
+                    if span is not None:
+                        spans.append(span + (section_range.filter_years,))
+                continue
             if "between" in instruction_type:
-                start_section, end_section = value
-                filter_years = "filter_years" in instruction_type
-                extracted_text += self.extract_text_between_sections(start_section, end_section, filter_years)
+                span = self._span_between_sections(*value)
             elif "after" in instruction_type:
-                filter_years = "filter_years" in instruction_type
-                extracted_text += self.extract_text_after_section(value, filter_years)
+                span = self._span_after_section(value)
+            else:
+                continue
+            if span is not None:
+                spans.append(span + ("filter_years" in instruction_type,))
+        return spans
+
+    def context_fingerprint(self, instruction_sets: List[Dict]) -> str:
+        """
+        This function identifies the context the instruction sets extract without extracting it. It hashes
+        the paragraphs of every span the instructions read, the year window that filters them and, when
+        nothing in the spans would be extracted, the whole CV that the fallback reads instead. Revisions of
+        a CV that only differ outside these spans have the same fingerprint and yield the same context.
 
-        if not extracted_text:
-            # Fallback mechanism
-            extracted_text = self.extract_text_after_section("", True)
+        Args:
+          instruction_sets (List[Dict]): Extraction instructions in priority order.
 
-        return extracted_text
+        Returns:
+          The hexadecimal SHA-256 fingerprint.
+        """
+        digest = hashlib.sha256(f"{self.present_year}:{self.start_year}".encode("utf-8"))
+        for instructions in instruction_sets:
+            spans = self.extract_spans(instructions)
+            for start, end, filter_years in spans:
+                digest.update(f"|{self.parsed_cv.span_hash(start, end)}:{filter_years:d}".encode("utf-8"))
+            if not any(self._span_has_content(*span) for span in spans):
+                fallback_hash = self.parsed_cv.span_hash(0, len(self.paragraph_texts))
+                digest.update(f"|fallback:{fallback_hash}".encode("utf-8"))
+            digest.update(b";")
+        return digest.hexdigest()
 
     def extract_text_after_section(self, section_header: str, filter_years: bool) -> List[str]:
         """
@@ -68,16 +375,28 @@ class CVParser:
           A list of strings containing text extracted from paragraphs in the CV document after the specified
         section header, based on the provided conditions.
         """
-        is_target_section = not section_header.strip()
-        extracted_text = []
+        return self._texts(self._offsets_after_section(section_header, filter_years))
 
-        for paragraph in self.cv.paragraphs:
-            if self._is_section_header(paragraph.text, section_header):
-                is_target_section = True
-            if is_target_section and self._should_include(paragraph.text, filter_years):
-                extracted_text.append(paragraph.text)
+    def _offsets_after_section(self, section_header: str, filter_years: bool) -> List[int]:
+        """
+        This function returns the offsets of the paragraphs `extract_text_after_section` extracts.
+        """
+        span = self._span_after_section(section_header)
+        if span is None:
+            return []
+        return self._span_offsets(*span, filter_years)
 
-        return extracted_text
+    def _span_after_section(self, section_header: str) -> Optional[Tuple[int, int]]:
+        """
+        This function returns the span from `section_header` to the end of the CV, the whole CV for a
+        blank header, or None if the header does not occur.
+        """
+        if not section_header.strip():
+            return 0, len(self.paragraph_texts)
+        start = self.parsed_cv.first_header_offset(section_header)
+        if start is None:
+            return None
+        return start, len(self.paragraph_texts)
 
     def extract_text_between_sections(
         self, start_section: str, end_section: str, filter_years: bool
@@ -104,23 +423,80 @@ class CVParser:
         paragraphs found between the start_section and end_section headers in the CV paragraphs, based on
         the conditions specified by the `filter_years` parameter.
         """
-        is_target_section = False
-        extracted_text = []
+        return self._texts(self._offsets_between_sections(start_section, end_section, filter_years))
 
-        for paragraph in self.cv.paragraphs:
-            if self._is_section_header(paragraph.text, start_section):
-                is_target_section = True
-            if self._is_section_header(paragraph.text, end_section):
-                break
-            if is_target_section and self._should_include(paragraph.text, filter_years):
-                extracted_text.append(paragraph.text)
+    def _offsets_between_sections(
+        self, start_section: str, end_section: str, filter_years: bool
+    ) -> List[int]:
+        """
+        This function returns the offsets of the paragraphs `extract_text_between_sections` extracts.
+        """
+        span = self._span_between_sections(start_section, end_section)
+        if span is None:
+            return []
+        return self._span_offsets(*span, filter_years)
 
-        return extracted_text
+    def _span_between_sections(self, start_section: str, end_section: str) -> Optional[Tuple[int, int]]:
+        """
+        This function returns the span from `start_section` up to `end_section`, or to the end of the CV
+        if the end header does not occur. It returns None if the start header does not occur.
+        """
+        start = self.parsed_cv.first_header_offset(start_section)
+        if start is None:
+            return None
+
+        # The first end header anywhere in the document stops extraction, even if it precedes the start
+        end = self.parsed_cv.first_header_offset(end_section)
+        if end is None:
+            end = len(self.paragraph_texts)
+
+        return start, end
+
+    def _span_offsets(self, start: int, end: int, filter_years: bool) -> List[int]:
+        """
+        This function returns the offsets in the half-open span `[start, end)` whose paragraphs pass
+        `_should_include`.
+
+        Args:
+          start (int): Offset of the first paragraph in the span.
+          end (int): Offset one past the last paragraph in the span.
+          filter_years (bool): Whether to keep only paragraphs with a date in range.
+
+        Returns:
+          A list of paragraph offsets in document order.
+        """
+        return [
+            offset
+            for offset in range(start, end)
+            if self._should_include(self.paragraph_texts[offset], filter_years)
+        ]
+
+    def _span_has_content(self, start: int, end: int, filter_years: bool) -> bool:
+        """
+        This function tells whether any paragraph in the span would be extracted, stopping at the first.
+        """
+        return any(
+            self._should_include(self.paragraph_texts[offset], filter_years) for offset in range(start, end)
+        )
+
+    def _texts(self, offsets: List[int]) -> List[str]:
+        """
+        This function maps paragraph offsets to their texts.
+
+        Args:
+          offsets (List[int]): Paragraph offsets.
+
+        Returns:
+          The paragraph texts, in the same order.
+        """
+        return [self.paragraph_texts[offset] for offset in offsets]
 
     def _is_section_header(self, text: str, section_header: str) -> bool:
         """
         This function checks if a given text is a section header by comparing it with a specified section
-        header string, ignoring case sensitivity.
+        header string the same way `ParsedCV.first_header_offset` does: through the CV schema's header
+        matcher for declared headers and their aliases, and otherwise by normalized equality. The header is
+        never interpreted as a regular expression.
 
         Args:
           text (str): The `text` parameter is a string that represents the text content that you want to
@@ -130,10 +506,13 @@ class CVParser:
         the specified section header.
 
         Returns:
-          The function is checking if the `text` string matches the `section_header` string exactly
-        (ignoring case) and returning a boolean value indicating whether there is a match or not.
+          A boolean value indicating whether `text` is the header of `section_header`.
         """
-        return bool(re.search(f"^{section_header}$", text, re.IGNORECASE))
+        matcher = self.parsed_cv.header_matcher
+        canonical = matcher.canonical(section_header)
+        if canonical is not None:
+            return matcher.match(text) == canonical
+        return normalize_header(text) == normalize_header(section_header)
 
     def _should_include(self, text: str, filter_years: bool) -> bool:
         """
@@ -176,39 +555,70 @@ class CVParser:
         a boolean value indicating whether a valid date within the specified range is found in the given
         text.
         """
-        # Define patterns for various date formats
-        date_patterns = [
-            r"\b(0?[1-9]|1[0-2])[-/–](0?[1-9]|[12]\d|3[01])[-/–](\d{2})\b",  # MM/DD/YY with valid MM and DD
-            r"\b(0?[1-9]|1[0-2])[-/–](0?[1-9]|[12]\d|3[01])[-/–](\d{4})\b",  # MM/DD/YYYY with valid MM and DD
-            r"\b(0[1-9]|1[0-2])[-/](0[1-9]|[12]\d|3[01])[-/](\d{2})\b",  # MM/DD/YY with valid MM and DD
-            r"\b(0[1-9]|1[0-2])[-/](0[1-9]|[12]\d|3[01])[-/](\d{4})\b",  # MM/DD/YYYY with valid MM and DD
-            r"\b(0[1-9]|1[0-2])[-/](\d{2})\b(?![-/]\d{2})",  # MM-YY with valid MM and not followed by another set of numbers
-            r"\b(0[1-9]|1[0-2])[-/](\d{4})\b",  # MM-YYYY with valid MM
-            r"\b(\d{4})\b",  # YYYY
-            r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+(\d{2,4})\b",
-        ]
+        years = extract_years(text, self.present_year)
+        return self._any_year_in_range(years) or ("present" in text.lower()) or ("current" in text.lower())
 
-        valid_dates_found = False
+    def _any_year_in_range(self, years) -> bool:
+        """
+        This function checks whether any of the given years falls within the window running from the year
+        before `present_year` to `present_year + differential`, inclusive.
 
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if isinstance(match, tuple):
-                    year = match[-1]
-                else:
-                    year = match.split("/")[-1]  # Get the last part which is likely the year
+        Args:
+          years: The years extracted from a paragraph, as returned by `extract_years`.
+
+        Returns:
+          True if at least one year lies within the window.
+        """
+        earliest_year = self.present_year - 1
+        latest_year = self.present_year + self.differential
+        return any(earliest_year <= year <= latest_year for year in years)
+
+    @property
+    def paragraph_years(self) -> List[Tuple[int, ...]]:
+        """
+        The years mentioned in each paragraph, aligned with `paragraph_texts`. The array is shared with
+        every parser built on the same `ParsedCV`.
+
+        Returns:
+          A list holding one tuple of years per paragraph.
+        """
+        return self.parsed_cv.paragraph_years(self.present_year)
+
+    @property
+    def entries(self) -> CVEntries:
+        """
+        The typed entries of the CV, such as its publications and grants, for filtering and counting
+        without the model. They are shared with every parser built on the same `ParsedCV`.
+
+        Returns:
+          The CV's entries with their column index.
+        """
+        return self.parsed_cv.entries(self.present_year)
 
-                # If the year is a full date like "March 29, 2023", extract just the year
-                if "," in year:
-                    year = year.split(",")[-1].strip()
 
-                if len(year) == 2:  # If YY format, convert to YYYY
-                    year = "20" + year if int(year) < self.present_year % 100 else "19" + year
+@lru_cache(maxsize=YEAR_CACHE_SIZE)
+def extract_years(text: str, present_year: int) -> Tuple[int, ...]:
+    """
+    The function `extract_years` finds every year mentioned in a paragraph using the precompiled date
+    grammar. Results are cached per (text, present_year) so that a paragraph is only scanned once no
+    matter how many instructions or workflows filter it.
 
-                if (int(year) >= (self.present_year - 1)) and (
-                    int(year) <= (self.present_year + self.differential)
-                ):
-                    valid_dates_found = True
-                    break
+    Args:
+      text (str): The paragraph text to scan.
+      present_year (int): The current year, used to expand two digit years into a century.
 
-        return valid_dates_found or ("present" in text.lower()) or ("current" in text.lower())
+    Returns:
+      A tuple of the years found, four digit years first. Duplicates are kept.
+    """
+    if not _DIGIT.search(text):
+        return ()
+
+    two_digit_pivot = present_year % 100
+    years = [int(year) for year in _FOUR_DIGIT_YEAR.findall(text)]
+    for pattern in _SHORT_YEAR_PATTERNS:
+        for match in pattern.findall(text):
+            year = match[-1] if isinstance(match, tuple) else match
+            if len(year) == 2:  # If YY format, convert to YYYY
+                year = "20" + year if int(year) < two_digit_pivot else "19" + year
+            years.append(int(year))
+    return tuple(years)
@@ -0,0 +1,258 @@
+import json
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import yaml
+
+from CV_Promoter_config import config
+
+# Marks the end of a header in the matcher's trie
+_TERMINAL = ""
+# What may follow a header in its paragraph: nothing, or a parenthetical note as in
+# "GRANT SUPPORT: (PAST AND CURRENT)", optionally after a colon
+_HEADER_SUFFIX = re.compile(r":?\s*(\(.*\))?")
+
+
+def normalize_header(text: str) -> str:
+    """
+    The function `normalize_header` reduces a header or paragraph to the form headers are compared in: case
+    is folded, runs of whitespace become one space, spaces around slashes are dropped, and a trailing colon
+    is removed, so that "Awards / Honors" and "AWARDS/HONORS:" compare equal.
+
+    Args:
+      text (str): The header or paragraph text.
+
+    Returns:
+      The normalized text.
+    """
+    text = " ".join(text.casefold().split()).replace(" /", "/").replace("/ ", "/")
+    return text[:-1].rstrip() if text.endswith(":") else text
+
+
+class HeaderMatcher:
+    """
+    The `HeaderMatcher` class recognizes section headers in CV paragraphs. Every header and alias is
+    compiled once into a character trie of normalized text mapped to its canonical header. Headers start
+    their paragraph, so a paragraph is matched by a single walk down the trie from its first character, and
+    finding every header in a CV takes one pass over its paragraphs whatever the number of headers.
+    """
+
+    def __init__(self, headers: Dict[str, Iterable[str]]):
+        self._trie = {}
+        self._canonical = {}
+        for header, aliases in headers.items():
+            for name in [header, *aliases]:
+                key = normalize_header(name)
+                if self._canonical.get(key, header) != header:
+                    raise ValueError(f"'{name}' names both {self._canonical[key]} and {header}.")
+                self._canonical[key] = header
+                node = self._trie
+                for character in key:
+                    node = node.setdefault(character, {})
+                node[_TERMINAL] = header
+        self.headers = list(headers)
+
+    def canonical(self, header: str) -> Optional[str]:
+        """
+        This function resolves a header or one of its aliases, written in any case and with or without a
+        colon, to the header it stands for.
+
+        Args:
+          header (str): The header as written in instructions or code.
+
+        Returns:
+          The canonical header, or None if the schema does not declare it.
+        """
+        return self._canonical.get(normalize_header(header))
+
+    def match(self, paragraph: str) -> Optional[str]:
+        """
+        This function tells which section a paragraph is the header of. The longest header or alias the
+        paragraph starts with wins, provided the rest of the paragraph is empty or a parenthetical note.
+
+        Args:
+          paragraph (str): The paragraph text.
+
+        Returns:
+          The canonical header, or None if the paragraph is not a section header.
+        """
+        first = paragraph.lstrip()[:1].casefold()[:1]
+        if first not in self._trie:
+            return None  # most paragraphs are rejected here without being normalized
+        text = normalize_header(paragraph)
+        node = self._trie
+        matched = None
+        for position, character in enumerate(text):
+            if _TERMINAL in node and _HEADER_SUFFIX.fullmatch(text, position):
+                matched = node[_TERMINAL]
+            node = node.get(character)
+            if node is None:
+                return matched
+        return node.get(_TERMINAL, matched)
+
+    def first_offsets(self, paragraph_texts: Iterable[str]) -> Dict[str, int]:
+        """
+        This function locates the first header paragraph of every section in one pass over the CV.
+
+        Args:
+          paragraph_texts (Iterable[str]): The paragraph texts, in document order.
+
+        Returns:
+          A dictionary mapping each canonical header found to the offset of its first paragraph.
+        """
+        offsets = {}
+        for offset, text in enumerate(paragraph_texts):
+            header = self.match(text)
+            if header is not None and header not in offsets:
+                offsets[header] = offset
+        return offsets
+
+
+class SectionRange(NamedTuple):
+    """
+    A part of the CV that a category reads: from the `start` header up to the first `end` header, or to
+    the end of the CV when `end` is None, optionally keeping only paragraphs dated within the review window.
+    """
+
+    start: str
+    end: Optional[str] = None
+    filter_years: bool = False
+
+
+class CVSchema:
+    """
+    The `CVSchema` class describes one institution's CV format: its section headers with their aliases, the
+    kind of entry each section lists, how the publication status and the research or education category of
+    entries are written and, for each annual review and narrative portfolio category, the ranges of
+    sections its context comes from.
+    Schemas are written as YAML or JSON (see `assets/cv_schemas/uab.yaml`) so that another institution's
+    format can be supported without changing code.
+    """
+
+    GROUPS = ("annual_review", "narrative")
+
+    def __init__(
+        self,
+        institution: str,
+        headers: Dict[str, Iterable[str]],
+        annual_review: Dict[str, List[SectionRange]],
+        narrative: Dict[str, List[SectionRange]],
+        entry_kinds: Optional[Dict[str, str]] = None,
+        publication_statuses: Optional[Dict] = None,
+        entry_categories: Optional[Dict] = None,
+    ):
+        self.institution = institution
+        self.matcher = HeaderMatcher(headers)
+        self.entry_kinds = dict(entry_kinds or {})
+        publication_statuses = publication_statuses or {}
+        # Sections whose entries have a publication status, the subheadings (normalized) and markers
+        # (lower case, in priority order) that set it
+        self.status_sections = frozenset(publication_statuses.get("sections") or ())
+        self.status_subheadings = {
+            normalize_header(subheading): status
+            for subheading, status in (publication_statuses.get("subheadings") or {}).items()
+        }
+        self.status_markers = [
+            (marker.lower(), status) for marker, status in (publication_statuses.get("markers") or {}).items()
+        ]
+        entry_categories = entry_categories or {}
+        # Sections whose entries are research or education, the category of their untagged entries, and the
+        # subheadings (normalized) and tags (lower case, in priority order) that set it
+        self.category_sections = frozenset(entry_categories.get("sections") or ())
+        self.default_category = entry_categories.get("default")
+        self.category_subheadings = {
+            normalize_header(subheading): category
+            for subheading, category in (entry_categories.get("subheadings") or {}).items()
+        }
+        self.category_tags = [
+            (tag.lower(), category) for tag, category in (entry_categories.get("tags") or {}).items()
+        ]
+        for header in [*self.entry_kinds, *self.status_sections, *self.category_sections]:
+            if header not in headers:
+                raise ValueError(f"The CV schema refers to undeclared header '{header}'.")
+        self._ranges = {"annual_review": annual_review, "narrative": narrative}
+        for group, categories in self._ranges.items():
+            for category, ranges in categories.items():
+                for section_range in ranges:
+                    for header in (section_range.start, section_range.end):
+                        if header is not None and header not in headers:
+                            raise ValueError(f"{group}/{category} refers to undeclared header '{header}'.")
+
+    @classmethod
+    def load(cls, path: Path = config.CV_SCHEMA_PATH) -> "CVSchema":
+        """
+        This function reads a schema from a YAML or JSON file.
+
+        Args:
+          path (Path): The schema file. Files ending in .json are read as JSON, anything else as YAML.
+
+        Returns:
+          The schema.
+        """
+        path = Path(path)
+        with open(path, encoding="utf-8") as schema_file:
+            data = json.load(schema_file) if path.suffix.lower() == ".json" else yaml.safe_load(schema_file)
+        ranges = {
+            group: {
+                category: [
+                    SectionRange(item["from"], item.get("to"), bool(item.get("filter_years", False)))
+                    for item in items
+                ]
+                for category, items in (data.get(group) or {}).items()
+            }
+            for group in cls.GROUPS
+        }
+        headers = {header: list(aliases or []) for header, aliases in data["headers"].items()}
+        return cls(
+            data.get("institution", path.stem),
+            headers,
+            entry_kinds=data.get("entry_kinds"),
+            publication_statuses=data.get("publication_statuses"),
+            entry_categories=data.get("entry_categories"),
+            **ranges,
+        )
+
+    def ranges(self, group: str, category: str) -> List[SectionRange]:
+        """
+        This function returns the ranges a category reads.
+
+        Args:
+          group (str): "annual_review" or "narrative".
+          category (str): The category, such as "Teaching".
+
+        Returns:
+          The ranges, in extraction order.
+        """
+        try:
+            return list(self._ranges[group][category])
+        except KeyError:
+            message = f"The {self.institution} CV schema has no {group} category '{category}'."
+            raise KeyError(message) from None
+
+    @property
+    def headers(self) -> List[str]:
+        """
+        The canonical section headers, in the order the schema declares them.
+        """
+        return list(self.matcher.headers)
+
+
+_cv_schema = None
+_cv_schema_lock = threading.Lock()
+
+
+def get_cv_schema() -> CVSchema:
+    """
+    The function `get_cv_schema` returns the schema at `config.CV_SCHEMA_PATH`, loaded and compiled once per
+    process.
+
+    Returns:
+      The shared `CVSchema`.
+    """
+    global _cv_schema
+    with _cv_schema_lock:
+        if _cv_schema is None:
+            _cv_schema = CVSchema.load(config.CV_SCHEMA_PATH)
+        return _cv_schema
@@ -0,0 +1,150 @@
+import io
+import posixpath
+import zipfile
+from typing import BinaryIO, Iterator, Union
+from xml.etree import ElementTree
+
+WORD_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+RELATIONSHIPS_NAMESPACE = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+DEFAULT_DOCUMENT_PART = "word/document.xml"
+
+_P = f"{{{WORD_NAMESPACE}}}p"
+_R = f"{{{WORD_NAMESPACE}}}r"
+_HYPERLINK = f"{{{WORD_NAMESPACE}}}hyperlink"
+_BR = f"{{{WORD_NAMESPACE}}}br"
+_TYPE = f"{{{WORD_NAMESPACE}}}type"
+
+# Run children that contribute text, mirroring python-docx's `Run.text`
+_RUN_TEXT = {
+    f"{{{WORD_NAMESPACE}}}t": None,  # element text
+    f"{{{WORD_NAMESPACE}}}tab": "\t",
+    f"{{{WORD_NAMESPACE}}}ptab": "\t",
+    f"{{{WORD_NAMESPACE}}}cr": "\n",
+    f"{{{WORD_NAMESPACE}}}noBreakHyphen": "-",
+}
+
+DocxSource = Union[str, bytes, BinaryIO]
+
+
+def iter_paragraph_texts(source: DocxSource) -> Iterator[str]:
+    """
+    The function `iter_paragraph_texts` streams the paragraph texts of a .docx file in document order
+    without building the python-docx object model. The main document part is read with an incremental
+    XML parser and every element outside a paragraph, and every paragraph once its text has been yielded,
+    is detached from the tree, so memory stays bounded by the largest paragraph rather than the size of
+    the CV.
+
+    Unlike `Document.paragraphs`, paragraphs inside table cells are included. Paragraph text is built the
+    same way python-docx builds it: runs directly in the paragraph or in a hyperlink, with tabs, line
+    breaks and non-breaking hyphens. Paragraphs nested inside another paragraph (text boxes) are skipped.
+
+    Args:
+      source (DocxSource): A path to a .docx file, its raw bytes, or a binary file-like object.
+
+    Returns:
+      An iterator over paragraph texts.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+
+    with zipfile.ZipFile(source) as package:
+        with package.open(_main_document_part(package)) as document_xml:
+            yield from _iter_xml_paragraph_texts(document_xml)
+
+
+def _main_document_part(package: zipfile.ZipFile) -> str:
+    """
+    This function resolves the name of the main document part from the package relationships, falling
+    back to the conventional `word/document.xml`.
+
+    Args:
+      package (zipfile.ZipFile): The opened .docx package.
+
+    Returns:
+      The name of the main document part within the package.
+    """
+    try:
+        relationships = ElementTree.fromstring(package.read("_rels/.rels"))
+    except KeyError:
+        return DEFAULT_DOCUMENT_PART
+
+    for relationship in relationships.iter(f"{{{RELATIONSHIPS_NAMESPACE}}}Relationship"):
+        if relationship.get("Type") == OFFICE_DOCUMENT_TYPE:
+            return posixpath.normpath(relationship.get("Target").lstrip("/"))
+    return DEFAULT_DOCUMENT_PART
+
+
+def _iter_xml_paragraph_texts(document_xml: BinaryIO) -> Iterator[str]:
+    """
+    This function walks a WordprocessingML document part with `iterparse`, tracking the open element path
+    so that only text belonging to the outermost paragraph's own runs is collected. Elements are removed
+    from their parent as soon as they are no longer needed, so the parsed tree never holds more than the
+    open elements and the current paragraph.
+
+    Args:
+      document_xml (BinaryIO): The stream of the main document part.
+
+    Returns:
+      An iterator over paragraph texts.
+    """
+    path = []
+    open_elements = []
+    paragraph_depth = 0
+    pieces = []
+
+    for event, element in ElementTree.iterparse(document_xml, events=("start", "end")):
+        if event == "start":
+            path.append(element.tag)
+            open_elements.append(element)
+            if element.tag == _P:
+                paragraph_depth += 1
+            continue
+
+        path.pop()
+        open_elements.pop()
+        if element.tag == _P:
+            paragraph_depth -= 1
+            if paragraph_depth == 0:
+                yield "".join(pieces)
+                pieces = []
+        elif paragraph_depth == 1 and _is_paragraph_run(path):
+            pieces.append(_run_child_text(element))
+        if paragraph_depth == 0 and open_elements:
+            # Outside paragraphs nothing is read back, so detach the element (a paragraph, table, row, ...)
+            open_elements[-1].remove(element)
+
+
+def _is_paragraph_run(path: list) -> bool:
+    """
+    This function checks whether the parent path of a just-closed element is a run of the current
+    paragraph, either directly or through a hyperlink.
+
+    Args:
+      path (list): The tags of the open ancestors of the element, outermost first.
+
+    Returns:
+      True if the element is a child of one of the paragraph's runs.
+    """
+    return (len(path) >= 2 and path[-1] == _R and path[-2] == _P) or (
+        len(path) >= 3 and path[-1] == _R and path[-2] == _HYPERLINK and path[-3] == _P
+    )
+
+
+def _run_child_text(element: ElementTree.Element) -> str:
+    """
+    This function returns the text a run child contributes to its paragraph.
+
+    Args:
+      element (ElementTree.Element): A child element of a run.
+
+    Returns:
+      The text of the element, which is empty for non-text children.
+    """
+    if element.tag == _BR:
+        return "\n" if element.get(_TYPE, "textWrapping") == "textWrapping" else ""
+    if element.tag not in _RUN_TEXT:
+        return ""
+    if _RUN_TEXT[element.tag] is None:
+        return element.text or ""
+    return _RUN_TEXT[element.tag]
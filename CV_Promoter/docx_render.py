@@ -0,0 +1,325 @@
+import hashlib
+import io
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from llm_utils.text_format import convert_markdown_docx
+
+from CV_Promoter.instrumentation import tracer
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+_TABLE_SEPARATOR = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+_INLINE = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*|\*(?=\S)(.+?)(?<=\S)\*")
+_SETEXT_UNDERLINE = re.compile(r"^\s{0,3}(=+|-+)\s*$")
+# Markdown the native renderer leaves to pandoc: lists, block quotes, code, links, footnotes, images, HTML,
+# entities, escapes, math, sub- and superscripts, underscore emphasis and bold italics
+_UNSUPPORTED_BLOCK = re.compile(r"^\s*([-+*]\s|\d+[.)]\s|>|```|~~~|    \S)")
+_UNSUPPORTED_INLINE = re.compile(r"[`<\[~^\\]|&#?\w+;|\$\S([^$]*\S)?\$(?!\d)|\*\*\*|(^|\W)__?\S|\S__?(\W|$)")
+
+
+class DocxRenderer:
+    """
+    The `DocxRenderer` class turns generated markdown into .docx files styled by the reference template.
+    The template is read once and kept in memory with its sample content removed. Markdown made only of
+    headings, paragraphs, pipe tables, horizontal rules and bold or italic text, which covers the review
+    forms, is written directly with python-docx using the template's pandoc styles; anything else goes
+    through pandoc as before. Rendered files are memoized by the hash of their markdown.
+    """
+
+    def __init__(self, template: Path = config.TEMPLATE, max_entries: int = config.RENDER_CACHE_SIZE):
+        self.template = Path(template)
+        self.max_entries = max_entries
+        self._blank_template = self._load_blank_template(self.template)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_blank_template(template: Path) -> bytes:
+        """
+        This function reads the reference template and strips its sample body, keeping its styles,
+        numbering and page setup.
+
+        Args:
+          template (Path): The pandoc reference .docx.
+
+        Returns:
+          The blank template as .docx bytes.
+        """
+        document = Document(template)
+        body = document.element.body
+        for element in list(body):
+            if element.tag != qn("w:sectPr"):
+                body.remove(element)
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+
+    def render(self, markdown: str, workflow: str = "docx", run_id: Optional[str] = None) -> bytes:
+        """
+        This function renders markdown as a .docx file, reusing an earlier rendering of the same markdown.
+
+        Args:
+          markdown (str): The generated markdown.
+          workflow (str): The workflow the markdown came from, for the timing log.
+          run_id (Optional[str]): The workflow run, for the timing log.
+
+        Returns:
+          The .docx file as bytes.
+        """
+        key = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+        with tracer.span("docx_render", workflow, run_id, markdown_chars=len(markdown)) as span:
+            with self._lock:
+                docx_data = self._entries.get(key)
+                if docx_data is not None:
+                    self._entries.move_to_end(key)
+            if docx_data is not None:
+                span.set(renderer="cache")
+                return docx_data
+
+            if self.supports(markdown):
+                span.set(renderer="native")
+                docx_data = self._render_native(markdown)
+            else:
+                span.set(renderer="pandoc")
+                docx_data = convert_markdown_docx(markdown, self.template)
+                if hasattr(docx_data, "getvalue"):
+                    docx_data = docx_data.getvalue()
+
+        with self._lock:
+            self._entries[key] = docx_data
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        renderer = span.attributes["renderer"]
+        logger.info(f"Rendered {workflow} .docx with {renderer} in {span.duration_ms:.0f} ms")
+        return docx_data
+
+    @staticmethod
+    def supports(markdown: str) -> bool:
+        """
+        This function tells whether the native renderer can render the markdown the way pandoc would.
+
+        Args:
+          markdown (str): The markdown to render.
+
+        Returns:
+          True if every block and inline element is supported.
+        """
+        lines = markdown.splitlines()
+        for index, line in enumerate(lines):
+            if _RULE.match(line) or _is_separator(line):
+                continue
+            if _UNSUPPORTED_BLOCK.match(line):
+                return False
+            text = line.rstrip()
+            if not text.lstrip().startswith("|"):
+                next_line = lines[index + 1] if index + 1 < len(lines) else ""
+                if "|" in text or (text and not _HEADING.match(text) and _SETEXT_UNDERLINE.match(next_line)):
+                    return False  # a table without leading pipes, or a setext heading
+                if text.endswith("\\"):
+                    text = text[:-1]  # a hard line break
+            if _UNSUPPORTED_INLINE.search(text):
+                return False
+        return True
+
+    def _render_native(self, markdown: str) -> bytes:
+        """
+        This function writes supported markdown into a copy of the blank template.
+
+        Args:
+          markdown (str): The markdown to render.
+
+        Returns:
+          The .docx file as bytes.
+        """
+        document = Document(io.BytesIO(self._blank_template))
+        lines = markdown.splitlines()
+        paragraph_lines: List[str] = []
+        first_paragraph = True
+
+        def flush_paragraph():
+            nonlocal first_paragraph
+            if paragraph_lines:
+                style = "First Paragraph" if first_paragraph else "Body Text"
+                _add_paragraph(document, paragraph_lines, style)
+                paragraph_lines.clear()
+                first_paragraph = False
+
+        index = 0
+        while index < len(lines):
+            line = lines[index]
+            heading = _HEADING.match(line)
+            if not line.strip():
+                flush_paragraph()
+            elif heading:
+                flush_paragraph()
+                level = len(heading.group(1))
+                _add_inline(document.add_paragraph(style=f"Heading {level}"), heading.group(2))
+                first_paragraph = True
+            elif line.lstrip().startswith("|") and index + 1 < len(lines) and _is_separator(lines[index + 1]):
+                flush_paragraph()
+                rows = [line]
+                index += 2
+                while index < len(lines) and lines[index].lstrip().startswith("|"):
+                    rows.append(lines[index])
+                    index += 1
+                _add_table(document, [_split_row(row) for row in rows])
+                first_paragraph = True
+                continue
+            elif _RULE.match(line):
+                flush_paragraph()
+                _add_rule(document)
+                first_paragraph = True
+            else:
+                paragraph_lines.append(line.strip())
+            index += 1
+        flush_paragraph()
+
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+
+
+def _is_separator(line: str) -> bool:
+    """
+    This function tells whether a line is the separator under the header of a pipe table.
+    """
+    return "|" in line and _TABLE_SEPARATOR.match(line) is not None
+
+
+def _split_row(row: str) -> List[str]:
+    """
+    This function splits a pipe table row into its cell texts.
+    """
+    row = row.strip()
+    if row.startswith("|"):
+        row = row[1:]
+    if row.endswith("|"):
+        row = row[:-1]
+    return [cell.strip() for cell in row.split("|")]
+
+
+def _add_table(document, rows: List[List[str]]):
+    """
+    This function adds a pipe table. Like pandoc, the header row fixes the number of columns and cells are
+    written in the template's "Compact" style.
+    """
+    columns = len(rows[0])
+    table = document.add_table(rows=len(rows), cols=columns)
+    table.style = document.styles["Table"]
+    header = table.rows[0]._tr.get_or_add_trPr()
+    header.append(OxmlElement("w:tblHeader"))
+    for row, cells in zip(table.rows, rows):
+        cells = (cells + [""] * columns)[:columns]
+        for cell, text in zip(row.cells, cells):
+            paragraph = cell.paragraphs[0]
+            paragraph.style = document.styles["Compact"]
+            _add_inline(paragraph, text)
+
+
+def _add_paragraph(document, lines: List[str], style: str):
+    """
+    This function adds a paragraph from consecutive markdown lines. Lines are joined by spaces, except
+    after a trailing backslash, which is a hard line break.
+    """
+    paragraph = document.add_paragraph(style=style)
+    for number, line in enumerate(lines):
+        hard_break = line.endswith("\\")
+        if hard_break:
+            line = line[:-1].rstrip()
+        _add_inline(paragraph, line)
+        if number < len(lines) - 1:
+            if hard_break:
+                paragraph.add_run().add_break()
+            else:
+                paragraph.add_run(" ")
+
+
+def _add_rule(document):
+    """
+    This function adds a horizontal rule as an empty paragraph with a bottom border.
+    """
+    paragraph = document.add_paragraph()
+    borders = OxmlElement("w:pBdr")
+    bottom = OxmlElement("w:bottom")
+    for attribute, value in (("w:val", "single"), ("w:sz", "6"), ("w:space", "1"), ("w:color", "auto")):
+        bottom.set(qn(attribute), value)
+    borders.append(bottom)
+    paragraph._p.get_or_add_pPr().append(borders)
+
+
+def _add_inline(paragraph, text: str):
+    """
+    This function adds text with `**bold**` and `*italic*` spans as runs, collapsing runs of whitespace as
+    pandoc does.
+    """
+    text = " ".join(text.split())
+    position = 0
+    for match in _INLINE.finditer(text):
+        if match.start() > position:
+            paragraph.add_run(_smarten(text[position : match.start()]))
+        if match.group(1) is not None:
+            paragraph.add_run(_smarten(match.group(1))).bold = True
+        else:
+            paragraph.add_run(_smarten(match.group(2))).italic = True
+        position = match.end()
+    if position < len(text):
+        paragraph.add_run(_smarten(text[position:]))
+
+
+def _smarten(text: str) -> str:
+    """
+    This function applies pandoc's smart typography: curly quotes, dashes and ellipses.
+    """
+    text = text.replace("---", "\u2014").replace("--", "\u2013").replace("...", "\u2026")
+    text = re.sub(r'(^|[\s(\[{])"', "\\1\u201c", text).replace('"', "\u201d")
+    text = re.sub(r"(^|[\s(\[{])'", "\\1\u2018", text).replace("'", "\u2019")
+    return text
+
+
+_docx_renderers = {}
+_docx_renderers_lock = threading.Lock()
+
+
+def get_docx_renderer(template: Path = config.TEMPLATE) -> DocxRenderer:
+    """
+    The function `get_docx_renderer` returns the renderer for `template` shared by every session of the
+    process, loading the template on first use.
+
+    Args:
+      template (Path): The pandoc reference .docx.
+
+    Returns:
+      The shared `DocxRenderer`.
+    """
+    with _docx_renderers_lock:
+        renderer = _docx_renderers.get(Path(template))
+        if renderer is None:
+            renderer = _docx_renderers[Path(template)] = DocxRenderer(template)
+        return renderer
+
+
+def render_docx(
+    markdown: str, workflow: str = "docx", run_id: Optional[str] = None, template: Path = config.TEMPLATE
+) -> bytes:
+    """
+    The function `render_docx` renders markdown as a .docx file with the shared renderer.
+
+    Args:
+      markdown (str): The generated markdown.
+      workflow (str): The workflow the markdown came from, for the timing log.
+      run_id (Optional[str]): The workflow run, for the timing log.
+      template (Path): The pandoc reference .docx.
+
+    Returns:
+      The .docx file as bytes.
+    """
+    return get_docx_renderer(template).render(markdown, workflow, run_id)
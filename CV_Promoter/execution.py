@@ -0,0 +1,114 @@
+import threading
+from typing import Optional
+
+from CV_Promoter.context_packing import (
+    PackedContextCache,
+    packed_context_cache,
+)
+from CV_Promoter.handler_cache import SearchHandlerCache, search_handler_cache
+from CV_Promoter.llm_scheduler import (
+    INTERACTIVE,
+    LLMScheduler,
+    get_llm_scheduler,
+)
+from CV_Promoter.response_cache import ResponseCache, get_response_cache
+
+
+class CostAccumulator:
+    """
+    The `CostAccumulator` class totals the tokens and cost of every model call made under one execution
+    context. It is thread-safe so that concurrently drafted sections can report into the same total.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_cost = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, response_meta):
+        """
+        This function adds the usage reported for one model call.
+
+        Args:
+          response_meta: The usage metadata of the call, such as the handler yielded by
+        `get_openai_callback`. Missing fields count as zero.
+        """
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += getattr(response_meta, "prompt_tokens", 0) or 0
+            self.completion_tokens += getattr(response_meta, "completion_tokens", 0) or 0
+            self.total_cost += getattr(response_meta, "total_cost", 0.0) or 0.0
+
+
+class ExecutionContext:
+    """
+    The `ExecutionContext` class carries everything a workflow needs from its surroundings: the chat
+    model, whether cached responses may be reused and whose they are, the cache handles, the cost
+    accumulator, and the scheduler and priority its model calls go through. Passing it explicitly keeps the
+    workflows independent of Streamlit, so they run the same way in the app, the batch CLI, worker threads
+    and worker processes.
+    """
+
+    def __init__(
+        self,
+        chat_config=None,
+        use_cache: bool = True,
+        response_cache: Optional[ResponseCache] = None,
+        search_handlers: SearchHandlerCache = search_handler_cache,
+        packed_contexts: PackedContextCache = packed_context_cache,
+        costs: Optional[CostAccumulator] = None,
+        model_name: Optional[str] = None,
+        priority: int = INTERACTIVE,
+        scheduler: Optional[LLMScheduler] = None,
+        cache_scope: Optional[str] = None,
+    ):
+        self.chat_config = chat_config
+        self.use_cache = use_cache
+        self._response_cache = response_cache
+        self.search_handlers = search_handlers
+        self.packed_contexts = packed_contexts
+        self.costs = costs or CostAccumulator()
+        self._model_name = model_name
+        self.priority = priority
+        self._scheduler = scheduler
+        # Responses cached under one scope are only reused within it; None shares them with every caller
+        self.cache_scope = cache_scope
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        """
+        The response cache used by this context, defaulting to the process-wide one on first use.
+        """
+        if self._response_cache is None:
+            self._response_cache = get_response_cache()
+        return self._response_cache
+
+    @property
+    def scheduler(self) -> LLMScheduler:
+        """
+        The scheduler admitting this context's model calls, defaulting to the process-wide one.
+        """
+        if self._scheduler is None:
+            self._scheduler = get_llm_scheduler()
+        return self._scheduler
+
+    @property
+    def model_name(self) -> Optional[str]:
+        """
+        The name of the chat model, used to pick a tokenizer. It can be given explicitly where no chat model
+        is available, such as in worker processes that only extract context.
+        """
+        return self._model_name or getattr(self.chat_config, "model_name", None)
+
+    def get_chat_config(self):
+        """
+        This function returns the chat model, failing clearly when the context has none.
+
+        Returns:
+          The chat model.
+        """
+        if self.chat_config is None:
+            raise ValueError("This execution context has no chat model; log in or pass chat_config.")
+        return self.chat_config
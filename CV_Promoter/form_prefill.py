@@ -0,0 +1,151 @@
+import re
+from typing import Dict, List, Mapping, NamedTuple, Optional, Union
+
+from CV_Promoter.cv_entries import CVEntries, CVEntry
+
+# Lines separating the items of a review form
+_ITEM_SEPARATOR = re.compile(r"^\s*---\s*$", re.MULTILINE)
+_ITEM_NUMBER = re.compile(r"^\s*\|\s*\*\*(\d+)\.", re.MULTILINE)
+_LEADING_NUMBER = re.compile(r"^\s*\(?\d+[.)]\s*")
+# Placeholders of the count and of the list in a countable item of a form
+_COUNT_PLACEHOLDER = re.compile(r"Number(\s*\|\s*)$")
+_LIST_PLACEHOLDER = "| Comment |"
+SEPARATOR = "\n\n---\n\n"
+
+
+class EntryQuery(NamedTuple):
+    """
+    The CV entries a countable form item lists: entries of `kind`, with publication `status` and research
+    or education `category` if given, dated in or after the review period. With `include_undated`, entries
+    without any date are listed as well, as manuscripts in press or under review often are.
+    """
+
+    kind: str
+    status: Optional[str] = None
+    category: Optional[str] = None
+    include_undated: bool = False
+
+
+def split_items(form: str) -> List[str]:
+    """
+    The function `split_items` splits a review form, or a filled one, into its items at the `---` lines.
+
+    Args:
+      form (str): The form markdown.
+
+    Returns:
+      The items, stripped of surrounding blank lines. Empty items are dropped.
+    """
+    return [item.strip("\n") for item in _ITEM_SEPARATOR.split(form) if item.strip()]
+
+
+def item_number(item: str) -> Optional[int]:
+    """
+    The function `item_number` reads the number of a form item from its bold title, e.g. 6 for
+    "| **6. Research manuscripts published (list citations)** | ...".
+
+    Args:
+      item (str): The item markdown.
+
+    Returns:
+      The item number, or None if the item is not numbered.
+    """
+    match = _ITEM_NUMBER.search(item)
+    return int(match.group(1)) if match else None
+
+
+class FormPrefill:
+    """
+    The `FormPrefill` class fills the countable items of a review form, such as the number and list of
+    manuscripts published, directly from the CV's typed entries, and leaves the rest of the form to the
+    model. The model is sent only the remaining items, which shrinks both the prompt and the completion,
+    and the filled items are merged back into its answer in form order. Counts computed this way are the
+    same on every run, but they are only as accurate as the CV's section headers, subheadings, tags and
+    dates.
+    """
+
+    def __init__(
+        self,
+        form: str,
+        queries: Dict[int, Union[EntryQuery, Mapping]],
+        entries: CVEntries,
+        start_year: int,
+    ):
+        self.start_year = start_year
+        self.filled: Dict[int, str] = {}
+        self.counts: Dict[int, int] = {}
+        remaining = []
+        for item in split_items(form) if queries else []:
+            number = item_number(item)
+            query = queries.get(number)
+            if query is None:
+                remaining.append(item)
+                continue
+            if not isinstance(query, EntryQuery):
+                query = EntryQuery(**query)  # as written in the instructions config
+            matches = self._select(entries, query)
+            self.counts[number] = len(matches)
+            self.filled[number] = self._fill_item(item, matches)
+        # A form without countable items is sent to the model unchanged
+        self.remaining_form = SEPARATOR.join(remaining) if self.filled else form
+
+    def _select(self, entries: CVEntries, query: EntryQuery) -> List[CVEntry]:
+        """
+        This function returns the entries a query selects, in document order.
+        """
+        selected = entries.since(query.kind, self.start_year)
+        if query.include_undated:
+            undated = [
+                entry for entry in entries.of_kind(query.kind) if not entry.years and not entry.ongoing
+            ]
+            selected = sorted(selected + undated, key=lambda entry: entry.offset)
+        if query.status is not None:
+            selected = [entry for entry in selected if entry.status == query.status]
+        if query.category is not None:
+            selected = [entry for entry in selected if entry.category == query.category]
+        return selected
+
+    @staticmethod
+    def _fill_item(item: str, matches: List[CVEntry]) -> str:
+        """
+        This function writes the count into the title row of an item and the numbered entries into its
+        comment cell. Entries are kept on one line so the table stays a valid pipe table.
+        """
+        lines = item.split("\n")
+        lines[0] = _COUNT_PLACEHOLDER.sub(lambda match: f"{len(matches)}{match.group(1)}", lines[0].rstrip())
+        listing = " ".join(
+            f"{number}. {_LEADING_NUMBER.sub('', ' '.join(entry.text.split())).replace('|', '/')}"
+            for number, entry in enumerate(matches, start=1)
+        )
+        filled = "\n".join(lines)
+        return filled.replace(_LIST_PLACEHOLDER, f"| {listing or 'None'} |", 1)
+
+    def prefilled_markdown(self) -> str:
+        """
+        This function returns the filled items alone, in form order.
+
+        Returns:
+          The markdown of the filled items, or an empty string if the form has none.
+        """
+        return SEPARATOR.join(self.filled[number] for number in sorted(self.filled))
+
+    def merge(self, generated: str) -> str:
+        """
+        This function merges the filled items into the model's answer. Every item the model wrote is placed
+        by its number; unnumbered text stays after the item it followed.
+
+        Args:
+          generated (str): The model's answer for the remaining items.
+
+        Returns:
+          The complete filled form.
+        """
+        if not self.filled:
+            return generated
+        items = []
+        number = 0
+        for order, item in enumerate(split_items(generated)):
+            number = item_number(item) or number
+            items.append((number, 0, order, item))
+        items.extend((number, 1, 0, item) for number, item in self.filled.items())
+        return SEPARATOR.join(item for *_, item in sorted(items))
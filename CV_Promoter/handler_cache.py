@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+
+class SearchHandlerCache:
+    """
+    The `SearchHandlerCache` class keeps one `SearchResponseHandler` per (CV content hash, chat model) so
+    that the retrieval and augmentation state built from a CV is reused by every workflow and rerun instead
+    of being rebuilt on each request. It is a bounded LRU cache shared by all sessions in the process.
+    """
+
+    def __init__(self, max_entries: int = config.SEARCH_HANDLER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Guards the entries and counters; handlers are built under their key's lock in `_build_locks`
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    @staticmethod
+    def _key(content_hash: str, chat_config) -> tuple:
+        """
+        This function returns the cache key for a CV and chat model. Chat models are not hashable, so they
+        are keyed by identity; each entry keeps a reference to its model so the identity stays valid.
+
+        Args:
+          content_hash (str): The content hash of the parsed CV.
+          chat_config: The chat model the handler was built with.
+
+        Returns:
+          The cache key.
+        """
+        return content_hash, id(chat_config)
+
+    def get_or_create(self, content_hash: str, chat_config, factory: Callable):
+        """
+        This function returns the cached handler for the CV and chat model, building it with `factory` on
+        first use. Each key has its own build lock: concurrent requests for the same CV build its handler
+        only once, while lookups and builds for other CVs proceed without waiting for it.
+
+        Args:
+          content_hash (str): The content hash of the parsed CV.
+          chat_config: The chat model the handler is built with.
+          factory (Callable): Builds the handler when it is not cached.
+
+        Returns:
+          The search response handler.
+        """
+        key = self._key(content_hash, chat_config)
+        handler = self._lookup(key)
+        if handler is not None:
+            return handler
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            # Another request may have built it while this one waited
+            handler = self._lookup(key)
+            if handler is not None:
+                return handler
+            try:
+                handler = factory()
+                with self._lock:
+                    self.misses += 1
+                    self._entries[key] = (chat_config, handler)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+
+        logger.info(f"Built search response handler for CV {content_hash[:12]} ({self.misses} built)")
+        return handler
+
+    def _lookup(self, key: tuple):
+        """
+        This function returns the cached handler for `key`, marking it as most recently used, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def invalidate(self, content_hash: str, chat_config: Optional[object] = None):
+        """
+        This function drops the handlers built for a CV, for example when the user uploads a new one.
+
+        Args:
+          content_hash (str): The content hash of the CV whose handlers should be dropped.
+          chat_config (Optional[object]): Only drop the handler built with this chat model. All handlers
+        for the CV are dropped when omitted.
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if key[0] == content_hash and (chat_config is None or key[1] == id(chat_config)):
+                    del self._entries[key]
+
+
+# Shared by every session served by this process
+search_handler_cache = SearchHandlerCache()
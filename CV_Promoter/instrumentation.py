@@ -0,0 +1,206 @@
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+PERCENTILES = (50, 90, 99)
+
+
+class Span:
+    """
+    The `Span` class times one stage of a workflow run. Attributes such as token counts or sizes can be
+    added while the stage runs and are exported with its duration.
+    """
+
+    def __init__(self, stage: str, workflow: str, run_id: Optional[str], attributes: dict):
+        self.stage = stage
+        self.workflow = workflow
+        self.run_id = run_id
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        """
+        This function adds attributes to the span.
+        """
+        self.attributes.update(attributes)
+
+    def to_record(self) -> dict:
+        """
+        This function returns the span as a JSON-serializable record.
+
+        Returns:
+          The span record.
+        """
+        return {
+            "ts": self.started_at,
+            "workflow": self.workflow,
+            "run_id": self.run_id,
+            "stage": self.stage,
+            "duration_ms": self.duration_ms,
+            **self.attributes,
+        }
+
+
+class JsonLinesExporter:
+    """
+    The `JsonLinesExporter` class appends span records as JSON lines to a file, by default
+    `logs/timings.jsonl`. The file is rotated once it reaches `max_bytes`, keeping `backup_count` earlier
+    files, so a long-running server does not fill the disk.
+    """
+
+    def __init__(
+        self,
+        path: Path = config.TIMINGS_LOG,
+        max_bytes: int = config.TIMINGS_LOG_MAX_BYTES,
+        backup_count: int = config.TIMINGS_LOG_BACKUPS,
+    ):
+        self.path = Path(path)
+        self._handler = RotatingFileHandler(
+            self.path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def export(self, record: dict):
+        """
+        This function writes one span record.
+
+        Args:
+          record (dict): The span record.
+        """
+        self._handler.handle(logging.makeLogRecord({"msg": json.dumps(record, default=str)}))
+
+
+class Tracer:
+    """
+    The `Tracer` class creates spans and hands finished spans to its exporters. Any object with an
+    `export(record)` method can be added as an exporter; a failing exporter is logged and never breaks the
+    workflow it is measuring.
+    """
+
+    def __init__(self, exporters: Optional[List] = None):
+        self.exporters = list(exporters or [])
+
+    def add_exporter(self, exporter):
+        """
+        This function registers an additional exporter.
+
+        Args:
+          exporter: An object with an `export(record)` method.
+        """
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, stage: str, workflow: str, run_id: Optional[str] = None, **attributes) -> Iterator[Span]:
+        """
+        This function times the enclosed block as one stage and exports it when the block exits, recording
+        the error type if it raised.
+
+        Args:
+          stage (str): The stage name, e.g. "llm_call".
+          workflow (str): The workflow type the stage belongs to.
+          run_id (Optional[str]): Identifier shared by the stages of one workflow run.
+          attributes: Initial attributes of the span.
+
+        Returns:
+          An iterator yielding the open span.
+        """
+        span = Span(stage, workflow, run_id, attributes)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as error:
+            span.set(error=type(error).__name__)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            self._export(span.to_record())
+
+    def _export(self, record: dict):
+        """
+        This function sends a record to every exporter.
+
+        Args:
+          record (dict): The span record.
+        """
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception:
+                logger.exception(f"Timing exporter {type(exporter).__name__} failed")
+
+
+# Shared by every workflow run in the process
+tracer = Tracer([JsonLinesExporter()])
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """
+    The function `percentile` returns the nearest-rank percentile of a list of values.
+
+    Args:
+      values (List[float]): The values, in any order.
+      percent (float): The percentile to compute, between 0 and 100.
+
+    Returns:
+      The smallest value such that at least `percent` percent of the values are less than or equal to it.
+    """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent * len(ordered) / 100))
+    return ordered[rank - 1]
+
+
+def summarize_timings(path: Path = config.TIMINGS_LOG) -> Dict[str, Dict[str, dict]]:
+    """
+    The function `summarize_timings` computes latency percentiles per workflow type and stage from a
+    JSON lines timing log, including the files it was rotated into.
+
+    Args:
+      path (Path): The timing log written by `JsonLinesExporter`.
+
+    Returns:
+      A nested dictionary workflow -> stage -> {"count", "p50", "p90", "p99"} with durations in ms.
+    """
+    path = Path(path)
+    backups = [backup for backup in path.parent.glob(f"{path.name}.*") if backup.suffix[1:].isdigit()]
+    backups.sort(key=lambda backup: int(backup.suffix[1:]), reverse=True)
+    durations = defaultdict(lambda: defaultdict(list))
+    for timings_path in [*backups, path]:
+        if not timings_path.exists():
+            continue
+        with open(timings_path, encoding="utf-8") as timings_file:
+            for line in timings_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                durations[record["workflow"]][record["stage"]].append(record["duration_ms"])
+
+    summary = {}
+    for workflow, stages in durations.items():
+        summary[workflow] = {}
+        for stage, values in stages.items():
+            stage_summary = {"count": len(values)}
+            for percent in PERCENTILES:
+                stage_summary[f"p{percent}"] = percentile(values, percent)
+            summary[workflow][stage] = stage_summary
+    return summary
+
+
+if __name__ == "__main__":
+    for workflow, stages in summarize_timings().items():
+        print(workflow)
+        for stage, stage_summary in stages.items():
+            print(
+                f"  {stage:<20} n={stage_summary['count']:<6} "
+                + " ".join(f"p{p}={stage_summary[f'p{p}']:.1f}ms" for p in PERCENTILES)
+            )
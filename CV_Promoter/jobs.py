@@ -0,0 +1,358 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+from CV_Promoter.cv_cache import load_parsed_cv
+from CV_Promoter.docx_render import render_docx
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.runner import WorkflowRequest, build_workflow, prepare_request
+from CV_Promoter.workflows import AnnualReviewSectionsDrafter
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Job(NamedTuple):
+    """
+    The state of one background workflow run.
+    """
+
+    id: str
+    workflow: str
+    focus: List[str]
+    status: str
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    expires_at: Optional[float]
+    error: Optional[str]
+
+    @property
+    def pending(self) -> bool:
+        """
+        Whether the job is still queued or running.
+        """
+        return self.status in (QUEUED, RUNNING)
+
+
+class JobStore:
+    """
+    The `JobStore` class keeps background jobs and their .docx artifacts in SQLite, so they outlive the
+    Streamlit script run, and the page, that submitted them. Jobs and artifacts are deleted once they
+    expire.
+    """
+
+    def __init__(self, path: Path = config.JOB_DB_PATH, ttl_seconds: int = config.JOB_TTL_SECONDS):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{os.uname().nodename}:{os.getpid()}"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    workflow TEXT NOT NULL,
+                    focus TEXT NOT NULL,
+                    start_date TEXT NOT NULL,
+                    cv_hash TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    expires_at REAL NOT NULL,
+                    error TEXT,
+                    markdown TEXT,
+                    docx BLOB
+                )"""
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_expires ON jobs (expires_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        This function opens a connection to the job database for one transaction, committing on success
+        and closing it afterwards.
+
+        Returns:
+          An iterator yielding the open SQLite connection.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, request: WorkflowRequest, cv_hash: str) -> str:
+        """
+        This function records a new queued job, then deletes the jobs that have expired, so the store is
+        purged while the server runs and not only when it starts.
+
+        Args:
+          request (WorkflowRequest): The workflow run to perform.
+          cv_hash (str): The content hash of the CV, to relate jobs to uploads.
+
+        Returns:
+          The id of the job.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, workflow, focus, start_date, cv_hash, status, owner, created_at, "
+                "expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id,
+                    request.workflow,
+                    json.dumps(list(request.focus)),
+                    request.start_date.isoformat(),
+                    cv_hash,
+                    QUEUED,
+                    self.owner,
+                    now,
+                    now + self.ttl_seconds,
+                ),
+            )
+            purged = connection.execute("DELETE FROM jobs WHERE expires_at < ?", (now,)).rowcount
+        if purged:
+            logger.info(f"Job store: {purged} expired jobs deleted")
+        return job_id
+
+    def start(self, job_id: str):
+        """
+        This function marks a job as running.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (RUNNING, time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, markdown: str, docx_data: bytes):
+        """
+        This function stores the result of a job and starts its expiry period.
+
+        Args:
+          job_id (str): The id of the job.
+          markdown (str): The generated markdown.
+          docx_data (bytes): The rendered .docx file.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, markdown = ?, docx = ? "
+                "WHERE id = ?",
+                (DONE, now, now + self.ttl_seconds, markdown, docx_data, job_id),
+            )
+
+    def fail(self, job_id: str, error: str):
+        """
+        This function records that a job failed.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, expires_at = ?, error = ? WHERE id = ?",
+                (FAILED, now, now + self.ttl_seconds, error, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        This function returns the state of a job.
+
+        Args:
+          job_id (str): The id of the job.
+
+        Returns:
+          The job, or None if it does not exist or has expired.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT id, workflow, focus, status, created_at, started_at, finished_at, expires_at, error "
+                "FROM jobs WHERE id = ? AND expires_at >= ?",
+                (job_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(row[0], row[1], json.loads(row[2]), *row[3:])
+
+    def artifact(self, job_id: str) -> Optional[bytes]:
+        """
+        This function returns the .docx file produced by a completed job.
+
+        Args:
+          job_id (str): The id of the job.
+
+        Returns:
+          The .docx bytes, or None if the job has not completed or has expired.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT docx FROM jobs WHERE id = ? AND status = ? AND expires_at >= ?",
+                (job_id, DONE, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def markdown(self, job_id: str) -> Optional[str]:
+        """
+        This function returns the markdown produced by a completed job, or None.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT markdown FROM jobs WHERE id = ? AND status = ? AND expires_at >= ?",
+                (job_id, DONE, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def purge_expired(self) -> int:
+        """
+        This function deletes expired jobs and their artifacts.
+
+        Returns:
+          The number of jobs deleted.
+        """
+        with self._connect() as connection:
+            return connection.execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def fail_orphaned(self) -> int:
+        """
+        This function fails the pending jobs of processes on this host that no longer exist, such as a
+        server that was restarted while jobs were in flight. Jobs of live processes are left alone.
+
+        Returns:
+          The number of jobs failed.
+        """
+        host = os.uname().nodename
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT id, owner FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+        orphaned = [job_id for job_id, owner in rows if _is_orphaned(owner, host)]
+        for job_id in orphaned:
+            self.fail(job_id, "The server restarted before the job finished. Please submit it again.")
+        return len(orphaned)
+
+
+def _is_orphaned(owner: str, host: str) -> bool:
+    """
+    This function tells whether the process that owns a job on `host` has exited.
+    """
+    owner_host, _, pid = owner.rpartition(":")
+    if owner_host != host:
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        return False
+    return False
+
+
+class JobQueue:
+    """
+    The `JobQueue` class runs workflows in the background. Submitting returns a job id immediately; the
+    job runs on a bounded thread pool in this process, with the caller's execution context so that it
+    uses the caller's chat model, the shared caches and the LLM scheduler. With `max_processes`, the CV
+    parsing and text extraction of each job run in a process pool first. Results are stored in the
+    `JobStore`, where they can be fetched by job id until they expire.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore] = None,
+        max_workers: int = config.JOB_WORKERS,
+        max_processes: int = 0,
+    ):
+        self.store = store or JobStore()
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cv-promoter-job")
+        self._processes = ProcessPoolExecutor(max_workers=max_processes) if max_processes else None
+        orphaned = self.store.fail_orphaned()
+        purged = self.store.purge_expired()
+        if orphaned or purged:
+            logger.info(f"Job store: {orphaned} interrupted jobs failed, {purged} expired jobs deleted")
+
+    def submit(
+        self, workflow: str, focus: List[str], start_date: date, cv_data: bytes, context: ExecutionContext
+    ) -> str:
+        """
+        This function queues a workflow run.
+
+        Args:
+          workflow (str): One of `runner.WORKFLOWS`.
+          focus (List[str]): The focus areas of the workflow.
+          start_date (date): The faculty member's start date.
+          cv_data (bytes): The uploaded .docx file.
+          context (ExecutionContext): The execution context of the submitting session.
+
+        Returns:
+          The id of the job.
+        """
+        request = WorkflowRequest(workflow, tuple(focus), start_date, cv_data)
+        parsed_cv = load_parsed_cv(cv_data)
+        job_id = self.store.create(request, parsed_cv.content_hash)
+        self._threads.submit(self._run, job_id, request, context)
+        logger.info(f"Queued job {job_id} ({workflow}, {', '.join(focus)})")
+        return job_id
+
+    def _run(self, job_id: str, request: WorkflowRequest, context: ExecutionContext):
+        """
+        This function performs a job and records its outcome.
+
+        Args:
+          job_id (str): The id of the job.
+          request (WorkflowRequest): The workflow run.
+          context (ExecutionContext): The execution context of the submitting session.
+        """
+        self.store.start(job_id)
+        try:
+            relevant_text = None
+            if self._processes is not None:
+                relevant_text = (
+                    self._processes.submit(prepare_request, request, context.model_name)
+                    .result()
+                    .relevant_text
+                )
+            parsed_cv = load_parsed_cv(request.cv_data)
+            workflow = build_workflow(request.workflow, request.focus, request.start_date, parsed_cv, context)
+            if isinstance(workflow, AnnualReviewSectionsDrafter):
+                markdown = workflow.combine(workflow.process())
+            else:
+                markdown = workflow.process(relevant_text).content
+            docx_data = render_docx(markdown, request.workflow, getattr(workflow, "run_id", None))
+            self.store.complete(job_id, markdown, docx_data)
+            logger.info(f"Job {job_id} done")
+        except Exception as error:
+            logger.exception(f"Job {job_id} failed")
+            self.store.fail(job_id, repr(error))
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """
+    The function `get_job_queue` returns the job queue shared by every session of the process.
+
+    Returns:
+      The shared `JobQueue`.
+    """
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(max_processes=config.JOB_PROCESSES)
+        return _job_queue
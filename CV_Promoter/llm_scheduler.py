@@ -0,0 +1,414 @@
+import heapq
+import itertools
+import math
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and server errors
+RETRYABLE_ERRORS = {"RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError"}
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class RateLimit(NamedTuple):
+    """
+    The quota of one deployment, as configured on Azure or granted by OpenAI.
+    """
+
+    requests_per_minute: float = config.LLM_REQUESTS_PER_MINUTE
+    tokens_per_minute: float = config.LLM_TOKENS_PER_MINUTE
+
+    def share(self, processes: int) -> "RateLimit":
+        """
+        This function returns the part of the quota one of `processes` processes drawing on it may use.
+        """
+        return RateLimit(self.requests_per_minute / processes, self.tokens_per_minute / processes)
+
+
+class TokenBucket:
+    """
+    The `TokenBucket` class refills continuously at `rate_per_minute` up to one minute's worth of capacity.
+    It is not thread-safe on its own; the scheduler guards it with its lock. A bucket with an infinite rate
+    never makes a caller wait.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.unlimited = math.isinf(rate_per_minute)
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.level = rate_per_minute
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        This function returns how long to wait until `amount` is available, or 0 if it is available now.
+        Amounts above the capacity are treated as the full capacity so they can still be served.
+        """
+        if self.unlimited:
+            return 0.0
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate_per_second) if missing > 0 else 0.0
+
+    def take(self, amount: float, now: float):
+        """
+        This function removes `amount` from the bucket. The level may go negative when a request used more
+        than was reserved for it, which delays the requests that follow.
+        """
+        if self.unlimited:
+            return
+        self._refill(now)
+        self.level -= amount
+
+
+class _DeploymentState:
+    """
+    The buckets, waiting queue and counters of one deployment.
+    """
+
+    def __init__(self, rate_limit: RateLimit):
+        self.requests = TokenBucket(rate_limit.requests_per_minute)
+        self.tokens = TokenBucket(rate_limit.tokens_per_minute)
+        self.waiting = []
+        self.blocked_until = 0.0
+        self.in_flight = 0
+        self.completed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self.queue_wait_seconds = 0.0
+
+
+class LLMScheduler:
+    """
+    The `LLMScheduler` class admits model calls for every session of the process. Each deployment has a
+    requests-per-minute and a tokens-per-minute token bucket. Waiting calls are served in priority order,
+    interactive before batch and first come first served within a priority, so a batch cannot starve the
+    app. Failed calls that are worth retrying are retried with exponential backoff and jitter; a
+    Retry-After header from the server takes precedence and also holds back the other calls to that
+    deployment. Queue depth and counters are available from `metrics`.
+    """
+
+    def __init__(
+        self,
+        default_limit: RateLimit = RateLimit(),
+        limits: Optional[Dict[str, RateLimit]] = None,
+        max_retries: int = config.LLM_MAX_RETRIES,
+        backoff_base_seconds: float = config.LLM_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = config.LLM_BACKOFF_MAX_SECONDS,
+    ):
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._deployments: Dict[str, _DeploymentState] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _state(self, deployment: str) -> _DeploymentState:
+        if deployment not in self._deployments:
+            self._deployments[deployment] = _DeploymentState(self.limits.get(deployment, self.default_limit))
+        return self._deployments[deployment]
+
+    def _acquire(self, deployment: str, tokens: int, priority: int) -> float:
+        """
+        This function blocks until the call is at the head of its deployment's queue and both buckets can
+        admit it, then takes one request and `tokens` tokens.
+
+        Args:
+          deployment (str): The deployment the call goes to.
+          tokens (int): The tokens reserved for the call.
+          priority (int): `INTERACTIVE` or `BATCH`.
+
+        Returns:
+          The time spent waiting, in seconds.
+        """
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        with self._condition:
+            state = self._state(deployment)
+            heapq.heappush(state.waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if state.waiting[0] == ticket:
+                        now = time.monotonic()
+                        timeout = max(
+                            state.blocked_until - now,
+                            state.requests.wait_time(1, now),
+                            state.tokens.wait_time(tokens, now),
+                        )
+                        if timeout <= 0:
+                            break
+                    self._condition.wait(timeout)
+            except BaseException:
+                state.waiting.remove(ticket)
+                heapq.heapify(state.waiting)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(state.waiting)
+            now = time.monotonic()
+            state.requests.take(1, now)
+            state.tokens.take(min(tokens, state.tokens.capacity), now)
+            state.in_flight += 1
+            waited = now - start
+            state.queue_wait_seconds += waited
+            self._condition.notify_all()
+
+        if waited > 1.0:
+            logger.info(
+                f"LLM call to {deployment} ({PRIORITY_NAMES.get(priority, priority)}) waited {waited:.1f}s "
+                f"for admission; {len(state.waiting)} still queued"
+            )
+        return waited
+
+    def _release(self, deployment: str, reserved_tokens: int, used_tokens: Optional[int], error=None):
+        """
+        This function ends a call, charging its deployment for tokens used beyond the reservation.
+        """
+        with self._condition:
+            state = self._state(deployment)
+            state.in_flight -= 1
+            if error is None:
+                state.completed += 1
+            if used_tokens:
+                reserved_tokens = min(reserved_tokens, state.tokens.capacity)
+                state.tokens.take(used_tokens - reserved_tokens, time.monotonic())
+            self._condition.notify_all()
+
+    def _backoff(self, deployment: str, attempt: int, error: Exception) -> float:
+        """
+        This function decides how long to wait before retrying and, on a rate limit, pauses the deployment
+        for everyone for that long.
+
+        Args:
+          deployment (str): The deployment the call went to.
+          attempt (int): The number of the failed attempt, starting at 0.
+          error (Exception): The error of the failed attempt.
+
+        Returns:
+          The delay in seconds.
+        """
+        retry_after = _retry_after_seconds(error)
+        if retry_after is None:
+            delay = min(self.backoff_max_seconds, self.backoff_base_seconds * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)  # jitter so concurrent callers do not retry in lockstep
+        else:
+            delay = retry_after + random.uniform(0.0, self.backoff_base_seconds)
+        with self._condition:
+            state = self._state(deployment)
+            state.retries += 1
+            if _status_code(error) == 429 or type(error).__name__ == "RateLimitError":
+                state.rate_limited += 1
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        logger.warning(f"LLM call to {deployment} failed ({type(error).__name__}); retrying in {delay:.1f}s")
+        return delay
+
+    def _give_up(self, deployment: str):
+        with self._condition:
+            self._state(deployment).failed += 1
+
+    def call(
+        self,
+        function: Callable,
+        deployment: str,
+        tokens: int,
+        priority: int = INTERACTIVE,
+        usage: Optional[Callable] = None,
+        span=None,
+    ):
+        """
+        This function runs one model call under the deployment's rate limits, retrying it if it fails with
+        a retryable error.
+
+        Args:
+          function (Callable): Makes the call; called without arguments, once per attempt.
+          deployment (str): The deployment the call goes to.
+          tokens (int): The tokens to reserve: the prompt plus the expected completion.
+          priority (int): `INTERACTIVE` or `BATCH`.
+          usage (Optional[Callable]): Returns the tokens actually used from the call's result.
+          span: A timing span to annotate with the queue wait and retries.
+
+        Returns:
+          The result of `function`.
+        """
+        queue_seconds = 0.0
+        for attempt in range(self.max_retries + 1):
+            queue_seconds += self._acquire(deployment, tokens, priority)
+            try:
+                result = function()
+            except Exception as error:
+                self._release(deployment, tokens, None, error)
+                if attempt == self.max_retries or not is_retryable(error):
+                    self._give_up(deployment)
+                    raise
+                time.sleep(self._backoff(deployment, attempt, error))
+                continue
+            self._release(deployment, tokens, usage(result) if usage else None)
+            if span is not None:
+                span.set(queue_wait_ms=round(queue_seconds * 1000, 3), retries=attempt)
+            return result
+
+    def stream(
+        self,
+        function: Callable[[], Iterator],
+        deployment: str,
+        tokens: int,
+        priority: int = INTERACTIVE,
+        span=None,
+    ) -> Iterator:
+        """
+        This function is the streaming counterpart of `call`. A failed attempt is only retried while nothing
+        has been yielded yet, since the caller may already have shown the earlier chunks.
+
+        Args:
+          function (Callable[[], Iterator]): Starts the stream; called once per attempt.
+          deployment (str): The deployment the call goes to.
+          tokens (int): The tokens to reserve.
+          priority (int): `INTERACTIVE` or `BATCH`.
+          span: A timing span to annotate with the queue wait and retries.
+
+        Returns:
+          An iterator over the chunks of the stream.
+        """
+        queue_seconds = 0.0
+        for attempt in range(self.max_retries + 1):
+            queue_seconds += self._acquire(deployment, tokens, priority)
+            started = False
+            try:
+                for chunk in function():
+                    if not started and span is not None:
+                        span.set(queue_wait_ms=round(queue_seconds * 1000, 3), retries=attempt)
+                    started = True
+                    yield chunk
+            except Exception as error:
+                self._release(deployment, tokens, None, error)
+                if started or attempt == self.max_retries or not is_retryable(error):
+                    self._give_up(deployment)
+                    raise
+                time.sleep(self._backoff(deployment, attempt, error))
+                continue
+            except BaseException:
+                # The consumer stopped early
+                self._release(deployment, tokens, None)
+                raise
+            self._release(deployment, tokens, None)
+            return
+
+    def metrics(self) -> Dict[str, dict]:
+        """
+        This function returns a snapshot of the queue depth and counters of every deployment.
+
+        Returns:
+          A dictionary mapping each deployment to its metrics.
+        """
+        with self._condition:
+            snapshot = {}
+            for deployment, state in self._deployments.items():
+                queued = {name: 0 for name in PRIORITY_NAMES.values()}
+                for priority, _ in state.waiting:
+                    queued[PRIORITY_NAMES.get(priority, str(priority))] += 1
+                snapshot[deployment] = {
+                    "queued": queued,
+                    "in_flight": state.in_flight,
+                    "completed": state.completed,
+                    "retries": state.retries,
+                    "rate_limited": state.rate_limited,
+                    "failed": state.failed,
+                    "queue_wait_seconds": round(state.queue_wait_seconds, 3),
+                    "request_budget": None if state.requests.unlimited else round(state.requests.level, 1),
+                    "token_budget": None if state.tokens.unlimited else round(state.tokens.level),
+                }
+            return snapshot
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """
+    This function returns the HTTP status code carried by an API error, if any.
+    """
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    This function reads the Retry-After delay the server sent with an error, in seconds.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None  # HTTP dates are rare here; fall back to exponential backoff
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    The function `is_retryable` tells whether a failed model call may succeed if repeated.
+
+    Args:
+      error (Exception): The error raised by the call.
+
+    Returns:
+      True for rate limits, timeouts, connection errors and server errors.
+    """
+    return type(error).__name__ in RETRYABLE_ERRORS or _status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def deployment_name(chat_config) -> str:
+    """
+    The function `deployment_name` returns the name rate limits are tracked under for a chat model: its
+    Azure deployment, else its model name.
+
+    Args:
+      chat_config: The chat model.
+
+    Returns:
+      The deployment name.
+    """
+    name = getattr(chat_config, "deployment_name", None) or getattr(chat_config, "model_name", None)
+    return name or "default"
+
+
+_llm_scheduler = None
+_llm_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """
+    The function `get_llm_scheduler` returns the scheduler shared by every session of the process. When
+    `config.LLM_RATE_LIMIT_SHARES` processes draw on the same deployments, as the worker processes of the
+    API do, each process admits its share of every quota so that together they keep to it.
+
+    Returns:
+      The shared `LLMScheduler`.
+    """
+    global _llm_scheduler
+    with _llm_scheduler_lock:
+        if _llm_scheduler is None:
+            shares = max(1, config.LLM_RATE_LIMIT_SHARES)
+            limits = {name: RateLimit(*limit).share(shares) for name, limit in config.LLM_RATE_LIMITS.items()}
+            _llm_scheduler = LLMScheduler(default_limit=RateLimit().share(shares), limits=limits)
+        return _llm_scheduler
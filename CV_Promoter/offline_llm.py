@@ -0,0 +1,174 @@
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import (
+    ChatGeneration,
+    ChatGenerationChunk,
+    ChatResult,
+)
+
+from CV_Promoter.context_packing import ContextPacker
+from CV_Promoter_config import api_config
+
+FILLER_SENTENCES = (
+    "Led a multidisciplinary team that improved perioperative outcomes across the department.",
+    "Secured extramural funding as principal investigator and mentored junior investigators.",
+    "Published peer-reviewed manuscripts in high impact anesthesiology journals.",
+    "Delivered invited lectures at national meetings and visiting professorships.",
+    "Developed curriculum for residents and fellows and received teaching awards.",
+    "Served on institutional committees and national society working groups.",
+    "Provided clinical care in the operating room and intensive care unit.",
+)
+
+_latency_random = random.Random()
+_latency_lock = threading.Lock()
+
+
+class OfflineChatModel(BaseChatModel):
+    """
+    The `OfflineChatModel` class is a local stand-in for the Azure and OpenAI chat models, used for load
+    tests and for measuring the application's own overhead without network calls or token charges.
+    Responses are deterministic markdown derived from the prompt: form tables in the prompt are echoed
+    with their cells filled in, and the length follows `completion_tokens`. Latency is random: the time to
+    the first token is drawn from a log-normal distribution and the rest of the response arrives at
+    `tokens_per_second`. Token usage is reported in the same form as OpenAI so `get_openai_callback` and
+    the cost accounting see it.
+    """
+
+    model_name: str = api_config.OFFLINE_MODEL_NAME
+    # Rate limits are tracked under this name whatever the model name, so a priced name stays unlimited
+    deployment_name: str = "offline"
+    temperature: float = 0.0
+    # Median and log-space standard deviation of the time to the first token
+    first_token_median_seconds: float = api_config.OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS
+    first_token_sigma: float = api_config.OFFLINE_FIRST_TOKEN_SIGMA
+    tokens_per_second: float = api_config.OFFLINE_TOKENS_PER_SECOND
+    completion_tokens: int = api_config.OFFLINE_COMPLETION_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline"
+
+    def _draft(self, prompt: str) -> str:
+        """
+        This function writes the response to a prompt. The same prompt always gives the same response.
+
+        Args:
+          prompt (str): The prompt text.
+
+        Returns:
+          The markdown response.
+        """
+        draft_random = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        sections = []
+        for line in prompt.splitlines():
+            if line.startswith("| **"):
+                # A form question: answer it in a table like the real model does
+                columns = line.count("|") - 1
+                sections.append(f"{line}\n|{'---|' * columns}\n| {draft_random.choice(FILLER_SENTENCES)} |")
+        # Pad with narrative text up to the target length, at roughly 0.75 words per token
+        word_count = sum(len(section.split()) for section in sections)
+        paragraph = []
+        while word_count < self.completion_tokens * 0.75:
+            sentence = draft_random.choice(FILLER_SENTENCES)
+            paragraph.append(sentence)
+            word_count += len(sentence.split())
+        if paragraph:
+            sections.append(" ".join(paragraph))
+        return "\n\n".join(sections)
+
+    def _first_token_delay(self) -> float:
+        """
+        This function draws the time to the first token.
+        """
+        with _latency_lock:
+            spread = _latency_random.lognormvariate(0.0, self.first_token_sigma)
+        return spread * self.first_token_median_seconds
+
+    def _usage(self, prompt: str, response: str) -> dict:
+        """
+        This function counts the tokens of a call in OpenAI's usage format.
+
+        Args:
+          prompt (str): The prompt text.
+          response (str): The response text.
+
+        Returns:
+          The prompt, completion and total token counts.
+        """
+        encoding = ContextPacker._get_encoding(self.model_name)
+        prompt_tokens = len(encoding.encode(prompt))
+        completion_tokens = len(encoding.encode(response))
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    @staticmethod
+    def _prompt_text(messages: List[BaseMessage]) -> str:
+        """
+        This function joins the prompt messages into one text.
+        """
+        return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        response = self._draft(prompt)
+        usage = self._usage(prompt, response)
+        time.sleep(self._first_token_delay() + usage["completion_tokens"] / self.tokens_per_second)
+        message = AIMessage(
+            content=response,
+            usage_metadata={
+                "input_tokens": usage["prompt_tokens"],
+                "output_tokens": usage["completion_tokens"],
+                "total_tokens": usage["total_tokens"],
+            },
+        )
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={"token_usage": usage, "model_name": self.model_name},
+        )
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt = self._prompt_text(messages)
+        response = self._draft(prompt)
+        usage = self._usage(prompt, response)
+        time.sleep(self._first_token_delay())
+        words = response.split(" ")
+        # Spread the completion tokens evenly over the streamed words
+        delay = usage["completion_tokens"] / self.tokens_per_second / max(len(words), 1)
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(delay)
+            content = word if index == 0 else " " + word
+            usage_metadata = None
+            if index == len(words) - 1:
+                usage_metadata = {
+                    "input_tokens": usage["prompt_tokens"],
+                    "output_tokens": usage["completion_tokens"],
+                    "total_tokens": usage["total_tokens"],
+                }
+            message = AIMessageChunk(content=content, usage_metadata=usage_metadata)
+            chunk = ChatGenerationChunk(message=message)
+            if run_manager:
+                run_manager.on_llm_new_token(content, chunk=chunk)
+            yield chunk
@@ -0,0 +1,145 @@
+import string
+from functools import lru_cache
+from typing import TYPE_CHECKING, FrozenSet, List, NamedTuple, Optional, Union
+
+from CV_Promoter.context_packing import PARAGRAPH_SEPARATOR, ContextPacker
+from CV_Promoter_config import config, prompt_config
+
+# The only variable the cached prefix may depend on: the CV context is the same for every request on a CV
+# that reads the same sections, whereas dates, focus areas and instructions vary from request to request
+PREFIX_VARIABLES = frozenset({"context"})
+
+if TYPE_CHECKING:
+    from langchain_core.prompt_values import ChatPromptValue
+
+
+class PrefixReport(NamedTuple):
+    """
+    The size of an assembled prompt's stable prefix and of the workflow instructions after it.
+    """
+
+    prefix_tokens: int
+    instruction_tokens: int
+    cacheable: bool
+
+
+def template_variables(template: str) -> FrozenSet[str]:
+    """
+    The function `template_variables` lists the variables a `str.format` template interpolates.
+
+    Args:
+      template (str): The template.
+
+    Returns:
+      The variable names.
+    """
+    variables = set()
+    for _, field_name, _, _ in string.Formatter().parse(template):
+        if field_name is not None:
+            if not field_name.isidentifier():
+                raise ValueError(f"Prompt templates take named variables only, not '{{{field_name}}}'.")
+            variables.add(field_name)
+    return frozenset(variables)
+
+
+class PromptLayout:
+    """
+    The `PromptLayout` class lays out a workflow's prompt so that providers can cache its long CV context.
+    The system message holds the shared system prompt and the CV context, and is the same for every
+    workflow run on the same extracted context; the workflow's role and instructions, with the per-request
+    variables such as the start date or focus area, come last in the human message. Compiling a layout
+    checks that no per-request variable reaches the prefix and that the context is not repeated in the
+    instructions.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        human_prompt: str,
+        prefix_template: Optional[str] = None,
+    ):
+        if prefix_template is None:
+            prefix_template = prompt_config.shared_system_prompt + "\n\n" + prompt_config.cv_context_template
+        self.prefix_template = prefix_template
+        self.instruction_template = system_prompt + "\n\n" + human_prompt
+
+        prefix_variables = template_variables(prefix_template)
+        if prefix_variables != PREFIX_VARIABLES:
+            unstable = ", ".join(sorted(prefix_variables - PREFIX_VARIABLES)) or "none"
+            raise ValueError(
+                f"The prompt prefix must interpolate exactly {sorted(PREFIX_VARIABLES)}; per-request "
+                f"variables in the prefix: {unstable}."
+            )
+        self.variables = template_variables(self.instruction_template)
+        if self.variables & PREFIX_VARIABLES:
+            raise ValueError("Workflow instructions must not repeat the CV context, which the prefix holds.")
+
+    def assemble(self, context: Union[str, List[str]], **variables) -> "ChatPromptValue":
+        """
+        This function assembles the prompt for one request.
+
+        Args:
+          context (Union[str, List[str]]): The CV context, as text or as the packed paragraphs.
+          variables: The values of the instruction variables. Values of variables the instructions do not
+        use are ignored.
+
+        Returns:
+          The prompt, as a system message with the prefix followed by a human message with the
+        instructions.
+        """
+        # langchain is only imported once a prompt is assembled, keeping it out of the app's cold start
+        from langchain_core.messages import HumanMessage, SystemMessage
+        from langchain_core.prompt_values import ChatPromptValue
+
+        if not isinstance(context, str):
+            context = PARAGRAPH_SEPARATOR.join(context)
+        missing = self.variables - variables.keys()
+        if missing:
+            raise KeyError(f"Missing prompt variables: {', '.join(sorted(missing))}.")
+        return ChatPromptValue(
+            messages=[
+                SystemMessage(content=self.prefix_template.format(context=context)),
+                HumanMessage(content=self.instruction_template.format(**variables)),
+            ]
+        )
+
+    @staticmethod
+    def report(assembled_prompt: "ChatPromptValue", model_name: Optional[str] = None) -> PrefixReport:
+        """
+        This function measures the cacheable prefix of an assembled prompt.
+
+        Args:
+          assembled_prompt (ChatPromptValue): A prompt returned by `assemble`.
+          model_name (Optional[str]): The chat model, to pick its tokenizer.
+
+        Returns:
+          The token counts of the prefix and of the instructions, and whether the prefix is long enough
+        for providers to cache it.
+        """
+        encoding = ContextPacker._get_encoding(model_name)
+        prefix, instructions = assembled_prompt.messages
+        prefix_tokens = len(encoding.encode(prefix.content))
+        return PrefixReport(
+            prefix_tokens=prefix_tokens,
+            instruction_tokens=len(encoding.encode(instructions.content)),
+            cacheable=prefix_tokens >= config.PROMPT_CACHE_MIN_TOKENS,
+        )
+
+
+@lru_cache(maxsize=64)
+def compile_layout(
+    system_prompt: str, human_prompt: str, prefix_template: Optional[str] = None
+) -> PromptLayout:
+    """
+    The function `compile_layout` compiles the layout of a workflow's prompts once per set of templates.
+
+    Args:
+      system_prompt (str): The workflow's role, placed at the start of its instructions.
+      human_prompt (str): The workflow's instruction template.
+      prefix_template (Optional[str]): The prefix template, by default the shared system prompt followed by
+    the CV context.
+
+    Returns:
+      The compiled `PromptLayout`.
+    """
+    return PromptLayout(system_prompt, human_prompt, prefix_template)
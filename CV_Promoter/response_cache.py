@@ -0,0 +1,188 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from CV_Promoter_config import config
+from CV_Promoter_config.config import logger
+
+
+class ResponseCache:
+    """
+    The `ResponseCache` class is a local, on-disk cache of generated responses backed by SQLite. Entries are
+    keyed by a hash of the workflow, the assembled prompt and the model settings, expire after a time to
+    live, and the least recently used entries are evicted once the cache holds more than `max_entries`.
+    """
+
+    def __init__(
+        self,
+        path: Path = config.RESPONSE_CACHE_PATH,
+        ttl_seconds: int = config.RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = config.RESPONSE_CACHE_MAX_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    workflow TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        This function opens a connection to the cache database for one transaction, committing on success
+        and closing it afterwards. A connection is opened per operation so the cache can be shared by
+        Streamlit's script threads and by worker processes.
+
+        Returns:
+          An iterator yielding the open SQLite connection.
+        """
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def make_key(workflow: str, prompt, chat_config, scope: Optional[str] = None) -> str:
+        """
+        This function computes the cache key of a request.
+
+        Args:
+          workflow (str): Name of the workflow issuing the request, e.g. its table name.
+          prompt: The assembled prompt, as passed to the chat model.
+          chat_config: The chat model; its model or deployment name and temperature are part of the key.
+          scope (Optional[str]): Keeps the responses of one user or API key apart from everyone else's. When
+        omitted, the response is shared by every caller of the process.
+
+        Returns:
+          The hexadecimal SHA-256 digest identifying the request.
+        """
+        key_material = {
+            "workflow": workflow,
+            "prompt": prompt_text(prompt),
+            "model": getattr(chat_config, "model_name", None),
+            "deployment": getattr(chat_config, "deployment_name", None),
+            "temperature": getattr(chat_config, "temperature", None),
+        }
+        if scope is not None:
+            key_material["scope"] = scope
+        return hashlib.sha256(json.dumps(key_material, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        The fraction of lookups answered from the cache since this process started.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        This function returns the cached response content for `key`, refreshing its last access time.
+        Expired entries count as misses.
+
+        Args:
+          key (str): The cache key from `make_key`.
+
+        Returns:
+          The cached content, or None on a miss.
+        """
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            row = connection.execute(
+                "SELECT content FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+
+        logger.info(
+            f"Response cache {'hit' if row else 'miss'} {key[:12]} "
+            f"(hits {self.hits}, misses {self.misses}, hit rate {self.hit_rate:.0%})"
+        )
+        return row[0] if row else None
+
+    def put(self, key: str, workflow: str, content: str):
+        """
+        This function stores a generated response, then drops expired entries and evicts the least recently
+        used ones beyond `max_entries`.
+
+        Args:
+          key (str): The cache key from `make_key`.
+          workflow (str): Name of the workflow that generated the response.
+          content (str): The generated response content.
+        """
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, workflow, content, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, workflow, content, now, now),
+            )
+            connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            connection.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+
+def prompt_text(prompt) -> str:
+    """
+    The function `prompt_text` renders an assembled prompt as text for hashing. Prompt values and message
+    lists are flattened into their roles and contents; anything else falls back to `str`.
+
+    Args:
+      prompt: The assembled prompt.
+
+    Returns:
+      A stable text rendering of the prompt.
+    """
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    if isinstance(prompt, (list, tuple)):
+        return "\n".join(
+            f"{getattr(message, 'type', '')}: {getattr(message, 'content', message)}" for message in prompt
+        )
+    return str(prompt)
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    The function `get_response_cache` returns the process-wide response cache, creating its database on
+    first use.
+
+    Returns:
+      The shared `ResponseCache`.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
@@ -0,0 +1,168 @@
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from docx import Document
+
+from CV_Promoter.cv_cache import load_parsed_cv
+from CV_Promoter.cv_parsing import ParsedCV
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.workflows import (
+    AnnualReviewDrafter,
+    AnnualReviewSectionsDrafter,
+    FormFiller,
+    NarrativePortfolioDrafter,
+    RecommendationLetterDrafter,
+)
+from CV_Promoter_config import config
+
+WORKFLOWS = ("AnnualReviewDrafter", "NarrativePortfolioDrafter", "RecommendationLetterDrafter")
+
+
+class WorkflowRequest(NamedTuple):
+    """
+    One workflow run on one CV. Requests are plain data so they can be sent to worker processes.
+    """
+
+    workflow: str
+    focus: Tuple[str, ...]
+    start_date: date
+    cv_data: bytes
+
+
+class PreparedRequest(NamedTuple):
+    """
+    The CPU-bound part of a request, done in a worker process: the CV's paragraphs and content hash and
+    the relevant text extracted for the workflow (per area for letters drafted per area).
+    """
+
+    request: WorkflowRequest
+    content_hash: str
+    paragraph_texts: List[str]
+    relevant_text: Union[str, List[str], Dict[str, List[str]], None]
+
+
+def build_workflow(
+    workflow: str, focus, start_date: date, cv_document, context: Optional[ExecutionContext] = None
+) -> Union[FormFiller, AnnualReviewSectionsDrafter]:
+    """
+    The function `build_workflow` creates the workflow object for a workflow name and its focus areas.
+
+    Args:
+      workflow (str): One of `WORKFLOWS`.
+      focus: The focus areas. Annual reviews with several areas are drafted concurrently.
+      start_date (date): The faculty member's start date, used by the portfolio and letter workflows.
+      cv_document: The CV, as a `Document` or `ParsedCV`.
+      context (Optional[ExecutionContext]): The execution context for the run.
+
+    Returns:
+      The workflow, ready to `process`.
+    """
+    focus = list(focus)
+    if workflow == "AnnualReviewDrafter":
+        if len(focus) == 1:
+            return AnnualReviewDrafter(focus[0], cv_document, context=context)
+        return AnnualReviewSectionsDrafter(focus, cv_document, context=context)
+    if workflow == "NarrativePortfolioDrafter":
+        return NarrativePortfolioDrafter(focus[0], start_date, cv_document, context=context)
+    if workflow == "RecommendationLetterDrafter":
+        return RecommendationLetterDrafter(focus, start_date, cv_document, context=context)
+    raise ValueError(f"Unknown workflow {workflow!r}; expected one of {', '.join(WORKFLOWS)}.")
+
+
+def prepare_request(request: WorkflowRequest, model_name: Optional[str] = None) -> PreparedRequest:
+    """
+    The function `prepare_request` parses the CV and extracts the workflow's relevant text. It runs in a
+    worker process, so it only touches picklable inputs and outputs and needs no chat model. The CV is
+    keyed by the hash of its file, as everywhere else, so drafts share search handlers and cached responses
+    with the app and the API.
+
+    Args:
+      request (WorkflowRequest): The request to prepare.
+      model_name (Optional[str]): The chat model name, used to count context tokens.
+
+    Returns:
+      The prepared request.
+    """
+    parsed_cv = load_parsed_cv(request.cv_data)
+    workflow = build_workflow(
+        request.workflow,
+        request.focus,
+        request.start_date,
+        parsed_cv,
+        ExecutionContext(model_name=model_name),
+    )
+    # Multi-section annual reviews extract per section when they run
+    relevant_text = workflow.prepare_relevant_text() if isinstance(workflow, FormFiller) else None
+    return PreparedRequest(request, parsed_cv.content_hash, parsed_cv.paragraph_texts, relevant_text)
+
+
+class WorkflowRunner:
+    """
+    The `WorkflowRunner` class executes many workflow requests at once. CV parsing and text extraction run
+    across cores in a `ProcessPoolExecutor`; the model calls, which wait on the network, then run on a
+    bounded thread pool in this process so that they share its caches and rate limits. Each workflow
+    assembles its prompt from its `prompt_layout` in the thread that calls the model, just before the call.
+    """
+
+    def __init__(
+        self,
+        context: ExecutionContext,
+        max_processes: Optional[int] = None,
+        max_threads: int = config.MAX_CONCURRENT_LLM_REQUESTS,
+    ):
+        self.context = context
+        self.max_processes = max_processes
+        self.max_threads = max_threads
+
+    def prepare(self, requests: List[WorkflowRequest]) -> Iterator[PreparedRequest]:
+        """
+        This function parses the CVs and extracts the relevant text of every request in worker processes.
+
+        Args:
+          requests (List[WorkflowRequest]): The requests to prepare.
+
+        Returns:
+          An iterator over prepared requests, in request order.
+        """
+        model_names = [self.context.model_name] * len(requests)
+        with ProcessPoolExecutor(max_workers=self.max_processes) as executor:
+            yield from executor.map(prepare_request, requests, model_names)
+
+    def generate(self, prepared_request: PreparedRequest) -> str:
+        """
+        This function assembles the prompt for a prepared request and generates its draft.
+
+        Args:
+          prepared_request (PreparedRequest): A request prepared by `prepare`.
+
+        Returns:
+          The generated markdown.
+        """
+        request = prepared_request.request
+        parsed_cv = ParsedCV(
+            prepared_request.paragraph_texts,
+            content_hash=prepared_request.content_hash,
+            document_loader=lambda: Document(io.BytesIO(request.cv_data)),
+        )
+        workflow = build_workflow(
+            request.workflow, request.focus, request.start_date, parsed_cv, self.context
+        )
+        if isinstance(workflow, AnnualReviewSectionsDrafter):
+            return workflow.combine(workflow.process())
+        return workflow.process(prepared_request.relevant_text).content
+
+    def run(self, requests: List[WorkflowRequest]) -> List[str]:
+        """
+        This function prepares every request across processes and generates the drafts concurrently.
+
+        Args:
+          requests (List[WorkflowRequest]): The requests to run.
+
+        Returns:
+          The generated markdown for each request, in request order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            futures = [executor.submit(self.generate, prepared) for prepared in self.prepare(requests)]
+            return [future.result() for future in futures]
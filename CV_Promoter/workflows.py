@@ -1,13 +1,87 @@
+import contextvars
+import time
+import uuid
 from abc import abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict, Iterator, List, Optional
 
 from dateutil.relativedelta import relativedelta
 from llm_utils.api_utils.AugmentedResponse import SearchResponseHandler
 from llm_utils.api_utils.WorkflowHandler import WorkflowHandler
 
-import streamlit as st
-from CV_Promoter.cv_parsing import CVParser
-from CV_Promoter_config import api_config, instructions_config, prompt_config
+from CV_Promoter.context_packing import ContextPacker, PackedContext
+from CV_Promoter.cv_parsing import CVParser, ParsedCV
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.form_prefill import FormPrefill
+from CV_Promoter.instrumentation import tracer
+from CV_Promoter.llm_scheduler import deployment_name
+from CV_Promoter.prompt_layout import PromptLayout, compile_layout
+from CV_Promoter.response_cache import ResponseCache, prompt_text
+from CV_Promoter_config import (
+    api_config,
+    config,
+    instructions_config,
+    prompt_config,
+)
+from CV_Promoter_config.config import logger
+
+
+def _token_counts(response_meta) -> dict:
+    """
+    This function reads the token counts reported for a model call, such as by `get_openai_callback`.
+
+    Args:
+      response_meta: The usage metadata of the call.
+
+    Returns:
+      A dictionary of prompt and completion token counts.
+    """
+    return {
+        "prompt_tokens": getattr(response_meta, "prompt_tokens", None),
+        "completion_tokens": getattr(response_meta, "completion_tokens", None),
+    }
+
+
+def _streamed_call_usage(text: str, usage_metadata, model_name: str):
+    """
+    This function accounts for a streamed call as `get_openai_callback` accounts for an invoked one: the
+    streamed text and the usage carried by its final chunk are passed to the same callback handler, which
+    counts the tokens and prices them for the model.
+
+    Args:
+      text (str): The streamed text.
+      usage_metadata: The usage metadata of the final chunk, or None if the model sent none.
+      model_name (str): The name of the model that answered, used to price the tokens.
+
+    Returns:
+      The callback handler holding the token counts and cost of the call.
+    """
+    from langchain_community.callbacks.openai_info import OpenAICallbackHandler
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, LLMResult
+
+    response_meta = OpenAICallbackHandler()
+    message = AIMessage(content=text, usage_metadata=usage_metadata)
+    response_meta.on_llm_end(
+        LLMResult(generations=[[ChatGeneration(message=message)]], llm_output={"model_name": model_name})
+    )
+    return response_meta
+
+
+def _text_size(relevant_text) -> str:
+    """
+    This function describes the size of extracted text for logging without logging the CV itself.
+
+    Args:
+      relevant_text: The extracted text, either a string or a list of paragraphs.
+
+    Returns:
+      A short description of the number of paragraphs and characters.
+    """
+    if isinstance(relevant_text, str):
+        return f"{len(relevant_text)} characters"
+    return f"{len(relevant_text)} paragraphs, {sum(len(text) for text in relevant_text)} characters"
 
 
 class FormFiller(WorkflowHandler):
@@ -16,13 +90,32 @@ class FormFiller(WorkflowHandler):
     handler, and updating the total cost.
     """
 
-    def __init__(self, start_date, cv_document, system_prompt, human_prompt, table_name):
+    # Maximum number of tokens of CV context placed in a prompt
+    context_token_budget = config.CONTEXT_TOKEN_BUDGET
+
+    def __init__(
+        self,
+        start_date,
+        cv_document,
+        system_prompt,
+        human_prompt,
+        table_name,
+        context: Optional[ExecutionContext] = None,
+    ):
         super().__init__()
         self.start_date = start_date
         self.cv_input = cv_document
+        self.context = context or ExecutionContext()
         self.system_prompt = system_prompt
         self.human_prompt = human_prompt
         self.table_name = table_name
+        self.generated_text = None
+        self.context_tokens = None
+        # Whether the last response came from the response cache, for example from a run on an earlier
+        # revision of the CV with the same relevant sections
+        self.reused_response = False
+        # Shared by the timing spans of this run
+        self.run_id = uuid.uuid4().hex[:12]
         self.start_year = self._get_start_year()
         self.cv_parser = CVParser(
             self.cv_input,
@@ -37,6 +130,73 @@ class FormFiller(WorkflowHandler):
     def _get_instructions(self):
         raise NotImplementedError
 
+    def _instruction_sets(self) -> List[Dict]:
+        """
+        This function returns the extraction instructions this workflow's context is built from, in
+        priority order.
+
+        Returns:
+          The list of instruction sets.
+        """
+        return [self._get_instructions()]
+
+    @property
+    def prompt_layout(self) -> PromptLayout:
+        """
+        The compiled layout of this workflow's prompts: the shared system prompt and the CV context first,
+        then `system_prompt` and `human_prompt` with the per-request variables.
+        """
+        return compile_layout(self.system_prompt, self.human_prompt)
+
+    def _span(self, stage: str, **attributes):
+        """
+        This function opens a timing span for one stage of this run, labelled with the workflow type.
+
+        Args:
+          stage (str): The stage name.
+          attributes: Initial attributes of the span.
+
+        Returns:
+          A context manager yielding the open span.
+        """
+        return tracer.span(stage, type(self).__name__, self.run_id, **attributes)
+
+    def _get_chat_config(self):
+        """
+        This function returns the chat model used for generation from the execution context.
+
+        Returns:
+          The chat model configured for this workflow.
+        """
+        return self.context.get_chat_config()
+
+    def _get_search_response(self):
+        """
+        This function returns the search response handler for this CV and chat model, reusing the one
+        built by an earlier request when possible.
+
+        Returns:
+          The shared `SearchResponseHandler`.
+        """
+        chat_config = self._get_chat_config()
+        return self.context.search_handlers.get_or_create(
+            self.cv_parser.parsed_cv.content_hash,
+            chat_config,
+            lambda: SearchResponseHandler(chat_config, self._get_cv_document()),
+        )
+
+    def _get_cv_document(self):
+        """
+        This function returns the python-docx `Document` behind the CV input, which may have been passed
+        either as a `Document` or as a cached `ParsedCV`.
+
+        Returns:
+          The CV document handed to the search response handler.
+        """
+        if isinstance(self.cv_input, ParsedCV):
+            return self.cv_input.document
+        return self.cv_input
+
     def _get_start_year(self):
         """
         This function returns the year of the start date.
@@ -57,53 +217,295 @@ class FormFiller(WorkflowHandler):
         function
 
         Returns:
-          the relevant text extracted using the provided instructions by calling the `extract_text` method
-        of `cv_parser`.
+          the relevant text extracted using the provided instructions, deduplicated and packed into the
+        context token budget.
+        """
+        return self._pack_context([instructions]).paragraphs
+
+    def _pack_context(self, instruction_sets) -> PackedContext:
+        """
+        The function extracts the CV paragraphs selected by each instruction set and packs them into
+        `context_token_budget`, recording and logging the resulting context size. A context packed before
+        from the same sections, for example of an earlier revision of the CV, is reused.
+
+        Args:
+          instruction_sets: Extraction instructions in priority order.
+
+        Returns:
+          The packed context.
         """
-        return self.cv_parser.extract_text(instructions)
+        with self._span("section_extraction") as span:
+            cache_key = (
+                self.cv_parser.context_fingerprint(instruction_sets),
+                self.context_token_budget,
+                self.context.model_name,
+            )
+            packed_context = self.context.packed_contexts.get(cache_key)
+            span.set(reused=packed_context is not None)
+            if packed_context is None:
+                packer = ContextPacker(self.context_token_budget, self.context.model_name)
+                packed_context = packer.pack(self.cv_parser, instruction_sets)
+                self.context.packed_contexts.put(cache_key, packed_context)
+            span.set(paragraphs=len(packed_context.paragraphs), context_tokens=packed_context.tokens)
+        self.context_tokens = packed_context.tokens
+        logger.info(
+            f"{self.table_name}: {packed_context.tokens} context tokens from "
+            f"{len(packed_context.paragraphs)} of {packed_context.candidates} extracted paragraphs "
+            f"({packed_context.duplicates} duplicates, {packed_context.dropped} over budget)"
+        )
+        return packed_context
 
-    def process(self):
+    def process(self, relevant_text=None):
         """
         The function processes a CV document by extracting relevant text, assembling a prompt, generating a
         response using a search response handler, and updating the total cost.
 
+        Args:
+          relevant_text: Text already extracted from the CV, for example by a worker process. It is
+        extracted here when omitted.
+
         Returns:
           The `process` method returns the `generated_response` after processing the search response,
         extracting relevant text from the CV document, assembling a prompt, and generating a response based
         on the assembled prompt.
         """
-        search_response = SearchResponseHandler(st.session_state.chat_config, self.cv_input)
-        instructions = self._get_instructions()
-        # Extract relevant text from CV document
-        relevant_text = self.extract_relevant_text(instructions)
-        print("relevant text - ", relevant_text)
-        print("Assembling Prompt")
-        # Assemble Prompt
-        assembled_prompt = self._assemble_prompt(search_response, relevant_text)
-        print("Generating Response")
-        generated_response, response_meta = search_response.generate_response(assembled_prompt)
+        from langchain_core.messages import AIMessage
+
+        context_key = self._get_context_cache_key()
+        cached_content = self._get_cached_response(context_key)
+        self.reused_response = cached_content is not None
+        if cached_content is not None:
+            return AIMessage(content=cached_content)
+
+        search_response, assembled_prompt = self._prepare_prompt(relevant_text)
+        cache_key = self._get_cache_key(assembled_prompt)
+        cached_content = self._get_cached_response(cache_key)
+        if cached_content is not None:
+            self.reused_response = True
+            self._cache_response(context_key, cached_content)
+            return AIMessage(content=cached_content)
+
+        with self._span("llm_call", streamed=False) as span:
+            generated_response, response_meta = self.context.scheduler.call(
+                lambda: search_response.generate_response(assembled_prompt),
+                deployment_name(self._get_chat_config()),
+                self._estimate_tokens(assembled_prompt),
+                self.context.priority,
+                usage=lambda result: result[1].total_tokens,
+                span=span,
+            )
+            span.set(**_token_counts(response_meta), response_chars=len(generated_response.content))
         self._update_total_cost(response_meta)
+        self.context.costs.add(response_meta)
+        self._cache_response(cache_key, generated_response.content)
+        self._cache_response(context_key, generated_response.content)
         return generated_response
 
+    def stream(self, relevant_text=None) -> Iterator[str]:
+        """
+        The function is the streaming counterpart of `process`. It yields the generated text chunk by chunk
+        as the model produces it, so the user sees the first tokens within seconds. The full text is
+        accumulated in `generated_text` and the cost is recorded once the stream is exhausted.
+
+        Args:
+          relevant_text: Text already extracted from the CV. It is extracted here when omitted.
+
+        Returns:
+          An iterator over the text chunks of the generated response.
+        """
+        context_key = self._get_context_cache_key()
+        cached_content = self._get_cached_response(context_key)
+        self.reused_response = cached_content is not None
+        if cached_content is not None:
+            self.generated_text = cached_content
+            yield cached_content
+            return
+
+        _, assembled_prompt = self._prepare_prompt(relevant_text)
+        cache_key = self._get_cache_key(assembled_prompt)
+        cached_content = self._get_cached_response(cache_key)
+        if cached_content is not None:
+            self.reused_response = True
+            self._cache_response(context_key, cached_content)
+            self.generated_text = cached_content
+            yield cached_content
+            return
+
+        chunks = []
+        usage_metadata = None
+        with self._span("llm_call", streamed=True) as span:
+            stream_start = time.perf_counter()
+            chat_config = self._get_chat_config()
+            model_name = getattr(chat_config, "model_name", None) or ""
+            chunk_stream = self.context.scheduler.stream(
+                # OpenAI only reports the usage of a streamed call, in a final chunk, when asked to
+                lambda: chat_config.stream(assembled_prompt, stream_options={"include_usage": True}),
+                deployment_name(chat_config),
+                self._estimate_tokens(assembled_prompt),
+                self.context.priority,
+                span=span,
+            )
+            for chunk in chunk_stream:
+                if not chunks:
+                    span.set(first_token_ms=round((time.perf_counter() - stream_start) * 1000, 3))
+                chunks.append(chunk.content)
+                usage_metadata = getattr(chunk, "usage_metadata", None) or usage_metadata
+                model_name = chunk.response_metadata.get("model_name") or model_name
+                yield chunk.content
+            self.generated_text = "".join(chunks)
+            response_meta = _streamed_call_usage(self.generated_text, usage_metadata, model_name)
+            span.set(**_token_counts(response_meta))
+        self._update_total_cost(response_meta)
+        self.context.costs.add(response_meta)
+        self._cache_response(cache_key, self.generated_text)
+        self._cache_response(context_key, self.generated_text)
+
+    def _estimate_tokens(self, assembled_prompt) -> int:
+        """
+        This function estimates the tokens a call will use, for rate limiting: the prompt's tokens plus the
+        expected completion.
+
+        Args:
+          assembled_prompt: The prompt about to be sent to the chat model.
+
+        Returns:
+          The estimated token count.
+        """
+        encoding = ContextPacker._get_encoding(self.context.model_name)
+        prompt_tokens = len(encoding.encode(prompt_text(assembled_prompt)))
+        return prompt_tokens + config.LLM_EXPECTED_COMPLETION_TOKENS
+
+    def _get_cache_key(self, assembled_prompt) -> str:
+        """
+        This function returns the response cache key for an assembled prompt under this workflow, chat
+        model and cache scope.
+
+        Args:
+          assembled_prompt: The prompt about to be sent to the chat model.
+
+        Returns:
+          The cache key.
+        """
+        return ResponseCache.make_key(
+            self.table_name, assembled_prompt, self._get_chat_config(), self.context.cache_scope
+        )
+
+    def _get_context_cache_key(self) -> str:
+        """
+        This function returns a second response cache key for this workflow, built from the context
+        fingerprint and the prompt templates instead of the assembled prompt. It can be computed without
+        extracting the context or building a search response handler, so a revised CV whose relevant
+        sections did not change is answered before any of that work.
+
+        Returns:
+          The cache key.
+        """
+        prompt_source = "\n\n".join(
+            [
+                self.cv_parser.context_fingerprint(self._instruction_sets()),
+                str(self.context_token_budget),
+                self.prompt_layout.prefix_template,
+                self.system_prompt,
+                self.human_prompt,
+                repr(self._get_instructions()),
+            ]
+        )
+        return ResponseCache.make_key(
+            f"{self.table_name}/context", prompt_source, self._get_chat_config(), self.context.cache_scope
+        )
+
+    def _get_cached_response(self, cache_key: str):
+        """
+        This function looks up a previously generated response, unless the user asked for a fresh sample.
+
+        Args:
+          cache_key (str): The key from `_get_cache_key`.
+
+        Returns:
+          The cached response content, or None.
+        """
+        if not self.context.use_cache:
+            return None
+        with self._span("cache_lookup") as span:
+            cached_content = self.context.response_cache.get(cache_key)
+            span.set(hit=cached_content is not None)
+        return cached_content
+
+    def _cache_response(self, cache_key: str, content: str):
+        """
+        This function stores a generated response so identical requests can be answered without a model
+        call. Fresh samples are stored as well and replace the previous entry.
+
+        Args:
+          cache_key (str): The key from `_get_cache_key`.
+          content (str): The generated response content.
+        """
+        self.context.response_cache.put(cache_key, self.table_name, content)
+
+    def prepare_relevant_text(self):
+        """
+        The function extracts the relevant text for this workflow from the CV. It needs no chat model, so
+        it can run ahead of time in a worker process.
+
+        Returns:
+          The relevant text, in the form this workflow passes to its prompt.
+        """
+        return self.extract_relevant_text(self._get_instructions())
+
+    def _prepare_prompt(self, relevant_text=None):
+        """
+        The function extracts the relevant text from the CV, unless it was extracted beforehand, and
+        assembles the prompt shared by `process` and `stream`.
+
+        Args:
+          relevant_text: Text already extracted from the CV.
+
+        Returns:
+          A tuple of the search response handler and the assembled prompt.
+        """
+        search_response = self._get_search_response()
+        if relevant_text is None:
+            # Extract relevant text from CV document
+            relevant_text = self.prepare_relevant_text()
+        logger.debug(f"{self.table_name}: relevant text {_text_size(relevant_text)}")
+        with self._span("prompt_assembly") as span:
+            assembled_prompt = self._assemble_prompt(search_response, relevant_text)
+            prefix = PromptLayout.report(assembled_prompt, self.context.model_name)
+            span.set(
+                prompt_chars=len(prompt_text(assembled_prompt)),
+                prefix_tokens=prefix.prefix_tokens,
+                instruction_tokens=prefix.instruction_tokens,
+                prefix_cacheable=prefix.cacheable,
+            )
+        logger.debug(
+            f"{self.table_name}: {prefix.prefix_tokens} prefix tokens"
+            f"{'' if prefix.cacheable else ' (too short to be cached)'}, "
+            f"{prefix.instruction_tokens} instruction tokens"
+        )
+        return search_response, assembled_prompt
+
 
 class AnnualReviewDrafter(FormFiller):
     """
     This Python class `AnnualReviewDrafter` initializes with focus areas and a CV document, generating
-    prompts and instructions for annual reviews based on the specified focus area.
+    prompts and instructions for annual reviews based on the specified focus area. Form items whose counts
+    and lists can be read from the CV's entries, listed under "prefill" in the focus area's instructions,
+    are filled before the model is called and left out of its prompt.
     """
 
-    def __init__(self, focus_area: str, cv_document):
+    def __init__(self, focus_area: str, cv_document, context: Optional[ExecutionContext] = None):
         self.focus_area = focus_area
-        print("focus area = ", self.focus_area)
         start_date = datetime.now() - relativedelta(years=1)
         super().__init__(
             start_date=start_date,
             cv_document=cv_document,
             system_prompt=prompt_config.review_system_template,
-            human_prompt=self._prep_human_prompt(),
+            human_prompt=None,
             table_name=api_config.REVIEW_TABLE_NAME,
+            context=context,
         )
-        print("start time  = ", self.start_date)
+        self.prefill = self._prefill_form()
+        self.human_prompt = self._prep_human_prompt()
 
     def _get_instructions(self):
         """
@@ -115,6 +517,55 @@ class AnnualReviewDrafter(FormFiller):
         """
         return instructions_config.section_instructions[self.focus_area]
 
+    def _prefill_form(self) -> FormPrefill:
+        """
+        This function fills the countable items of the focus area's form from the CV's entries dated in the
+        review period.
+
+        Returns:
+          The prefilled form.
+        """
+        instructions = self._get_instructions()
+        with self._span("form_prefill") as span:
+            prefill = FormPrefill(
+                instructions["form"], instructions.get("prefill", {}), self.cv_parser.entries, self.start_year
+            )
+            span.set(items=len(prefill.filled), entries=sum(prefill.counts.values()))
+        return prefill
+
+    def process(self, relevant_text=None):
+        """
+        The function drafts the items of the form left to the model, as `FormFiller.process` does, and
+        merges the prefilled items into the response. Only the model's part is cached, so a reused draft
+        still gets counts from the current CV.
+
+        Args:
+          relevant_text: Text already extracted from the CV. It is extracted here when omitted.
+
+        Returns:
+          The generated response, with the complete form as its content.
+        """
+        generated_response = super().process(relevant_text)
+        generated_response.content = self.prefill.merge(generated_response.content)
+        return generated_response
+
+    def stream(self, relevant_text=None) -> Iterator[str]:
+        """
+        The function streams the prefilled items first, since they are ready at once, and then the model's
+        answer. `generated_text` holds the complete form in form order once the stream is exhausted.
+
+        Args:
+          relevant_text: Text already extracted from the CV. It is extracted here when omitted.
+
+        Returns:
+          An iterator over the text chunks of the draft.
+        """
+        prefilled_markdown = self.prefill.prefilled_markdown()
+        if prefilled_markdown:
+            yield prefilled_markdown + "\n\n---\n\n"
+        yield from super().stream(relevant_text)
+        self.generated_text = self.prefill.merge(self.generated_text)
+
     def _prep_human_prompt(self):
         """
         The `_prep_human_prompt` function prepares a human prompt by combining various strings from
@@ -122,13 +573,13 @@ class AnnualReviewDrafter(FormFiller):
 
         Returns:
           The `_prep_human_prompt` function returns the prepped human prompt, which is a formatted string
-        containing the review human prefix, instructions for a specific focus area, and the review human
-        suffix.
+        containing the review human prefix, the form items of the focus area that were not prefilled, and the
+        review human suffix.
         """
         prepped_human_prompt = (
             prompt_config.review_human_prefix
             + "\n\n"
-            + instructions_config.section_instructions[self.focus_area]["form"]
+            + self.prefill.remaining_form
             + "\n\n"
             + prompt_config.review_human_suffix
         )
@@ -139,37 +590,103 @@ class AnnualReviewDrafter(FormFiller):
         The `_assemble_prompt` function assembles a prompt using various input parameters.
 
         Args:
-          search_response: The `search_response` parameter seems to be an object that contains information
-        related to a search response. It is used in the `_assemble_prompt` method to retrieve data needed
-        for assembling a prompt.
+          search_response: The search response handler of this CV. The prompt is laid out by
+        `prompt_layout` rather than by the handler's preparer, so it is not used here.
           relevant_text: The `relevant_text` parameter in the `_assemble_prompt` function is used to provide
         context or additional information that is relevant to the prompt being assembled. This text is
         typically used to help generate a more personalized or targeted prompt based on the specific content
         or context provided.
 
         Returns:
-          the assembled prompt generated by the `assemble_prompt` method of the `aug_service.preparer`
-        object in the `search_response` object. The assembled prompt is created using various parameters
-        such as `system_prompt`, `user_prompt`, `start_date`, `context`, and `category` provided to the
-        `assemble_prompt` method.
+          the assembled prompt laid out by `prompt_layout`: the shared system prompt and the CV context,
+        followed by the review instructions, form and `category`.
         """
-        assembled_prompt = search_response.aug_service.preparer.assemble_prompt(
-            system_prompt=self.system_prompt,
-            user_prompt=self.human_prompt,
+        assembled_prompt = self.prompt_layout.assemble(
+            relevant_text,
             start_date=self.start_year,
-            context=relevant_text,
             category=self.focus_area,
         )
         return assembled_prompt
 
 
+class AnnualReviewSectionsDrafter:
+    """
+    The `AnnualReviewSectionsDrafter` class drafts several annual review sections from one CV at once. The
+    CV is parsed a single time and one `AnnualReviewDrafter` per section runs on a bounded thread pool, so
+    the wall-clock time of a full review approaches that of its slowest section.
+    """
+
+    def __init__(
+        self,
+        focus_areas: List[str],
+        cv_document,
+        context: Optional[ExecutionContext] = None,
+        max_workers: int = config.MAX_CONCURRENT_LLM_REQUESTS,
+    ):
+        self.focus_areas = list(focus_areas)
+        if not isinstance(cv_document, ParsedCV):
+            cv_document = ParsedCV.from_document(cv_document)
+        self.cv_input = cv_document
+        self.context = context or ExecutionContext()
+        self.max_workers = max_workers
+        self.run_id = uuid.uuid4().hex[:12]
+        # Focus areas the last `process` call drafted, and those whose earlier draft it reused
+        self.regenerated: List[str] = []
+        self.reused: List[str] = []
+
+    def process(self) -> Dict[str, object]:
+        """
+        The function drafts every focus area concurrently. Each request runs in a copy of the caller's
+        context so that callbacks such as `get_openai_callback` still account for its tokens and cost. For
+        a revised CV, sections whose extracted context is unchanged reuse their earlier draft, so only the
+        sections the revision touched are regenerated.
+
+        Returns:
+          A dictionary mapping each focus area, in the requested order, to its generated response.
+        """
+        drafters = [
+            AnnualReviewDrafter(focus_area, self.cv_input, context=self.context)
+            for focus_area in self.focus_areas
+        ]
+        with tracer.span("all_sections", type(self).__name__, self.run_id, sections=len(drafters)):
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(drafters)))) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, drafter.process) for drafter in drafters
+                ]
+                generated_responses = {
+                    focus_area: future.result() for focus_area, future in zip(self.focus_areas, futures)
+                }
+        self.reused = [drafter.focus_area for drafter in drafters if drafter.reused_response]
+        self.regenerated = [drafter.focus_area for drafter in drafters if not drafter.reused_response]
+        logger.info(f"Drafted {len(self.regenerated)} sections, reused {len(self.reused)} unchanged sections")
+        return generated_responses
+
+    @staticmethod
+    def combine(generated_responses: Dict[str, object]) -> str:
+        """
+        The function stitches drafted sections into one markdown document, one heading per focus area.
+
+        Args:
+          generated_responses (Dict[str, object]): The responses returned by `process`.
+
+        Returns:
+          The combined markdown, ready for `convert_markdown_docx`.
+        """
+        return "\n\n".join(
+            f"## {focus_area}\n\n{generated_response.content}"
+            for focus_area, generated_response in generated_responses.items()
+        )
+
+
 class NarrativePortfolioDrafter(FormFiller):
     """
     The `NarrativePortfolioDrafter` class is a subclass of `FormFiller` that drafts narrative portfolios
     based on a specified focus area, start date, and CV document.
     """
 
-    def __init__(self, focus_area: str, start_date: datetime, cv_document):
+    def __init__(
+        self, focus_area: str, start_date: datetime, cv_document, context: Optional[ExecutionContext] = None
+    ):
         self.focus_area = focus_area
         super().__init__(
             start_date=start_date,
@@ -177,6 +694,7 @@ class NarrativePortfolioDrafter(FormFiller):
             system_prompt=prompt_config.narrative_system_template,
             human_prompt=prompt_config.narrative_human_template,
             table_name=api_config.NARRATIVE_TABLE_NAME,
+            context=context,
         )
 
     def _assemble_prompt(self, search_response, relevant_text):
@@ -184,25 +702,22 @@ class NarrativePortfolioDrafter(FormFiller):
         The `_assemble_prompt` function assembles a prompt using various input parameters.
 
         Args:
-          search_response: It looks like you were about to provide information about the `search_response`
-        parameter in the `_assemble_prompt` method. Could you please provide more details or complete the
-        information so that I can assist you further?
+          search_response: The search response handler of this CV. The prompt is laid out by
+        `prompt_layout` rather than by the handler's preparer, so it is not used here.
           relevant_text: The `relevant_text` parameter in the `_assemble_prompt` method is used to provide
-        context or additional information related to the search response. It is passed to the
-        `assemble_prompt` method as the `context` argument. This context can help in generating a more
+        context or additional information related to the search response. It is passed to
+        `PromptLayout.assemble` as the `context` argument. This context can help in generating a more
         tailored prompt based on the specific content or
 
         Returns:
-          the assembled prompt generated by the `assemble_prompt` method of the `aug_service.preparer`
-        object in the `search_response` object.
+          the assembled prompt laid out by `prompt_layout`: the shared system prompt and the CV context,
+        followed by the narrative instructions for the focus area.
         """
-        assembled_prompt = search_response.aug_service.preparer.assemble_prompt(
-            system_prompt=self.system_prompt,
-            user_prompt=self.human_prompt,
+        assembled_prompt = self.prompt_layout.assemble(
+            relevant_text,
             start_date=self.start_year,
-            context=relevant_text,
             narrative_section=self.focus_area,
-            narrative_instructions=self._get_instructions(),
+            narrative_instructions=self._get_instructions()["form"],
         )
         return assembled_prompt
 
@@ -217,21 +732,127 @@ class NarrativePortfolioDrafter(FormFiller):
         return instructions_config.narrative_instructions[self.focus_area]
 
 
+class LetterAreaDrafter(FormFiller):
+    """
+    The `LetterAreaDrafter` class drafts the paragraphs of a recommendation letter about one area of
+    excellence from that area's part of the CV alone. `RecommendationLetterDrafter` runs one per area in
+    parallel and composes their drafts into the letter.
+    """
+
+    # Each area's context is a share of the budget of a letter drafted in a single call
+    context_token_budget = config.LETTER_AREA_CONTEXT_TOKEN_BUDGET
+
+    def __init__(
+        self,
+        focus_area: str,
+        primary: bool,
+        start_date: datetime,
+        cv_document,
+        context: Optional[ExecutionContext] = None,
+    ):
+        self.focus_area = focus_area
+        self.emphasis = "primary" if primary else "secondary"
+        super().__init__(
+            start_date=start_date,
+            cv_document=cv_document,
+            system_prompt=prompt_config.letter_system_template,
+            human_prompt=(
+                prompt_config.letter_area_human_template
+                + "\n"
+                + prompt_config.letter_area_emphasis[self.emphasis]
+            ),
+            table_name=api_config.LETTER_AREA_TABLE_NAME,
+            context=context,
+        )
+
+    def _assemble_prompt(self, search_response, relevant_text):
+        """
+        The function `_assemble_prompt` assembles the prompt for this area's paragraphs.
+
+        Args:
+          search_response: The search response handler of this CV. The prompt is laid out by
+        `prompt_layout` rather than by the handler's preparer, so it is not used here.
+          relevant_text: The paragraphs extracted from this area's sections of the CV.
+
+        Returns:
+          The assembled prompt laid out by `prompt_layout`: the shared system prompt and the CV context,
+        followed by the letter instructions for this area and its emphasis in the letter.
+        """
+        return self.prompt_layout.assemble(
+            relevant_text,
+            start_date=self.start_year,
+            excellence_area=self.focus_area,
+            area_instructions=self._get_instructions()["form"],
+        )
+
+    def _get_instructions(self):
+        """
+        This function returns the narrative instructions of the area of excellence.
+
+        Returns:
+          The narrative instructions for `focus_area` from the `instructions_config` module.
+        """
+        return instructions_config.narrative_instructions[self.focus_area]
+
+
 class RecommendationLetterDrafter(FormFiller):
     """
     This Python class `RecommendationLetterDrafter` is designed to draft recommendation letters based on
     specified focus areas, start date, and CV document, utilizing prompts and instructions for each area
-    of interest.
+    of interest. With two areas and `per_area`, each area is drafted by a `LetterAreaDrafter` on its own
+    smaller context, concurrently, and a short merge call composes the drafts into the letter with the
+    first area as the primary one; otherwise the letter is drafted in a single call on the combined context.
     """
 
-    def __init__(self, focus_areas: list, start_date: datetime, cv_document):
-        self.sections_of_interest = focus_areas
+    def __init__(
+        self,
+        focus_areas: list,
+        start_date: datetime,
+        cv_document,
+        context: Optional[ExecutionContext] = None,
+        per_area: bool = config.LETTER_DRAFT_PER_AREA,
+    ):
+        # Ensure sections_of_interest is a list for consistency
+        if not isinstance(focus_areas, (list, tuple)):
+            focus_areas = [focus_areas]
+        self.sections_of_interest = list(focus_areas)
+        # A single area is already drafted on its own context
+        self.per_area = per_area and len(self.sections_of_interest) > 1
         super().__init__(
             start_date=start_date,
             cv_document=cv_document,
             system_prompt=prompt_config.letter_system_template,
-            human_prompt=prompt_config.letter_human_template,
+            human_prompt=(
+                prompt_config.letter_merge_human_template
+                if self.per_area
+                else prompt_config.letter_human_template
+            ),
             table_name=api_config.LETTER_TABLE_NAME,
+            context=context,
+        )
+        self.area_drafters: List[LetterAreaDrafter] = []
+        if self.per_area:
+            self.area_drafters = [
+                LetterAreaDrafter(
+                    section, index == 0, start_date, self.cv_parser.parsed_cv, context=self.context
+                )
+                for index, section in enumerate(self.sections_of_interest)
+            ]
+            for area_drafter in self.area_drafters:
+                area_drafter.run_id = self.run_id
+
+    @property
+    def prompt_layout(self) -> PromptLayout:
+        """
+        The compiled layout of this letter's prompts. The merge call of a letter drafted per area is laid out
+        with the area drafts in place of the CV context.
+        """
+        if not self.per_area:
+            return super().prompt_layout
+        return compile_layout(
+            self.system_prompt,
+            self.human_prompt,
+            prompt_config.shared_system_prompt + "\n\n" + prompt_config.letter_drafts_template,
         )
 
     def _assemble_prompt(self, search_response, relevant_text):
@@ -240,24 +861,26 @@ class RecommendationLetterDrafter(FormFiller):
         response.
 
         Args:
-          search_response: It looks like you were about to provide information about the `search_response`
-        parameter, but the information is missing. Could you please provide more details or complete the
-        information about the `search_response` parameter so that I can assist you further with the
-        `_assemble_prompt` method?
+          search_response: The search response handler of this CV. The prompt is laid out by
+        `prompt_layout` rather than by the handler's preparer, so it is not used here.
           relevant_text: The `_assemble_prompt` method takes in several parameters to create a prompt. Here
-        is a brief explanation of each parameter:
+        is a brief explanation of each parameter: For a letter drafted per area, it holds the area drafts.
 
         Returns:
-          The function `_assemble_prompt` returns the assembled prompt generated by the
-        `search_response.aug_service.preparer.assemble_prompt` method, which is constructed using various
-        parameters such as system_prompt, user_prompt, start_date, context, excellence_areas, and
-        area_instructions.
+          The function `_assemble_prompt` returns the assembled prompt laid out by `prompt_layout`: the
+        shared system prompt and the CV context, followed by the letter instructions with the
+        excellence_areas and area_instructions, or the merge prompt of a letter drafted per area.
         """
-        assembled_prompt = search_response.aug_service.preparer.assemble_prompt(
-            system_prompt=self.system_prompt,
-            user_prompt=self.human_prompt,
+        if self.per_area:
+            return self.prompt_layout.assemble(
+                relevant_text,
+                start_date=self.start_year,
+                excellence_areas=" & ".join(self.sections_of_interest),
+                primary_area=self.sections_of_interest[0],
+            )
+        assembled_prompt = self.prompt_layout.assemble(
+            relevant_text,
             start_date=self.start_year,
-            context=relevant_text,
             excellence_areas=" & ".join(self.sections_of_interest),
             area_instructions=self._get_instructions(),
         )
@@ -272,7 +895,6 @@ class RecommendationLetterDrafter(FormFiller):
           The `_get_instructions` method returns the area instructions for the sections of interest as a
         joined string with double newlines separating each instruction.
         """
-        print("joining area of interest instructions")
         area_instructions = "\n\n".join(
             [
                 instructions_config.narrative_instructions[section]["form"]
@@ -281,11 +903,21 @@ class RecommendationLetterDrafter(FormFiller):
         )
         return area_instructions
 
+    def _instruction_sets(self) -> List[Dict]:
+        """
+        This function returns the narrative instructions of every section of interest. The first section
+        of interest is the primary one and takes priority for the context budget.
+
+        Returns:
+          The list of instruction sets.
+        """
+        return [instructions_config.narrative_instructions[section] for section in self.sections_of_interest]
+
     def extract_relevant_text(self, instructions):
         """
         The function `extract_relevant_text` takes a list of instructions, extracts relevant text based on
         specified sections of interest, combines the extracted text from all sections, and returns the final
-        text as a string.
+        text as a string. For a letter drafted per area, each area's text is extracted separately.
 
         Args:
           instructions: It looks like the code snippet you provided is a method called
@@ -294,17 +926,59 @@ class RecommendationLetterDrafter(FormFiller):
 
         Returns:
           The `extract_relevant_text` method returns the final combined text extracted from the specified
-        sections of interest.
+        sections of interest, or for a letter drafted per area a dictionary mapping each area to its text.
         """
-        # Ensure sections_of_interest is a list for consistency
-        if not isinstance(self.sections_of_interest, (list, tuple)):
-            self.sections_of_interest = [self.sections_of_interest]
-
-        all_texts = []
-        for section in self.sections_of_interest:
-            instructions = instructions_config.narrative_instructions[section]
-            extracted_text = self.cv_parser.extract_text(instructions)
-            all_texts.extend(extracted_text)
-        final_text = "\n\n".join(all_texts)  # combine texts from all sections
-        print("final text - ", final_text)
+        if self.per_area:
+            return {
+                area_drafter.focus_area: area_drafter.prepare_relevant_text()
+                for area_drafter in self.area_drafters
+            }
+        packed_context = self._pack_context(self._instruction_sets())
+        final_text = "\n\n".join(packed_context.paragraphs)  # combine texts from all sections
         return final_text
+
+    def _prepare_prompt(self, relevant_text=None):
+        """
+        The function prepares the prompt as `FormFiller._prepare_prompt` does. For a letter drafted per area,
+        the areas are drafted first and their drafts take the place of the CV context.
+
+        Args:
+          relevant_text: Text already extracted from the CV, as returned by `prepare_relevant_text`.
+
+        Returns:
+          A tuple of the search response handler and the assembled prompt.
+        """
+        if self.per_area:
+            relevant_text = self._draft_areas(relevant_text)
+        return super()._prepare_prompt(relevant_text)
+
+    def _draft_areas(self, area_texts: Optional[Dict[str, object]] = None) -> str:
+        """
+        The function drafts the paragraphs of every area concurrently, each in a copy of the caller's
+        context so that callbacks such as `get_openai_callback` still account for its tokens and cost. Areas
+        whose context is unchanged reuse their earlier draft.
+
+        Args:
+          area_texts (Optional[Dict[str, object]]): Text already extracted for each area.
+
+        Returns:
+          The area drafts as markdown, one section per area in the requested order.
+        """
+        area_texts = area_texts or {}
+        with self._span("letter_areas", areas=len(self.area_drafters)) as span:
+            max_workers = max(1, min(config.MAX_CONCURRENT_LLM_REQUESTS, len(self.area_drafters)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        area_drafter.process,
+                        area_texts.get(area_drafter.focus_area),
+                    )
+                    for area_drafter in self.area_drafters
+                ]
+                area_drafts = [future.result().content for future in futures]
+            span.set(reused=sum(area_drafter.reused_response for area_drafter in self.area_drafters))
+        return "\n\n".join(
+            f"## {area_drafter.focus_area} ({area_drafter.emphasis} area)\n\n{area_draft}"
+            for area_drafter, area_draft in zip(self.area_drafters, area_drafts)
+        )
@@ -1,7 +1,6 @@
-from pathlib import Path
-
-from langchain.chat_models import ChatOpenAI
-from langchain_openai import AzureChatOpenAI
+import os
+from functools import lru_cache
+from typing import Optional
 
 NAME = "cv"
 
@@ -13,14 +12,83 @@ OPENAI_END_POINT = "https://api.openai.com/v1/engines"
 REVIEW_TABLE_NAME = "review_drafter"
 NARRATIVE_TABLE_NAME = "narrative_drafter"
 LETTER_TABLE_NAME = "letter_drafter"
+LETTER_AREA_TABLE_NAME = "letter_area_drafter"
+
+AZURE_DEPLOYMENT_NAME = "ChatGPT4"
+OPENAI_MODEL_NAME = "gpt-3.5-turbo"
 
-AZURE_CHAT_CONFIG = AzureChatOpenAI(
-    azure_endpoint=AZURE_END_POINT,
-    openai_api_version="2024-02-01",
-    deployment_name="ChatGPT4",
-    openai_api_type="azure",
-    temperature=0.5,
-    model_name="gpt-4",
+# Offline stand-in model for load tests and local development (provider "Offline", no API key needed).
+# Set OFFLINE_MODEL_NAME to a priced model such as "gpt-4" to have the callbacks estimate its cost. The
+# latency settings can be overridden from the environment, e.g. for API servers started by a load test.
+# The Home page and the API only accept it when CV_PROMOTER_ENABLE_OFFLINE is set; the command line and
+# the benchmarks can always use it.
+ENABLE_OFFLINE = os.environ.get("CV_PROMOTER_ENABLE_OFFLINE", "").lower() in ("1", "true", "yes")
+OFFLINE_MODEL_NAME = "offline"
+OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS = float(
+    os.environ.get("CV_PROMOTER_OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS", "1.0")
 )
+OFFLINE_FIRST_TOKEN_SIGMA = float(os.environ.get("CV_PROMOTER_OFFLINE_FIRST_TOKEN_SIGMA", "0.5"))
+OFFLINE_TOKENS_PER_SECOND = float(os.environ.get("CV_PROMOTER_OFFLINE_TOKENS_PER_SECOND", "40.0"))
+OFFLINE_COMPLETION_TOKENS = int(os.environ.get("CV_PROMOTER_OFFLINE_COMPLETION_TOKENS", "400"))
+
+# Chat clients are built on first use; these names are resolved lazily by `__getattr__`
+_LAZY_CHAT_CONFIGS = {"AZURE_CHAT_CONFIG": "Azure", "OPENAI_CHAT_CONFIG": "OpenAI"}
+
+
+@lru_cache(maxsize=32)
+def get_chat_config(provider: str, api_key: Optional[str] = None, deployment: Optional[str] = None):
+    """
+    The function `get_chat_config` builds the chat client for a provider on first use and memoizes it per
+    (provider, API key, deployment). The langchain and openai packages are only imported here, so importing
+    this module, and the workflows that read its table names, stays cheap.
+
+    Args:
+      provider (str): "Azure", "OpenAI", or "Offline" for the local stand-in model.
+      api_key (Optional[str]): The API key the client is for. Clients for different keys are kept apart.
+    When omitted, the client reads the key from the environment.
+      deployment (Optional[str]): The Azure deployment or OpenAI model name. Defaults to the configured one.
+
+    Returns:
+      The chat client.
+    """
+    # Passing the key to the client, rather than through OPENAI_API_KEY, lets one API server process serve
+    # users with different keys
+    key_arguments = {"openai_api_key": api_key} if api_key else {}
+    if provider == "Azure":
+        from langchain_openai import AzureChatOpenAI
+
+        return AzureChatOpenAI(
+            azure_endpoint=AZURE_END_POINT,
+            openai_api_version="2024-10-21",  # the first GA version that reports usage when streaming
+            deployment_name=deployment or AZURE_DEPLOYMENT_NAME,
+            openai_api_type="azure",
+            temperature=0.5,
+            model_name="gpt-4",
+            max_retries=0,  # retries are handled by the LLM scheduler
+            **key_arguments,
+        )
+    if provider == "OpenAI":
+        from langchain.chat_models import ChatOpenAI
+
+        return ChatOpenAI(
+            temperature=0.5,
+            model_name=deployment or OPENAI_MODEL_NAME,
+            request_timeout=300,
+            max_retries=0,  # retries are handled by the LLM scheduler
+            **key_arguments,
+        )
+    if provider == "Offline":
+        from CV_Promoter.offline_llm import OfflineChatModel
+
+        return OfflineChatModel(model_name=deployment or OFFLINE_MODEL_NAME)
+    raise ValueError(f"Unknown provider {provider!r}; expected 'Azure', 'OpenAI' or 'Offline'.")
+
 
-OPENAI_CHAT_CONFIG = ChatOpenAI(temperature=0.5, model_name="gpt-3.5-turbo", request_timeout=300)
+def __getattr__(name: str):
+    """
+    Keeps `AZURE_CHAT_CONFIG` and `OPENAI_CHAT_CONFIG` available as module attributes while deferring the
+    construction of the clients until they are first accessed.
+    """
+    if name in _LAZY_CHAT_CONFIGS:
+        return get_chat_config(_LAZY_CHAT_CONFIGS[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
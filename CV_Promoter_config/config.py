@@ -1,14 +1,58 @@
 # config.py
+import logging
+import logging.config
+import math
+import os
+import sys
 from pathlib import Path
 
+NAME = "cv_promoter"
+
 # Development Directories
 BASE_DIR = Path(__file__).parent.parent.absolute()
 CONFIG_DIR = Path(BASE_DIR, "config")
 LOGS_DIR = Path(BASE_DIR, "logs")
+# Per-stage workflow timings, one JSON object per line, rotated like the other logs once it reaches
+# TIMINGS_LOG_MAX_BYTES and keeping TIMINGS_LOG_BACKUPS earlier files (timings.jsonl.1, .2, ...)
+TIMINGS_LOG = Path(LOGS_DIR, "timings.jsonl")
+TIMINGS_LOG_MAX_BYTES = 10485760  # 10 MB
+TIMINGS_LOG_BACKUPS = 5
 
 # Assets
 ASSETS_DIR = Path(BASE_DIR, "assets")
 TEMPLATE = Path(ASSETS_DIR, "custom-reference.docx")
+# Section headers of the institution's CV format and the sections each workflow reads (see cv_schema.py).
+# Set CV_PROMOTER_CV_SCHEMA to the YAML or JSON schema of another institution to use its format instead.
+CV_SCHEMA_PATH = Path(os.environ.get("CV_PROMOTER_CV_SCHEMA", Path(ASSETS_DIR, "cv_schemas", "uab.yaml")))
+
+# Local caches
+CACHE_DIR = Path(BASE_DIR, "cache")
+RESPONSE_CACHE_PATH = Path(CACHE_DIR, "responses.sqlite")
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+
+# Background jobs: results and .docx artifacts are kept for JOB_TTL_SECONDS after they finish
+JOB_DB_PATH = Path(CACHE_DIR, "jobs.sqlite")
+JOB_TTL_SECONDS = 24 * 60 * 60
+JOB_WORKERS = 4
+# Worker processes for CV parsing and extraction of background jobs; 0 keeps it in the job thread
+JOB_PROCESSES = 0
+
+# Uploaded CVs and their paragraph texts, shared by the API's worker processes so a CV uploaded to one
+# worker is parsed once and can be drafted by any of them
+CV_STORE_PATH = Path(CACHE_DIR, "cvs.sqlite")
+CV_STORE_TTL_SECONDS = 24 * 60 * 60
+# Largest CV the API accepts
+MAX_CV_BYTES = 20 * 1024 * 1024
+
+# HTTP API (CV_Promoter/api.py): where it listens, how many uvicorn worker processes serve it, and where the
+# Streamlit front end reaches it. Users' API keys are sent in request headers, so keep the API on localhost or
+# reach it through a TLS-terminating proxy at an https:// API_URL.
+API_HOST = os.environ.get("CV_PROMOTER_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("CV_PROMOTER_API_PORT", "8000"))
+API_WORKERS = int(os.environ.get("CV_PROMOTER_API_WORKERS", "4"))
+API_URL = os.environ.get("CV_PROMOTER_API_URL", f"http://{API_HOST}:{API_PORT}")
+API_TIMEOUT_SECONDS = 600
 
 # Data Directories
 DATA_DIR = Path("/data/DATASCI")
@@ -17,3 +61,89 @@ INTERMEDIATE_DIR = Path(DATA_DIR, "intermediate")
 RESULTS_DIR = Path(DATA_DIR, "results")
 
 NIH_FUNDING_WINDOW = 11
+
+# Maximum number of tokens of extracted CV text placed in a single prompt
+CONTEXT_TOKEN_BUDGET = 12000
+
+# Shortest prompt prefix providers cache (OpenAI and Azure OpenAI cache prefixes of 1024 tokens or more)
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Upper bound on LLM requests a single multi-section draft issues at once
+MAX_CONCURRENT_LLM_REQUESTS = 3
+
+# Letters on two areas of excellence draft each area in parallel on its own context, then compose the letter
+# in a short merge call; each area's context gets this many tokens
+LETTER_DRAFT_PER_AREA = True
+LETTER_AREA_CONTEXT_TOKEN_BUDGET = 6000
+
+# Rate limits applied by the LLM scheduler to each deployment, shared by all sessions in the process.
+# Override per deployment in LLM_RATE_LIMITS as {deployment: (requests per minute, tokens per minute)}.
+LLM_REQUESTS_PER_MINUTE = 60
+LLM_TOKENS_PER_MINUTE = 80000
+# The offline stand-in model has no quota, so load tests and benchmarks measure the code, not the limits
+LLM_RATE_LIMITS = {"offline": (math.inf, math.inf)}
+# Number of processes drawing on the same quotas; each admits its share. The API's `serve` command sets it to
+# its worker count; set CV_PROMOTER_LLM_RATE_LIMIT_SHARES when starting the worker processes some other way.
+LLM_RATE_LIMIT_SHARES = int(os.environ.get("CV_PROMOTER_LLM_RATE_LIMIT_SHARES", "1"))
+# Completion tokens reserved for a call until its actual usage is known
+LLM_EXPECTED_COMPLETION_TOKENS = 1000
+LLM_MAX_RETRIES = 5
+LLM_BACKOFF_BASE_SECONDS = 1.0
+LLM_BACKOFF_MAX_SECONDS = 60.0
+
+# Number of parsed CVs kept in memory, shared by all sessions in the process
+PARSED_CV_CACHE_SIZE = 16
+# Number of search response handlers (one per CV and chat model) kept in memory
+SEARCH_HANDLER_CACHE_SIZE = 16
+# Number of packed prompt contexts kept in memory, so unchanged sections of a revised CV are not re-extracted
+PACKED_CONTEXT_CACHE_SIZE = 256
+# Number of rendered .docx drafts kept in memory, keyed by the hash of their markdown
+RENDER_CACHE_SIZE = 64
+
+# Logging
+LOGS_DIR.mkdir(parents=True, exist_ok=True)
+logging_config = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "minimal": {"format": "%(message)s"},
+        "detailed": {
+            "format": (
+                "%(levelname)s %(asctime)s [%(name)s:%(filename)s:%(funcName)s:%(lineno)d]\n%(message)s\n"
+            )
+        },
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "stream": sys.stdout,
+            "formatter": "minimal",
+            "level": logging.DEBUG,
+        },
+        "info": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": Path(LOGS_DIR, "info.log"),
+            "maxBytes": 10485760,  # 10 MB
+            "backupCount": 10,
+            "formatter": "detailed",
+            "level": logging.INFO,
+        },
+        "error": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": Path(LOGS_DIR, "error.log"),
+            "maxBytes": 10485760,  # 10 MB
+            "backupCount": 10,
+            "formatter": "detailed",
+            "level": logging.ERROR,
+        },
+    },
+    "loggers": {
+        NAME: {
+            "handlers": ["console", "info", "error"],
+            "level": logging.INFO,
+            "propagate": False,
+        },
+    },
+}
+logging.config.dictConfig(logging_config)
+logger = logging.getLogger(NAME)
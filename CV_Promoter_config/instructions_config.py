@@ -1,8 +1,38 @@
-# Define a dictionary to map sections of interest to extraction methods
+# Define a dictionary to map sections of interest to extraction methods. The CV sections each category
+# reads are named by "schema_ranges" and looked up in the institution's CV schema (see assets/cv_schemas)
+# when a CV is read.
 section_instructions = {
     "Scholarly Activity": {
-        "between": ("MAJOR RESEARCH INTERESTS:", "TEACHING EXPERIENCE:"),
-        "after_filter_years": "Grant Support",
+        "schema_ranges": ("annual_review", "Scholarly Activity"),
+        # Form items counted and listed from the CV's entries instead of by the model, as the keyword
+        # arguments of a `form_prefill.EntryQuery`. Research and education entries are told apart by the
+        # categories of the CV schema, so each manuscript and presentation is listed under one item only.
+        "prefill": {
+            6: {"kind": "publication", "status": "published", "category": "research"},
+            7: {"kind": "publication", "status": "in press", "category": "research", "include_undated": True},
+            8: {
+                "kind": "publication",
+                "status": "submitted",
+                "category": "research",
+                "include_undated": True,
+            },
+            9: {"kind": "presentation", "category": "research"},
+            11: {"kind": "publication", "status": "published", "category": "education"},
+            12: {
+                "kind": "publication",
+                "status": "in press",
+                "category": "education",
+                "include_undated": True,
+            },
+            13: {
+                "kind": "publication",
+                "status": "submitted",
+                "category": "education",
+                "include_undated": True,
+            },
+            14: {"kind": "book", "status": "published"},
+            15: {"kind": "presentation", "category": "education"},
+        },
         "form": """| **2. Current research projects (list title and objective)** |
 |---|
 | <For each project give 'Title:' and 'Objective:', separate lines with `\` followed by a new line rather than just a new line. Do this twice between projects> |
@@ -104,9 +134,7 @@ section_instructions = {
 | Comment |""",
     },
     "Teaching": {
-        "between": ("TEACHING EXPERIENCE", "GRANT SUPPORT"),
-        "between_filter_years": ("AWARDS/HONORS", "MAJOR RESEARCH INTERESTS"),
-        "after_filter_years": "MISCELLANEOUS",
+        "schema_ranges": ("annual_review", "Teaching"),
         "form": """| **2. Number of teaching awards** | Number |
 |---|---|
 | Comments |  |
@@ -148,8 +176,7 @@ section_instructions = {
 | Comment |""",
     },
     "Clinical Service": {
-        "between_filter_years": ("ACADEMIC APPOINTMENTS:", "MAJOR RESEARCH INTERESTS:"),
-        "after": "MANUSCRIPTS:",
+        "schema_ranges": ("annual_review", "Clinical Service"),
         "form": """| **3. Other quality improvement service activities (list and describe)** |
 |---|
 | Comment |
@@ -195,8 +222,7 @@ section_instructions = {
 
 narrative_instructions = {
     "Research": {
-        "between": ("MAJOR RESEARCH INTERESTS:", "TEACHING EXPERIENCE:"),
-        "after_filter_years": "Grant Support",
+        "schema_ranges": ("narrative", "Research"),
         "form": """All faculty are expected to engage in scholarly activities to some degree. To that end, scholarly work takes many 
 forms including research and other creative activities. A faculty member's effectiveness can be demonstrated by a 
 continuous track record of extramural funding, original peer reviewed publications and invited presentations at other 
@@ -238,9 +264,7 @@ Examples of activities that are valued, but by themselves do not reach the level
 4. Small scale publications, such as case reports, or educational materials. """,
     },
     "Teaching": {
-        "between": ("TEACHING EXPERIENCE", "GRANT SUPPORT"),
-        "between_filter_years": ("AWARDS/HONORS", "MAJOR RESEARCH INTERESTS"),
-        "after_filter_years": "MISCELLANEOUS",
+        "schema_ranges": ("narrative", "Teaching"),
         "form": """Superior and effective teaching is a distinct value for consideration of appointment promotion and/or tenure. All 
 faculty are expected to participate in the educational mission of the SOM in some manner. Student evaluations 
 should be solicited and, where possible, letters of support should also include colleague evaluations of teaching 
@@ -270,8 +294,7 @@ setting, or other specific area of expertise (this includes continuing education
 8. Serving as a member of education, curriculum, or admissions committees """,
     },
     "Service": {
-        "between_filter_years": ("ACADEMIC APPOINTMENTS:", "MAJOR RESEARCH INTERESTS:"),
-        "after": "MANUSCRIPTS:",
+        "schema_ranges": ("narrative", "Service"),
         "form": """Service functions are recognized as positive evidence for appointment, promotion and/or award of tenure provided 
 that this service emanates from the special competence of the individual in an assigned field and is an extension of 
 the individual's role as a scholar-teacher. In addition to service at UAB, participation at the level of the Birmingham 
@@ -1,11 +1,19 @@
+#######################
+# Shared Prompt Prefix
+#######################
+# Every prompt starts with these, so that the prompts for one CV share a prefix the provider can cache
+# (see CV_Promoter/prompt_layout.py). Only {context} may appear in them.
+shared_system_prompt = """You help faculty in an academic clinical department prepare the documents of their academic career from their curriculum vitae (CV): annual review forms, narrative portfolios for promotion, and letters of recommendation. The relevant parts of the CV follow. The document to prepare and its instructions are given after them."""
+
+cv_context_template = """Relevant CV elements:
+{context}"""
+
 ###########################
 # Review Prompt Components
 ###########################
 review_system_template = """You are an administrative assistant to clinical researchers. Your job is to help them prepare for their 2022-2023 academic year review by migrating information from their curriculum vitae (CV) to their annual review form. The big categories these questions will come from are teaching, service to the university, research, faculty development, and clinical service. Be careful about mixing the categories."""
 
-review_human_prefix = """Use the following context from this researcher's CV to fill part of their form composed of markdown tables. There is likely extra, irrelevant context provided.
-
-{context}
+review_human_prefix = """Use the context from this researcher's CV given above to fill part of their form composed of markdown tables. There is likely extra, irrelevant context provided.
 
 Big category: {category}
 Form to fill out:
@@ -20,10 +28,7 @@ narrative_system_template = """You are a faculty members in an academic clinical
 
 For each of these areas of excellence, you are allotted two pages for the narrative portfolio."""
 
-narrative_human_template = """You are currently writing the {narrative_section} element of your portfolio. Below are all of the relevant parts of your CV since your start date in the clinical department on {start_date}.
-
-Relevant CV elements:
-{context}
+narrative_human_template = """You are currently writing the {narrative_section} element of your portfolio. The relevant parts of your CV since your start date in the clinical department on {start_date} are given above.
 
 ---
 
@@ -47,10 +52,7 @@ You are writing a letter of recommendation for a colleague requesting promotion.
 It will advocate for their excellence in one or two of the areas of teaching, research, and service to the university.
 """
 
-letter_human_template = """The area(s) of excellence your colleague has asked you to focus on are {excellence_areas}. Focus primarily on the first. Below are all of the relevant parts of your their since their start date in the clinical department on {start_date}.
-
-Relevant CV elements:
-{context}
+letter_human_template = """The area(s) of excellence your colleague has asked you to focus on are {excellence_areas}. Focus primarily on the first. The relevant parts of their CV since their start date in the clinical department on {start_date} are given above.
 
 ---
 
@@ -63,3 +65,33 @@ Here are the instructions for these area of excellence section from the promotio
 Prepare up to two written pages using this context and these guidelines. The goal is to persuade the promotion committe your colleague has demonstrated excellence in this area, using specific examples. Respond with a properly formatted letter using markdown. 
 
 """
+
+# Letters on two areas of excellence are drafted one area at a time, in parallel, on that area's context
+# alone, and the area drafts are then composed into the letter by a merge call
+letter_area_human_template = """Your colleague has asked you to advocate for their excellence in {excellence_area}. The relevant parts of their CV since their start date in the clinical department on {start_date} are given above.
+
+---
+
+Here are the instructions for this area of excellence section from the promotion guidelines at your university:
+
+{area_instructions}
+
+---
+
+Write only the paragraphs of the letter about this area, using this context and these guidelines. The goal is to persuade the promotion committee your colleague has demonstrated excellence in this area, using specific examples. Leave out the greeting, the introduction of your colleague and the closing, which are written separately. Respond using markdown.
+"""
+
+letter_area_emphasis = {
+    "primary": "This is the primary area of the letter: write its main body, about one and a half written pages.",
+    "secondary": "This is the secondary area of the letter: write one or two paragraphs, about half a written page.",
+}
+
+letter_drafts_template = """Drafted paragraphs of the letter, one section per area of excellence:
+{context}"""
+
+letter_merge_human_template = """The area(s) of excellence your colleague has asked you to focus on are {excellence_areas}. Focus primarily on the first, {primary_area}. Paragraphs about each area, drafted from their CV since their start date in the clinical department on {start_date}, are given above.
+
+---
+
+Compose these paragraphs into one letter of up to two written pages. Add the greeting, an opening that introduces your colleague and the areas of excellence, transitions between the areas, and a closing that recommends promotion. Lead with and give the most weight to {primary_area}. Keep the specific examples of the drafted paragraphs, and do not add accomplishments they do not mention. Respond with a properly formatted letter using markdown.
+"""
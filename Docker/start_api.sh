@@ -0,0 +1,10 @@
+#!/bin/sh
+
+# Serves the CV Promoter API, which the Streamlit app drafts through, in the background unless it is already
+# up. cv-promoter-api starts CV_PROMOTER_API_WORKERS worker processes (4 by default) and divides the LLM rate
+# limits among them.
+cd "$(dirname "$0")/.."
+mkdir -p logs
+if ! curl -sf "http://127.0.0.1:${CV_PROMOTER_API_PORT:-8000}/health" > /dev/null; then
+    setsid nohup cv-promoter-api --workers "${CV_PROMOTER_API_WORKERS:-4}" >> logs/api.log 2>&1 < /dev/null &
+fi
@@ -4,3 +4,5 @@
 python3 -m pip install pip setuptools wheel
 python3 -m pip install -e ".[dev]"
 
+# the Streamlit app is a client of the API, which is started again on every container start
+"$(dirname "$0")/start_api.sh"
@@ -0,0 +1,230 @@
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+import typer
+from dateutil.relativedelta import relativedelta
+from load_test import RESULTS_DIR, TABS, RequestResult, summarize
+from synthetic_cv import CVSize, SyntheticCV
+
+from CV_Promoter.api_client import FAILED, APIClient, APIError
+from CV_Promoter_config import api_config, config
+
+app = typer.Typer(help="Simulate concurrent users of the HTTP API against the offline chat model.")
+
+# Longest wait for a freshly started server to answer /health
+STARTUP_TIMEOUT_SECONDS = 60
+
+
+def start_server(port: int, workers: int, environment: Dict[str, str]) -> subprocess.Popen:
+    """
+    The function `start_server` starts the API with `workers` uvicorn worker processes and waits until it
+    answers.
+
+    Args:
+      port (int): The port to serve on.
+      workers (int): Number of worker processes.
+      environment (Dict[str, str]): Environment variables of the server, such as the offline model's latency.
+
+    Returns:
+      The server process.
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "CV_Promoter.api", "--port", str(port), "--workers", str(workers)],
+        env={**os.environ, **environment},
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://{config.API_HOST}:{port}/health").raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"The API did not start on port {port}.")
+
+
+def run_tab(tab: str, client: APIClient, cv_hash: str, user_random: random.Random, use_cache: bool):
+    """
+    The function `run_tab` does what the thin Streamlit client does when a user presses the draft button of
+    `tab`: the annual review is submitted as a job and polled, the portfolio and letter are streamed, and
+    the .docx of the finished draft is downloaded.
+
+    Args:
+      tab (str): One of `TABS`.
+      client (APIClient): The simulated user's API client.
+      cv_hash (str): The hash of the user's uploaded CV.
+      user_random (random.Random): The simulated user's source of choices.
+      use_cache (bool): Whether identical requests may be answered from the response cache.
+
+    Returns:
+      The time to the first streamed chunk in seconds, or None for the annual review tab, which does not
+    stream.
+    """
+    start = time.perf_counter()
+    start_date = date.today() - relativedelta(years=5)
+    focus_areas = client.focus_areas()
+    first_chunk_seconds = None
+    if tab == "Annual Review":
+        section = user_random.choice(focus_areas["AnnualReviewDrafter"])
+        job_id = client.submit("AnnualReviewDrafter", [section], start_date, cv_hash, use_cache)
+        job = client.wait(job_id, poll_seconds=0.25)
+    else:
+        areas = focus_areas["NarrativePortfolioDrafter"]
+        if tab == "Promotion Portfolio":
+            workflow, focus = "NarrativePortfolioDrafter", [user_random.choice(areas)]
+        else:
+            workflow, focus = "RecommendationLetterDrafter", user_random.sample(areas, 2)
+        draft = client.stream(workflow, focus, start_date, cv_hash, use_cache)
+        for _ in draft:
+            if first_chunk_seconds is None:
+                first_chunk_seconds = time.perf_counter() - start
+        job = client.wait(draft.job_id, poll_seconds=0.1)
+    if job["status"] == FAILED:
+        raise APIError(500, job["error"])
+    client.docx(job["id"])
+    return first_chunk_seconds
+
+
+def simulate_user(
+    user: int,
+    base_url: str,
+    cv_variants: List[bytes],
+    requests_per_user: int,
+    think_seconds: float,
+    use_cache: bool,
+) -> List[RequestResult]:
+    """
+    The function `simulate_user` plays one user session over HTTP: the user uploads one of the CVs and then
+    visits the tabs in turn, pausing for an exponentially distributed think time between requests.
+
+    Args:
+      user (int): The user number, which also seeds the user's choices.
+      base_url (str): Where the API is served.
+      cv_variants (List[bytes]): The CVs users choose from.
+      requests_per_user (int): Number of draft requests the user makes.
+      think_seconds (float): Mean pause between requests.
+      use_cache (bool): Whether identical requests may be answered from the response cache.
+
+    Returns:
+      The result of each request.
+    """
+    user_random = random.Random(user)
+    client = APIClient("Offline", base_url=base_url)
+    results = []
+    try:
+        cv_hash = client.upload_cv(user_random.choice(cv_variants))["cv_hash"]
+        for request in range(requests_per_user):
+            tab = TABS[(user + request) % len(TABS)]
+            start = time.perf_counter()
+            try:
+                first_chunk_seconds = run_tab(tab, client, cv_hash, user_random, use_cache)
+                error = None
+            except Exception as exception:
+                first_chunk_seconds, error = None, repr(exception)
+            results.append(RequestResult(tab, time.perf_counter() - start, first_chunk_seconds, error))
+            if think_seconds > 0:
+                time.sleep(user_random.expovariate(1 / think_seconds))
+    finally:
+        client.close()
+    return results
+
+
+@app.command()
+def run(
+    workers: List[int] = typer.Option([1, 2, 4], help="API worker process counts to compare."),
+    port: int = typer.Option(8765, help="Port the API servers are started on."),
+    users: int = typer.Option(24, min=1, help="Concurrent simulated users."),
+    requests_per_user: int = typer.Option(6, min=1, help="Draft requests per user, cycling through tabs."),
+    think_seconds: float = typer.Option(0.5, help="Mean pause between a user's requests."),
+    cv_variants: int = typer.Option(3, min=1, help="Number of distinct CVs the users upload."),
+    publications: int = typer.Option(300, help="Manuscripts in each synthetic CV."),
+    first_token_median_seconds: float = typer.Option(api_config.OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS),
+    tokens_per_second: float = typer.Option(api_config.OFFLINE_TOKENS_PER_SECOND),
+    completion_tokens: int = typer.Option(api_config.OFFLINE_COMPLETION_TOKENS),
+    use_cache: bool = typer.Option(False, help="Answer repeated requests from the response cache."),
+    output_dir: Path = typer.Option(RESULTS_DIR, help="Where the JSON results are written."),
+):
+    """
+    Start the API with each number of `workers` in turn, simulate `users` concurrent sessions across the
+    three tabs against the offline chat model, and report how throughput and tail latency scale.
+    """
+    environment = {
+        "CV_PROMOTER_ENABLE_OFFLINE": "1",
+        "CV_PROMOTER_OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS": str(first_token_median_seconds),
+        "CV_PROMOTER_OFFLINE_TOKENS_PER_SECOND": str(tokens_per_second),
+        "CV_PROMOTER_OFFLINE_COMPLETION_TOKENS": str(completion_tokens),
+    }
+    size = CVSize(publications=publications, grants=publications // 5, presentations=publications)
+    cv_data = [SyntheticCV(size, seed).docx_bytes() for seed in range(cv_variants)]
+    base_url = f"http://{config.API_HOST}:{port}"
+
+    runs = {}
+    for worker_count in workers:
+        server = start_server(port, worker_count, environment)
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=users) as executor:
+                futures = [
+                    executor.submit(
+                        simulate_user, user, base_url, cv_data, requests_per_user, think_seconds, use_cache
+                    )
+                    for user in range(users)
+                ]
+                results = [result for future in futures for result in future.result()]
+            wall_seconds = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+        runs[worker_count] = {
+            "wall_seconds": wall_seconds,
+            "summary": summarize(results, wall_seconds),
+            "errors": sorted({result.error for result in results if result.error}),
+        }
+
+    baseline = runs[workers[0]]["summary"]["all"]["throughput_per_second"]
+    for worker_run in runs.values():
+        throughput = worker_run["summary"]["all"]["throughput_per_second"]
+        worker_run["speedup"] = throughput / baseline if baseline else None
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "workers": workers,
+            "users": users,
+            "requests_per_user": requests_per_user,
+            "think_seconds": think_seconds,
+            "cv_variants": cv_variants,
+            "publications": publications,
+            "first_token_median_seconds": first_token_median_seconds,
+            "tokens_per_second": tokens_per_second,
+            "completion_tokens": completion_tokens,
+            "use_cache": use_cache,
+        },
+        "runs": runs,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output = Path(output_dir, f"api_load_test_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2))
+
+    for worker_count, worker_run in runs.items():
+        summary = worker_run["summary"]["all"]
+        typer.echo(
+            f"{worker_count:>3} workers {summary['requests']:>5} requests {summary['errors']:>4} errors "
+            f"{summary['throughput_per_second']:.2f}/s  p50={summary['latency_p50_s'] or 0:.2f}s "
+            f"p99={summary['latency_p99_s'] or 0:.2f}s  speedup x{worker_run['speedup'] or 0:.2f}"
+        )
+    typer.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,248 @@
+import json
+import random
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+
+import typer
+from synthetic_cv import CVSize, SyntheticCV
+
+from CV_Promoter.cv_parsing import CVParser, ParsedCV, extract_years
+from CV_Promoter_config import instructions_config
+
+app = typer.Typer(help="Check the date grammar against the original year filter and benchmark it.")
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Dates and fragments as they appear in CVs, including the edge cases of the original patterns: two-digit
+# years on either side of the century pivot, en dashes, dates run together, invalid months and days, and
+# numbers that only look like dates
+CORPUS_TOKENS = (
+    "2024",
+    "2025",
+    "2023",
+    "1999",
+    "2026",
+    "2037",
+    "2040",
+    "24",
+    "25",
+    "99",
+    "0",
+    "01/02/24",
+    "1/2/2025",
+    "12-2024",
+    "03/25",
+    "09/2024-10/2025",
+    "11/30/1999",
+    "13/12/24",
+    "10/2025/11",
+    "12–31–25",
+    "05-06-07",
+    "Mar 3, 24",
+    "March 29, 2023",
+    "Jan 1 26",
+    "Dec 5, 2025",
+    "Sept 14, 19",
+    "present",
+    "Present.",
+    "Current",
+    "current.",
+    "ongoing",
+    "–",
+    "/",
+    "-",
+    "abc",
+    "R01 HL123456",
+    "2019;12:1-8",
+    "pp. 1987-1993",
+    "doi:10.1097/ALN.2022",
+    "$250,000",
+)
+# Paragraphs drawn at random from the tokens, per start year
+RANDOM_PARAGRAPHS = 100000
+START_YEAR_OFFSETS = (1, 5, 11, 26)
+
+
+def legacy_is_date_in_range(text: str, present_year: int, differential: int) -> bool:
+    """
+    The function `legacy_is_date_in_range` is the year filter as it was before the date grammar was
+    precompiled: eight patterns searched on every call. It is kept here as the reference the grammar is
+    checked against.
+
+    Args:
+      text (str): The paragraph.
+      present_year (int): The year of the review.
+      differential (int): The number of years after `present_year` still in range.
+
+    Returns:
+      True if the paragraph mentions a year in range, or "present" or "current".
+    """
+    date_patterns = [
+        r"\b(0?[1-9]|1[0-2])[-/–](0?[1-9]|[12]\d|3[01])[-/–](\d{2})\b",
+        r"\b(0?[1-9]|1[0-2])[-/–](0?[1-9]|[12]\d|3[01])[-/–](\d{4})\b",
+        r"\b(0[1-9]|1[0-2])[-/](0[1-9]|[12]\d|3[01])[-/](\d{2})\b",
+        r"\b(0[1-9]|1[0-2])[-/](0[1-9]|[12]\d|3[01])[-/](\d{4})\b",
+        r"\b(0[1-9]|1[0-2])[-/](\d{2})\b(?![-/]\d{2})",
+        r"\b(0[1-9]|1[0-2])[-/](\d{4})\b",
+        r"\b(\d{4})\b",
+        r"\b(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+(\d{2,4})\b",
+    ]
+    for pattern in date_patterns:
+        for match in re.findall(pattern, text):
+            year = match[-1] if isinstance(match, tuple) else match.split("/")[-1]
+            if "," in year:
+                year = year.split(",")[-1].strip()
+            if len(year) == 2:
+                year = "20" + year if int(year) < present_year % 100 else "19" + year
+            if present_year - 1 <= int(year) <= present_year + differential:
+                return True
+    return ("present" in text.lower()) or ("current" in text.lower())
+
+
+def legacy_should_include(text: str, present_year: int, differential: int) -> bool:
+    """
+    The function `legacy_should_include` is the original inclusion decision for a paragraph filtered by
+    year.
+    """
+    return bool(
+        text.strip()
+        and (
+            legacy_is_date_in_range(text, present_year, differential)
+            or "present" in text.lower().split()
+            or "current" in text.lower().split()
+        )
+    )
+
+
+def build_corpus(size: CVSize, seed: int) -> List[str]:
+    """
+    The function `build_corpus` collects the paragraphs the two filters are compared on: every token on
+    its own, random runs of tokens with and without spaces, and the paragraphs of a synthetic CV.
+
+    Args:
+      size (CVSize): The size of the synthetic CV.
+      seed (int): Seeds the random paragraphs and the synthetic CV.
+
+    Returns:
+      The paragraphs.
+    """
+    corpus_random = random.Random(seed)
+    corpus = list(CORPUS_TOKENS)
+    for _ in range(RANDOM_PARAGRAPHS):
+        text = " ".join(corpus_random.choice(CORPUS_TOKENS) for _ in range(corpus_random.randint(1, 5)))
+        corpus.append(text.replace(" ", "") if corpus_random.random() < 0.3 else text)
+    corpus.extend(SyntheticCV(size, seed).paragraphs())
+    return corpus
+
+
+def check_equivalence(corpus: List[str]) -> Dict:
+    """
+    The function `check_equivalence` compares the inclusion decision of `CVParser` with the original
+    filter for every paragraph of the corpus and several start years.
+
+    Args:
+      corpus (List[str]): The paragraphs.
+
+    Returns:
+      The number of decisions compared and the first mismatches found.
+    """
+    mismatches = []
+    decisions = 0
+    for offset in START_YEAR_OFFSETS:
+        parser = CVParser(ParsedCV([]), datetime.now().year - offset)
+        for text in corpus:
+            expected = legacy_should_include(text, parser.present_year, parser.differential)
+            decisions += 1
+            if bool(parser._should_include(text, True)) != expected:
+                mismatches.append({"text": text, "start_year": parser.start_year, "expected": expected})
+    return {"decisions": decisions, "mismatches": len(mismatches), "examples": mismatches[:10]}
+
+
+def benchmark(paragraphs: List[str], passes: int) -> Dict:
+    """
+    The function `benchmark` times filtering every paragraph of a CV by year, once from a cold year cache
+    and `passes` times in a row as the instructions of the workflows do, with the original filter and with
+    the date grammar.
+
+    Args:
+      paragraphs (List[str]): The paragraphs of the CV.
+      passes (int): Number of filtered passes over the CV.
+
+    Returns:
+      The timings in seconds.
+    """
+    parser = CVParser(ParsedCV(paragraphs), datetime.now().year - 5)
+
+    start = time.perf_counter()
+    for _ in range(passes):
+        for text in paragraphs:
+            legacy_should_include(text, parser.present_year, parser.differential)
+    legacy_seconds = time.perf_counter() - start
+
+    extract_years.cache_clear()
+    start = time.perf_counter()
+    for text in paragraphs:
+        parser._should_include(text, True)
+    cold_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(passes - 1):
+        for text in paragraphs:
+            parser._should_include(text, True)
+    warm_seconds = time.perf_counter() - start
+
+    return {
+        "paragraphs": len(paragraphs),
+        "passes": passes,
+        "legacy_seconds": legacy_seconds,
+        "grammar_seconds": cold_seconds + warm_seconds,
+        "grammar_cold_pass_seconds": cold_seconds,
+        "legacy_pass_seconds": legacy_seconds / passes,
+        "speedup": legacy_seconds / (cold_seconds + warm_seconds),
+    }
+
+
+@app.command()
+def run(
+    entries: int = typer.Option(5000, min=3, help="Dated entries in the synthetic CV."),
+    seed: int = typer.Option(0, help="Seeds the corpus and the synthetic CV."),
+    output_dir: Path = typer.Option(RESULTS_DIR, help="Where the JSON results are written."),
+):
+    """
+    Check that the date grammar makes the same inclusion decisions as the original year filter, then time
+    both on a synthetic CV with `entries` dated entries. Exits with an error if any decision differs.
+    """
+    size = CVSize(publications=entries * 2 // 5, grants=entries // 5, presentations=entries * 2 // 5)
+    corpus = build_corpus(size, seed)
+    equivalence = check_equivalence(corpus)
+    # Every instruction of the workflows filters the CV once
+    passes = len(instructions_config.section_instructions) + len(instructions_config.narrative_instructions)
+    timings = benchmark(SyntheticCV(size, seed).paragraphs(), passes)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"entries": entries, "seed": seed, "present_year": datetime.now().year},
+        "equivalence": equivalence,
+        "timings": timings,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output = Path(output_dir, f"date_grammar_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2))
+
+    typer.echo(f"{equivalence['decisions']} inclusion decisions compared, {equivalence['mismatches']} differ")
+    typer.echo(
+        f"{timings['paragraphs']} paragraphs x {timings['passes']} passes: original filter "
+        f"{timings['legacy_seconds']:.3f}s, date grammar {timings['grammar_seconds']:.3f}s "
+        f"(first pass {timings['grammar_cold_pass_seconds']:.3f}s), x{timings['speedup']:.1f}"
+    )
+    typer.echo(f"Results written to {output}")
+    if equivalence["mismatches"]:
+        for example in equivalence["examples"]:
+            typer.echo(f"  differs: {example}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
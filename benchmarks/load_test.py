@@ -0,0 +1,234 @@
+import json
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import typer
+from dateutil.relativedelta import relativedelta
+from synthetic_cv import CVSize, SyntheticCV
+
+from CV_Promoter.cv_cache import load_parsed_cv
+from CV_Promoter.docx_render import render_docx
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.instrumentation import PERCENTILES, percentile
+from CV_Promoter.offline_llm import OfflineChatModel
+from CV_Promoter.workflows import (
+    AnnualReviewDrafter,
+    NarrativePortfolioDrafter,
+    RecommendationLetterDrafter,
+)
+from CV_Promoter_config import api_config, instructions_config
+
+RESULTS_DIR = Path(__file__).parent / "results"
+TABS = ("Annual Review", "Promotion Portfolio", "Recommendation Letter")
+
+app = typer.Typer(help="Simulate concurrent users of the app against the offline chat model.")
+
+
+class RequestResult(NamedTuple):
+    """
+    The outcome of one simulated click of a tab's draft button.
+    """
+
+    tab: str
+    seconds: float
+    first_chunk_seconds: Optional[float]
+    error: Optional[str]
+
+
+def run_tab(tab: str, cv_data: bytes, context: ExecutionContext, user_random: random.Random, render: bool):
+    """
+    The function `run_tab` does what the app does when a user presses the draft button of `tab`: it loads
+    the uploaded CV, runs the workflow (streaming for the portfolio and letter tabs) and renders the .docx.
+
+    Args:
+      tab (str): One of `TABS`.
+      cv_data (bytes): The uploaded .docx file.
+      context (ExecutionContext): The session's execution context.
+      user_random (random.Random): The simulated user's source of choices.
+      render (bool): Whether to render the draft as .docx.
+
+    Returns:
+      The time to the first streamed chunk in seconds, or None for the annual review tab, which does not
+    stream.
+    """
+    start = time.perf_counter()
+    cv_document = load_parsed_cv(cv_data)
+    start_date = datetime.now() - relativedelta(years=5)
+    first_chunk_seconds = None
+    if tab == "Annual Review":
+        section = user_random.choice(list(instructions_config.section_instructions))
+        markdown = AnnualReviewDrafter(section, cv_document, context=context).process().content
+    else:
+        areas = list(instructions_config.narrative_instructions)
+        if tab == "Promotion Portfolio":
+            workflow = NarrativePortfolioDrafter(user_random.choice(areas), start_date, cv_document, context)
+        else:
+            focus_areas = user_random.sample(areas, 2)
+            workflow = RecommendationLetterDrafter(focus_areas, start_date, cv_document, context)
+        for _ in workflow.stream():
+            if first_chunk_seconds is None:
+                first_chunk_seconds = time.perf_counter() - start
+        markdown = workflow.generated_text
+    if render:
+        render_docx(markdown, tab)
+    return first_chunk_seconds
+
+
+def simulate_user(
+    user: int,
+    cv_variants: List[bytes],
+    chat_config,
+    requests_per_user: int,
+    think_seconds: float,
+    use_cache: bool,
+    render: bool,
+) -> List[RequestResult]:
+    """
+    The function `simulate_user` plays one user session: the user uploads one of the CVs and then visits
+    the tabs in turn, pausing for an exponentially distributed think time between requests.
+
+    Args:
+      user (int): The user number, which also seeds the user's choices.
+      cv_variants (List[bytes]): The CVs users choose from.
+      chat_config: The chat model shared by all users.
+      requests_per_user (int): Number of draft requests the user makes.
+      think_seconds (float): Mean pause between requests.
+      use_cache (bool): Whether identical requests may be answered from the response cache.
+      render (bool): Whether drafts are rendered as .docx.
+
+    Returns:
+      The result of each request.
+    """
+    user_random = random.Random(user)
+    cv_data = user_random.choice(cv_variants)
+    context = ExecutionContext(chat_config, use_cache=use_cache)
+    results = []
+    for request in range(requests_per_user):
+        tab = TABS[(user + request) % len(TABS)]
+        start = time.perf_counter()
+        try:
+            first_chunk_seconds = run_tab(tab, cv_data, context, user_random, render)
+            error = None
+        except Exception as exception:
+            first_chunk_seconds, error = None, repr(exception)
+        results.append(RequestResult(tab, time.perf_counter() - start, first_chunk_seconds, error))
+        if think_seconds > 0:
+            time.sleep(user_random.expovariate(1 / think_seconds))
+    return results
+
+
+def summarize(results: List[RequestResult], wall_seconds: float) -> Dict:
+    """
+    The function `summarize` computes throughput, error counts and latency percentiles per tab.
+
+    Args:
+      results (List[RequestResult]): Every request of the run.
+      wall_seconds (float): Duration of the run.
+
+    Returns:
+      The summary, overall and per tab.
+    """
+    by_tab = defaultdict(list)
+    for result in results:
+        by_tab[result.tab].append(result)
+        by_tab["all"].append(result)
+
+    summary = {}
+    for tab, tab_results in by_tab.items():
+        succeeded = [result for result in tab_results if result.error is None]
+        tab_summary = {
+            "requests": len(tab_results),
+            "errors": len(tab_results) - len(succeeded),
+            "throughput_per_second": len(succeeded) / wall_seconds,
+        }
+        for name, values in (
+            ("latency", [result.seconds for result in succeeded]),
+            ("first_chunk", [r.first_chunk_seconds for r in succeeded if r.first_chunk_seconds is not None]),
+        ):
+            for percent in PERCENTILES:
+                tab_summary[f"{name}_p{percent}_s"] = percentile(values, percent) if values else None
+        summary[tab] = tab_summary
+    return summary
+
+
+@app.command()
+def run(
+    users: int = typer.Option(10, min=1, help="Concurrent simulated users."),
+    requests_per_user: int = typer.Option(6, min=1, help="Draft requests per user, cycling through tabs."),
+    think_seconds: float = typer.Option(2.0, help="Mean pause between a user's requests."),
+    cv_variants: int = typer.Option(3, min=1, help="Number of distinct CVs the users upload."),
+    publications: int = typer.Option(300, help="Manuscripts in each synthetic CV."),
+    first_token_median_seconds: float = typer.Option(api_config.OFFLINE_FIRST_TOKEN_MEDIAN_SECONDS),
+    first_token_sigma: float = typer.Option(api_config.OFFLINE_FIRST_TOKEN_SIGMA),
+    tokens_per_second: float = typer.Option(api_config.OFFLINE_TOKENS_PER_SECOND),
+    completion_tokens: int = typer.Option(api_config.OFFLINE_COMPLETION_TOKENS),
+    use_cache: bool = typer.Option(False, help="Answer repeated requests from the response cache."),
+    render: bool = typer.Option(True, help="Render every draft as .docx, as the app does."),
+    output_dir: Path = typer.Option(RESULTS_DIR, help="Where the JSON results are written."),
+):
+    """
+    Simulate `users` concurrent sessions across the three tabs against the offline chat model and report
+    throughput and tail latency.
+    """
+    chat_config = OfflineChatModel(
+        first_token_median_seconds=first_token_median_seconds,
+        first_token_sigma=first_token_sigma,
+        tokens_per_second=tokens_per_second,
+        completion_tokens=completion_tokens,
+    )
+    size = CVSize(publications=publications, grants=publications // 5, presentations=publications)
+    cv_data = [SyntheticCV(size, seed).docx_bytes() for seed in range(cv_variants)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        futures = [
+            executor.submit(
+                simulate_user, user, cv_data, chat_config, requests_per_user, think_seconds, use_cache, render
+            )
+            for user in range(users)
+        ]
+        results = [result for future in futures for result in future.result()]
+    wall_seconds = time.perf_counter() - start
+
+    summary = summarize(results, wall_seconds)
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "settings": {
+            "users": users,
+            "requests_per_user": requests_per_user,
+            "think_seconds": think_seconds,
+            "cv_variants": cv_variants,
+            "publications": publications,
+            "first_token_median_seconds": first_token_median_seconds,
+            "first_token_sigma": first_token_sigma,
+            "tokens_per_second": tokens_per_second,
+            "completion_tokens": completion_tokens,
+            "use_cache": use_cache,
+            "render": render,
+        },
+        "wall_seconds": wall_seconds,
+        "summary": summary,
+        "errors": sorted({result.error for result in results if result.error}),
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output = Path(output_dir, f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2))
+
+    for tab, tab_summary in summary.items():
+        latencies = " ".join(
+            f"p{percent}={tab_summary[f'latency_p{percent}_s'] or 0:.2f}s" for percent in PERCENTILES
+        )
+        typer.echo(
+            f"{tab:<22} {tab_summary['requests']:>5} requests {tab_summary['errors']:>4} errors "
+            f"{tab_summary['throughput_per_second']:.2f}/s  {latencies}"
+        )
+    typer.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    app()
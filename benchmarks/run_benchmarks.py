@@ -0,0 +1,278 @@
+import io
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import typer
+from dateutil.relativedelta import relativedelta
+from docx import Document
+from llm_utils.text_format import convert_markdown_docx
+from synthetic_cv import CVSize, SyntheticCV, filled_review_form
+
+from CV_Promoter.cv_entries import CVEntries
+from CV_Promoter.cv_parsing import CVParser, ParsedCV, extract_years
+from CV_Promoter.docx_render import DocxRenderer
+from CV_Promoter.execution import ExecutionContext
+from CV_Promoter.handler_cache import SearchHandlerCache
+from CV_Promoter.offline_llm import OfflineChatModel
+from CV_Promoter.response_cache import ResponseCache
+from CV_Promoter.workflows import (
+    AnnualReviewDrafter,
+    NarrativePortfolioDrafter,
+    RecommendationLetterDrafter,
+)
+from CV_Promoter_config import config, instructions_config
+
+RESULTS_DIR = Path(__file__).parent / "results"
+# Regressions larger than this fraction of the baseline median are flagged by --compare
+REGRESSION_THRESHOLD = 0.10
+
+app = typer.Typer(help="Benchmark CV parsing, extraction and prompt building on synthetic CVs.")
+
+
+def measure(function: Callable, rounds: int, warmup: int = 1, setup: Optional[Callable] = None) -> Dict:
+    """
+    The function `measure` times repeated calls of `function`.
+
+    Args:
+      function (Callable): The code to time, called without arguments.
+      rounds (int): Number of timed calls.
+      warmup (int): Number of untimed calls made first.
+      setup (Optional[Callable]): Called before every call, outside the timed region, e.g. to clear caches.
+
+    Returns:
+      A dictionary of the median, mean, minimum and maximum time per call in milliseconds.
+    """
+    timings = []
+    for round_number in range(warmup + rounds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        if round_number >= warmup:
+            timings.append(elapsed)
+    return {
+        "rounds": rounds,
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "min_ms": min(timings),
+        "max_ms": max(timings),
+    }
+
+
+def bench_docx_load(docx_data: bytes, rounds: int) -> Dict[str, Dict]:
+    """
+    This function times reading the paragraphs of a .docx file with the streaming reader and with
+    python-docx.
+    """
+    return {
+        "docx_load/streaming_reader": measure(lambda: ParsedCV.from_docx(docx_data), rounds),
+        "docx_load/python_docx": measure(
+            lambda: [paragraph.text for paragraph in Document(io.BytesIO(docx_data)).paragraphs], rounds
+        ),
+    }
+
+
+def bench_extraction(paragraphs, rounds: int) -> Dict[str, Dict]:
+    """
+    This function times `CVParser.extract_text` for every entry of `section_instructions` and
+    `narrative_instructions`. The cold timing builds the section index and year cache from scratch as a
+    newly uploaded CV would; the warm timing reuses them as later requests on the same CV do.
+    """
+    start_year = datetime.now().year - 5
+    warm_parser = CVParser(ParsedCV(paragraphs), start_year)
+    results = {}
+    instruction_groups = {
+        "section": instructions_config.section_instructions,
+        "narrative": instructions_config.narrative_instructions,
+    }
+    for group, instruction_sets in instruction_groups.items():
+        for area, instructions in instruction_sets.items():
+            results[f"extract_text/{group}/{area}/cold"] = measure(
+                lambda: CVParser(ParsedCV(paragraphs), start_year).extract_text(instructions),
+                rounds,
+                setup=extract_years.cache_clear,
+            )
+            results[f"extract_text/{group}/{area}/warm"] = measure(
+                lambda: warm_parser.extract_text(instructions), rounds
+            )
+    return results
+
+
+def bench_date_filter(paragraphs, rounds: int) -> Dict[str, Dict]:
+    """
+    This function times `_is_date_in_range` over every paragraph of the CV, with the year cache cleared
+    before each round, and reports its throughput.
+    """
+    parser = CVParser(ParsedCV(paragraphs), datetime.now().year - 5)
+    result = measure(
+        lambda: [parser._is_date_in_range(text) for text in paragraphs],
+        rounds,
+        setup=extract_years.cache_clear,
+    )
+    result["paragraphs_per_second"] = len(paragraphs) / (result["median_ms"] / 1000)
+    return {"is_date_in_range": result}
+
+
+def bench_entries(paragraphs, rounds: int) -> Dict[str, Dict]:
+    """
+    This function times building the typed entries of the CV, with the years of each paragraph already
+    found, and the queries the review forms are counted with.
+    """
+    present_year = datetime.now().year
+    start_year = present_year - 5
+    parsed_cv = ParsedCV(paragraphs)
+    parsed_cv.paragraph_years(present_year)
+    entries = parsed_cv.entries(present_year)
+    return {
+        "entries/build": measure(lambda: CVEntries(parsed_cv, present_year, parsed_cv.cv_schema), rounds),
+        "entries/publications_since": measure(lambda: entries.since("publication", start_year), rounds),
+        "entries/grants_active": measure(
+            lambda: entries.active("grant", present_year - 1, present_year), rounds
+        ),
+    }
+
+
+def bench_prompt_assembly(docx_data: bytes, rounds: int) -> Dict[str, Dict]:
+    """
+    This function times prompt assembly, and a complete run of each workflow, with the offline chat model
+    so that only our own overhead is measured and no request leaves the machine.
+    """
+    parsed_cv = ParsedCV.from_docx(docx_data, document_loader=lambda: Document(io.BytesIO(docx_data)))
+    # The offline model without simulated latency, so the timings are ours alone
+    chat_config = OfflineChatModel(first_token_median_seconds=0.0, tokens_per_second=float("inf"))
+    start_date = datetime.now() - relativedelta(years=5)
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        context = ExecutionContext(
+            chat_config,
+            use_cache=False,
+            response_cache=ResponseCache(Path(cache_dir, "responses.sqlite")),
+            search_handlers=SearchHandlerCache(),
+        )
+        workflows = {
+            "AnnualReviewDrafter": lambda: AnnualReviewDrafter("Scholarly Activity", parsed_cv, context),
+            "NarrativePortfolioDrafter": lambda: NarrativePortfolioDrafter(
+                "Research", start_date, parsed_cv, context
+            ),
+            "RecommendationLetterDrafter": lambda: RecommendationLetterDrafter(
+                ["Research", "Teaching"], start_date, parsed_cv, context
+            ),
+            "RecommendationLetterDrafter/single_call": lambda: RecommendationLetterDrafter(
+                ["Research", "Teaching"], start_date, parsed_cv, context, per_area=False
+            ),
+        }
+        for name, build in workflows.items():
+            results[f"prompt_assembly/{name}"] = measure(lambda: build()._prepare_prompt(), rounds)
+            results[f"workflow_fake_llm/{name}"] = measure(lambda: build().process(), rounds)
+    return results
+
+
+def bench_docx_render(rounds: int, seed: int) -> Dict[str, Dict]:
+    """
+    This function times rendering filled annual review forms as .docx: through pandoc as the app used to,
+    with the native renderer, and from the render cache.
+    """
+    renderer = DocxRenderer()
+    results = {}
+    for area, instructions in instructions_config.section_instructions.items():
+        markdown = filled_review_form(instructions["form"], seed)
+        results[f"docx_render/{area}/pandoc"] = measure(
+            lambda: convert_markdown_docx(markdown, config.TEMPLATE), rounds
+        )
+        results[f"docx_render/{area}/native"] = measure(lambda: renderer._render_native(markdown), rounds)
+        # The warmup call fills the cache, so every timed call is a hit
+        results[f"docx_render/{area}/cached"] = measure(
+            lambda: renderer.render(markdown, "benchmark"), rounds
+        )
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    """
+    This function returns the current commit, so results can be matched to the code they measured.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict]):
+    """
+    This function prints the change of every median against a baseline run, flagging regressions.
+
+    Args:
+      results (Dict[str, Dict]): The benchmarks of this run.
+      baseline (Dict[str, Dict]): The benchmarks of an earlier run.
+    """
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["median_ms"], result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > REGRESSION_THRESHOLD else ""
+        typer.echo(f"{name:<60} {before:>10.3f} -> {after:>10.3f} ms  {change:+7.1%}{flag}")
+
+
+@app.command()
+def run(
+    publications: int = typer.Option(1000, help="Manuscripts in the synthetic CV."),
+    grants: int = typer.Option(200, help="Grants in the synthetic CV."),
+    presentations: int = typer.Option(1000, help="Presentations in the synthetic CV."),
+    rounds: int = typer.Option(20, min=1, help="Timed calls per benchmark."),
+    seed: int = typer.Option(0, help="Seed of the synthetic CV."),
+    skip_llm: bool = typer.Option(False, help="Skip the prompt assembly and fake model benchmarks."),
+    skip_render: bool = typer.Option(False, help="Skip the .docx rendering benchmarks, which need pandoc."),
+    output_dir: Path = typer.Option(RESULTS_DIR, help="Where the JSON results are written."),
+    baseline: Optional[Path] = typer.Option(None, exists=True, help="Earlier results to compare against."),
+):
+    """
+    Generate a synthetic CV, run every benchmark on it and write the results to a timestamped JSON file.
+    """
+    size = CVSize(publications=publications, grants=grants, presentations=presentations)
+    synthetic_cv = SyntheticCV(size, seed)
+    paragraphs = synthetic_cv.paragraphs()
+    docx_data = synthetic_cv.docx_bytes()
+
+    results = {}
+    results.update(bench_docx_load(docx_data, rounds))
+    results.update(bench_extraction(paragraphs, rounds))
+    results.update(bench_date_filter(paragraphs, rounds))
+    results.update(bench_entries(paragraphs, rounds))
+    if not skip_llm:
+        results.update(bench_prompt_assembly(docx_data, rounds))
+    if not skip_render:
+        results.update(bench_docx_render(rounds, seed))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "cv": dict(size._asdict(), seed=seed, paragraphs=len(paragraphs), docx_bytes=len(docx_data)),
+        "results": results,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output = Path(output_dir, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        compare(results, json.loads(baseline.read_text())["results"])
+    else:
+        for name, result in results.items():
+            typer.echo(f"{name:<60} {result['median_ms']:>10.3f} ms")
+    typer.echo(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    app()
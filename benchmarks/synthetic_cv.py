@@ -0,0 +1,218 @@
+import io
+import random
+import re
+from datetime import datetime
+from typing import List, NamedTuple
+
+from docx import Document
+
+# Section headers of the standardized UAB CV, in the order given in the README
+SECTION_HEADERS = (
+    "PERSONAL INFORMATION",
+    "RANK/TITLE",
+    "HOSPITAL AND OTHER (NON ACADEMIC) APPOINTMENTS:",
+    "PROFESSIONAL CONSULTANTSHIPS:",
+    "EDUCATION:",
+    "MILITARY SERVICE:",
+    "LICENSURE:",
+    "BOARD CERTIFICATION:",
+    "POSTDOCTORAL TRAINING:",
+    "ACADEMIC APPOINTMENTS:",
+    "AWARDS/HONORS",
+    "PROFESSIONAL SOCIETIES:",
+    "MEMBERSHIPS:",
+    "COUNCILS AND COMMITTEES:",
+    "UNIVERSITY ACTIVITIES:",
+    "EDITORIAL BOARD MEMBERSHIPS:",
+    "MAJOR RESEARCH INTERESTS:",
+    "TEACHING EXPERIENCE:",
+    "MAJOR LECTURES AND VISITING PROFESSORSHIPS:",
+    "GRANT SUPPORT",
+    "OTHER:",
+    "BIBLIOGRAPHY:",
+    "MANUSCRIPTS:",
+    "BOOKS:",
+    "Published abstracts",
+    "Poster Exhibits",
+    "Oral Presentations",
+    "MISCELLANEOUS:",
+)
+
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+TOPICS = (
+    "perioperative outcomes",
+    "regional anesthesia",
+    "machine learning for clinical decision support",
+    "postoperative delirium",
+    "enhanced recovery after surgery",
+    "airway management",
+    "critical care sedation",
+    "opioid stewardship",
+)
+JOURNALS = ("Anesthesiology", "Anesth Analg", "Br J Anaesth", "JAMA Surg", "Crit Care Med", "Pain Med")
+AGENCIES = ("NIH/NIA", "NIH/NIGMS", "AHRQ", "PCORI", "FAER", "DoD")
+MEETINGS = ("ASA Annual Meeting", "IARS Annual Meeting", "SCA Annual Meeting", "ASRA Spring Meeting")
+
+
+class CVSize(NamedTuple):
+    """
+    The number of dated entries in each long section of a synthetic CV.
+    """
+
+    publications: int = 1000
+    grants: int = 200
+    presentations: int = 1000
+    entries_per_section: int = 10
+    years_of_service: int = 25
+
+
+class SyntheticCV:
+    """
+    The `SyntheticCV` class generates CVs in the standardized UAB format for benchmarks and load tests.
+    Entries are dated in the formats the parser recognizes (four digit years, MM/DD/YY, MM-YY and
+    "Mon D, YY") spread over the faculty member's career, so that year filtering sees a realistic mix of
+    in-range and out-of-range paragraphs. Generation is deterministic for a given seed.
+    """
+
+    def __init__(self, size: CVSize = CVSize(), seed: int = 0, present_year: int = None):
+        self.size = size
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.present_year = present_year or datetime.now().year
+        self.first_year = self.present_year - size.years_of_service
+
+    def _year(self) -> int:
+        """
+        This function returns a random year of the faculty member's career.
+        """
+        return self.random.randint(self.first_year, self.present_year)
+
+    def _date(self, year: int) -> str:
+        """
+        This function writes a date in `year` in one of the formats found in CVs.
+
+        Args:
+          year (int): The year of the date.
+
+        Returns:
+          The formatted date.
+        """
+        month, day = self.random.randint(1, 12), self.random.randint(1, 28)
+        style = self.random.randrange(5)
+        if style == 0:
+            return str(year)
+        if style == 1:
+            return f"{month:02d}/{day:02d}/{year % 100:02d}"
+        if style == 2:
+            return f"{month:02d}-{year % 100:02d}"
+        if style == 3:
+            return f"{MONTHS[month - 1]} {day}, {year % 100:02d}"
+        return f"{MONTHS[month - 1]} {year}"
+
+    def _publication(self, number: int) -> str:
+        """
+        This function writes a numbered manuscript citation.
+        """
+        year = self._year()
+        author_count = self.random.randint(2, 8)
+        authors = ", ".join(f"Author{self.random.randint(1, 500)} A" for _ in range(author_count))
+        return (
+            f"{number}. {authors}. A study of {self.random.choice(TOPICS)} in "
+            f"{self.random.randint(20, 2000)} patients. {self.random.choice(JOURNALS)}. "
+            f"{year};{self.random.randint(1, 140)}:"
+            f"{self.random.randint(1, 900)}-{self.random.randint(901, 1800)}."
+        )
+
+    def _grant(self) -> str:
+        """
+        This function writes a grant with its dates, agency, amount and role.
+        """
+        start = self._year()
+        end = start + self.random.randint(1, 5)
+        ending = "present" if end >= self.present_year else self._date(end)
+        return (
+            f"{self._date(start)} - {ending} {self.random.choice(AGENCIES)} R01 "
+            f"{self.random.choice(TOPICS).title()} ${self.random.randint(50, 3000) * 1000:,} "
+            f"Role: {self.random.choice(('PI', 'Co-I', 'MPI', 'Co-Investigator'))} "
+            f"{self.random.randint(5, 40)}% effort"
+        )
+
+    def _presentation(self, number: int) -> str:
+        """
+        This function writes a numbered presentation at a meeting.
+        """
+        return (
+            f"{number}. {self.random.choice(TOPICS).capitalize()}: lessons learned. "
+            f"{self.random.choice(MEETINGS)}, {self._date(self._year())}. "
+            f"{self.random.choice(('Oral', 'Poster', 'Invited lecture', 'Workshop'))}."
+        )
+
+    def _entry(self, header: str) -> str:
+        """
+        This function writes a dated entry for any other section.
+        """
+        start = self._year()
+        return f"{self._date(start)} - {self._date(min(start + 3, self.present_year))} {header.title()} entry"
+
+    def paragraphs(self) -> List[str]:
+        """
+        This function generates the paragraph texts of the CV, headers included.
+
+        Returns:
+          The paragraphs in document order. Repeated calls return the same CV.
+        """
+        self.random = random.Random(self.seed)
+        paragraphs = ["University of Alabama at Birmingham", "School of Medicine"]
+        paragraphs.append(f"Date: {self.present_year}")
+        for header in SECTION_HEADERS:
+            paragraphs.append(header)
+            if header == "MAJOR RESEARCH INTERESTS:":
+                paragraphs.append(f"My research focuses on {', '.join(self.random.sample(TOPICS, 3))}.")
+            elif header == "GRANT SUPPORT":
+                paragraphs.extend(self._grant() for _ in range(self.size.grants))
+            elif header == "MANUSCRIPTS:":
+                paragraphs.extend(self._publication(n + 1) for n in range(self.size.publications))
+            elif header == "Oral Presentations":
+                paragraphs.extend(self._presentation(n + 1) for n in range(self.size.presentations))
+            else:
+                paragraphs.extend(self._entry(header) for _ in range(self.size.entries_per_section))
+            paragraphs.append("")
+        return paragraphs
+
+    def docx_bytes(self) -> bytes:
+        """
+        This function generates the CV as a .docx file.
+
+        Returns:
+          The raw bytes of the .docx file.
+        """
+        document = Document()
+        for text in self.paragraphs():
+            document.add_paragraph(text)
+        buffer = io.BytesIO()
+        document.save(buffer)
+        return buffer.getvalue()
+
+
+def filled_review_form(form: str, seed: int = 0, items_per_cell: int = 5) -> str:
+    """
+    The function `filled_review_form` fills an annual review form the way the model does: every
+    placeholder or "Comment" cell becomes a numbered list of entries, and every "Number" a count.
+
+    Args:
+      form (str): A form of `instructions_config.section_instructions`.
+      seed (int): Seed of the generated entries.
+      items_per_cell (int): Number of entries written into each cell.
+
+    Returns:
+      The filled form as markdown.
+    """
+    synthetic_cv = SyntheticCV(seed=seed)
+    entries = (synthetic_cv._publication, lambda number: f"{number}. {synthetic_cv._grant()}")
+
+    def fill(_match) -> str:
+        entry = synthetic_cv.random.choice(entries)
+        return "| " + " ".join(entry(number + 1) for number in range(items_per_cell)) + " |"
+
+    form = re.sub(r"^\|\s*(<.*>|Comment)\s*\|\s*$", fill, form, flags=re.M)
+    return form.replace("Number |", f"{items_per_cell} |")
@@ -25,4 +25,7 @@ setup(
     packages=find_packages(),  # only look in directores with __init__.py
     install_requires=[required_packages],
     extras_require={"dev": docs_packages + style_packages + dev_packages, "docs": docs_packages},
+    entry_points={
+        "console_scripts": ["cv-promoter = CV_Promoter.cli:app", "cv-promoter-api = CV_Promoter.api:server"]
+    },
 )
@@ -1,40 +1,123 @@
 # streamlit_app.py
+import hashlib
+import time
 from datetime import date, datetime, timedelta
 
-from docx import Document
-from langchain_community.callbacks import get_openai_callback
+import httpx
 from llm_utils.streamlit_common import hide_streamlit_branding
-from llm_utils.text_format import convert_markdown_docx
 
 import CV_Promoter_config.config as config
-import CV_Promoter_config.instructions_config as instructions_config
 import streamlit as st
-
-# TODO fix streamlit implementation
-from CV_Promoter.workflows import (
-    AnnualReviewDrafter,
-    NarrativePortfolioDrafter,
-    RecommendationLetterDrafter,
-)
+from CV_Promoter.api_client import DONE, FAILED, APIClient, APIError
 
 this_year = datetime.now().year
 
-# Define the available sections of interest
-sections_of_interest = instructions_config.section_instructions.keys()
-portfolio_sections = instructions_config.narrative_instructions.keys()
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+# How often the page refreshes while a background draft is pending
+JOB_POLL_SECONDS = 3
 
 
-def show_CV_Promoter_page(template_location=config.TEMPLATE):
+def get_api_client():
     """
-    The `show_CV_Promoter_page` function in Python creates a Streamlit page for users to upload a
-    Curriculum Vitae in Word format and generate drafts for Promotion Portfolio, Annual Review, and
-    Recommendation Letter based on the uploaded CV.
+    The `get_api_client` function returns this session's client of the CV Promoter API, built from the
+    chat model provider and API key entered on the Home page. Drafting happens in the API server, so the
+    page itself only uploads the CV, sends requests and shows the results.
+
+    Returns:
+      The session's `APIClient`, or None if the user has not logged in on the Home page.
+    """
+    provider = st.session_state.get("llm_provider")
+    if provider is None:
+        return None
+    credentials = (provider, st.session_state.get("llm_api_key"))
+    if st.session_state.get("api_credentials") != credentials:
+        st.session_state.api_client = APIClient(*credentials)
+        st.session_state.api_credentials = credentials
+    return st.session_state.api_client
+
+
+def offer_download(client, job, label, file_name):
+    """
+    The `offer_download` function shows the outcome of a finished draft: a download button for its .docx,
+    or the reason it failed.
+
+    Args:
+      client: The session's API client.
+      job: The state of the draft's job.
+      label: The label of the download button.
+      file_name: The name of the downloaded file.
+    """
+    if job["status"] == FAILED:
+        st.error(f"The draft failed: {job['error']}")
+        return
+    st.balloons()
+    st.write("Note that once you hit download, this form will reset.")
+    st.download_button(label=label, data=client.docx(job["id"]), file_name=file_name, mime=DOCX_MIME)
+
+
+def submit_background_job(client, workflow, focus, start_date, cv_hash, use_cache):
+    """
+    The `submit_background_job` function queues a draft to run in the background and remembers its job id
+    in the page URL, so the draft can still be collected after a reload or a download resets the page.
 
     Args:
-      template_location: The `template_location` parameter in the `show_CV_Promoter_page` function is
-    used to specify the location of the template file that will be used for generating the output
-    documents (e.g., draft narrative, recommendation letter). This parameter allows you to customize the
-    template used for creating these documents
+      client: The session's API client.
+      workflow: The name of the workflow class.
+      focus: The focus areas of the draft.
+      start_date: The faculty member's start date.
+      cv_hash: The hash of the uploaded CV.
+      use_cache: Whether an earlier draft of the same request may be reused.
+    """
+    job_id = client.submit(workflow, list(focus), start_date, cv_hash, use_cache)
+    st.query_params["job"] = st.query_params.get_all("job") + [job_id]
+    st.info("Your draft is being prepared in the background. It will appear under Background drafts below.")
+
+
+def show_background_jobs(client):
+    """
+    The `show_background_jobs` function lists the background drafts of this page with their status and a
+    download button for each finished one. While any draft is pending the page refreshes itself.
+
+    Args:
+      client: The session's API client.
+    """
+    job_ids = st.query_params.get_all("job")
+    if not job_ids:
+        return
+
+    st.subheader("Background drafts")
+    pending = False
+    for job_id in job_ids:
+        job = client.job(job_id)
+        if job is None:
+            st.write(f"Draft {job_id[:8]} has expired.")
+            continue
+        label = f"{job['workflow']} ({', '.join(job['focus'])})"
+        if job["status"] == DONE:
+            st.download_button(
+                label=f"Download {label}",
+                data=client.docx(job_id),
+                file_name=f"DRAFT_{job['workflow']}_{job_id[:8]}.docx",
+                mime=DOCX_MIME,
+                key=f"download_{job_id}",
+            )
+        elif job["status"] == FAILED:
+            st.error(f"{label} failed: {job['error']}")
+        else:
+            pending = True
+            st.write(f"{label}: {job['status']}...")
+
+    if pending:
+        time.sleep(JOB_POLL_SECONDS)
+        st.rerun()
+
+
+def show_CV_Promoter_page():
+    """
+    The `show_CV_Promoter_page` function in Python creates a Streamlit page for users to upload a
+    Curriculum Vitae in Word format and generate drafts for Promotion Portfolio, Annual Review, and
+    Recommendation Letter based on the uploaded CV. The drafts are prepared by the CV Promoter API at
+    `config.API_URL`, which serves every user of the page.
     """
     # page metadata
     st.set_page_config(page_title="CV Promoter", page_icon="🎓")
@@ -53,15 +136,53 @@ def show_CV_Promoter_page(template_location=config.TEMPLATE):
     """
     )
 
+    client = get_api_client()
+    if client is None:
+        st.warning("Please enter your API key on the Home page first.")
+        st.stop()
+    try:
+        if "focus_areas" not in st.session_state:
+            st.session_state.focus_areas = client.focus_areas()
+    except httpx.HTTPError:
+        st.error(f"The CV Promoter API at {config.API_URL} is not reachable. Please try again later.")
+        st.stop()
+    # Define the available sections of interest
+    sections_of_interest = st.session_state.focus_areas["AnnualReviewDrafter"]
+    portfolio_sections = st.session_state.focus_areas["NarrativePortfolioDrafter"]
+
     # Allow user to upload a Word cv
     uploaded_file = st.file_uploader("Choose a Curriculum Vitae in Microsoft Word format", type="docx")
+    cv_hash = None
+    if uploaded_file is not None:
+        cv_data = uploaded_file.getvalue()
+        # Streamlit reruns this script on every interaction; each file is uploaded to the API once
+        upload_hash = hashlib.sha256(cv_data).hexdigest()
+        if st.session_state.get("upload_hash") != upload_hash:
+            try:
+                # A revision of the previous CV: the API tells what changed. Drafts of sections it did not
+                # touch are reused rather than generated again.
+                upload = client.upload_cv(cv_data, previous_cv_hash=st.session_state.get("cv_hash"))
+            except APIError as error:
+                st.error(error.detail)
+                st.stop()
+            st.session_state.upload_hash = upload_hash
+            st.session_state.cv_hash = upload["cv_hash"]
+            if upload["changes"] is not None:
+                st.session_state.cv_changes = upload["changes"]
+        cv_hash = st.session_state.cv_hash
+        if st.session_state.get("cv_changes"):
+            st.info(f"Changes since your previous upload: {st.session_state.cv_changes}")
+
+    # Identical requests are answered from the response cache unless a fresh draft is requested
+    use_cache = not st.checkbox(
+        "Generate a fresh draft even if this exact request was drafted before", value=False
+    )
 
     tab1, tab2, tab3 = st.tabs(["Promotion Portfolio", "Annual Review", "Recommendation Letter"])
 
     with tab2:
         st.write("Assistant for preparing Annual Review forms.")
         if uploaded_file is not None:
-            cv_document = Document(uploaded_file)
             st.write("CV uploaded successfully!")
             # Create a dropdown for the user to select a section of interest
             section_of_interest = st.selectbox("Select a section of interest:", sections_of_interest)
@@ -69,30 +190,41 @@ def show_CV_Promoter_page(template_location=config.TEMPLATE):
             if st.button("Extract"):
                 # submit prompt
                 with st.spinner("Extracting. This may take a while..."):
-                    with get_openai_callback() as response_meta:
-                        submit_time = datetime.now()
-                        workflow = AnnualReviewDrafter(section_of_interest, cv_document)
-                        generated_response = workflow.process()
-                        response_time = datetime.now()
-                        form_docx_data = convert_markdown_docx(generated_response.content, template_location)
-
-                if form_docx_data:
-                    st.balloons()
-                    st.write("Note that once you hit download, this form will reset.")
-
-                    st.download_button(
-                        label="Download form draft",
-                        data=form_docx_data,
-                        file_name="DRAFT_filled_form.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # correct MIME type for docx
-                    )
+                    try:
+                        job_id = client.submit(
+                            "AnnualReviewDrafter", [section_of_interest], date.today(), cv_hash, use_cache
+                        )
+                        job = client.wait(job_id)
+                    except APIError as error:
+                        st.error(error.detail)
+                        job = None
+                if job is not None:
+                    offer_download(client, job, "Download form draft", "DRAFT_filled_form.docx")
+
+            st.write("Or draft every section of the review at once.")
+            if st.button("Draft all sections in the background"):
+                submit_background_job(
+                    client, "AnnualReviewDrafter", sections_of_interest, date.today(), cv_hash, use_cache
+                )
+            if st.button("Draft all sections"):
+                # the API drafts one prompt per section concurrently
+                with st.spinner("Drafting all sections. This may take a while..."):
+                    try:
+                        job_id = client.submit(
+                            "AnnualReviewDrafter", sections_of_interest, date.today(), cv_hash, use_cache
+                        )
+                        job = client.wait(job_id)
+                    except APIError as error:
+                        st.error(error.detail)
+                        job = None
+                if job is not None:
+                    offer_download(client, job, "Download full review draft", "DRAFT_annual_review.docx")
         else:
             st.write("Please upload a Word Document (.docx) CV to proceed.")
 
     with tab1:
         st.write("Get a draft of a narrative section of your Promotion and Tenure portfolio.")
         if uploaded_file is not None:
-            cv_document = Document(uploaded_file)
             st.write("CV uploaded successfully!")
             # Create a dropdown for the user to select a section of interest
             section_of_interest = st.selectbox("Select a section of interest:", portfolio_sections)
@@ -103,31 +235,29 @@ def show_CV_Promoter_page(template_location=config.TEMPLATE):
                 min_value=datetime.now() + timedelta(weeks=-2600),
             )
 
-            if selected_date:
-                start_year = selected_date.year
+            if st.button("Draft narrative in the background"):
+                submit_background_job(
+                    client,
+                    "NarrativePortfolioDrafter",
+                    [section_of_interest],
+                    selected_date,
+                    cv_hash,
+                    use_cache,
+                )
 
             if st.button("Draft narrative"):
-                # submit prompt
-                with st.spinner("Drafting. This may take a while..."):
-                    with get_openai_callback() as response_meta:
-                        submit_time = datetime.now()
-                        workflow = NarrativePortfolioDrafter(section_of_interest, selected_date, cv_document)
-                        generated_response = workflow.process()
-                        response_time = datetime.now()
-                        portfolio_docx_data = convert_markdown_docx(
-                            generated_response.content, template_location
-                        )
-
-                if portfolio_docx_data:
-                    st.balloons()
-                    st.write("Note that once you hit download, this form will reset.")
-
-                    st.download_button(
-                        label="Download narrative draft",
-                        data=portfolio_docx_data,
-                        file_name="DRAFT_portfolio_section.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # correct MIME type for docx
+                # submit prompt and render the draft as it is generated
+                try:
+                    draft = client.stream(
+                        "NarrativePortfolioDrafter", [section_of_interest], selected_date, cv_hash, use_cache
                     )
+                    st.write_stream(draft)
+                    job = client.wait(draft.job_id, poll_seconds=0.5)
+                except APIError as error:
+                    st.error(error.detail)
+                    job = None
+                if job is not None:
+                    offer_download(client, job, "Download narrative draft", "DRAFT_portfolio_section.docx")
 
         else:
             st.write("Please upload a Word Document (.docx) CV to proceed.")
@@ -135,7 +265,6 @@ def show_CV_Promoter_page(template_location=config.TEMPLATE):
     with tab3:
         st.write("Get a draft recommendation letter for a colleague.")
         if uploaded_file is not None:
-            cv_document = Document(uploaded_file)
             st.write("CV uploaded successfully!")
             # Create a dropdown for the user to select a section of interest
             areas_of_excellence = st.multiselect(
@@ -157,34 +286,35 @@ def show_CV_Promoter_page(template_location=config.TEMPLATE):
                 "***Double check the date.*** It is most important that the year be correct. If using the calendar tool, the last date selected will be inserted into the blank."
             )
 
-            if st.button("Draft letter"):
-                # submit prompt
-                with st.spinner("Drafting. This may take a while..."):
-                    with get_openai_callback() as response_meta:
-                        submit_time = datetime.now()
-                        workflow = RecommendationLetterDrafter(
-                            areas_of_excellence, selected_date, cv_document
-                        )
-                        generated_response = workflow.process()
-                        response_time = datetime.now()
-                        portfolio_docx_data = convert_markdown_docx(
-                            generated_response.content, template_location
-                        )
-
-                if portfolio_docx_data:
-                    st.balloons()
-                    st.write("Note that once you hit download, this form will reset.")
-
-                    st.download_button(
-                        label="Download letter draft",
-                        data=portfolio_docx_data,
-                        file_name="DRAFT_recommendation_letter.docx",
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",  # correct MIME type for docx
+            if st.button("Draft letter in the background") and 1 <= len(areas_of_excellence) <= 2:
+                submit_background_job(
+                    client,
+                    "RecommendationLetterDrafter",
+                    areas_of_excellence,
+                    selected_date,
+                    cv_hash,
+                    use_cache,
+                )
+
+            if st.button("Draft letter") and 1 <= len(areas_of_excellence) <= 2:
+                # submit prompt and render the draft as it is generated
+                try:
+                    draft = client.stream(
+                        "RecommendationLetterDrafter", areas_of_excellence, selected_date, cv_hash, use_cache
                     )
+                    st.write_stream(draft)
+                    job = client.wait(draft.job_id, poll_seconds=0.5)
+                except APIError as error:
+                    st.error(error.detail)
+                    job = None
+                if job is not None:
+                    offer_download(client, job, "Download letter draft", "DRAFT_recommendation_letter.docx")
 
         else:
             st.write("Please upload a Word Document (.docx) CV to proceed.")
 
+    show_background_jobs(client)
+
 
 if __name__ == "__main__":
     show_CV_Promoter_page()
@@ -25,11 +25,11 @@ def log_in():
     import CV_Promoter_config.config as config
 
     if api_key_type == "Azure":
-        key_handler = AzureKeyHandler(api_config.AZURE_CHAT_CONFIG)
+        key_handler = AzureKeyHandler(api_config.get_chat_config("Azure", api_key))
         initialized = key_handler.initialize_api_key(api_key, api_config.AZURE_END_POINT)
 
     elif api_key_type == "OpenAI":
-        key_handler = OpenaiKeyHandler(api_config.OPENAI_CHAT_CONFIG)
+        key_handler = OpenaiKeyHandler(api_config.get_chat_config("OpenAI", api_key))
         initialized = key_handler.initialize_api_key(api_key, api_config.OPENAI_END_POINT)
 
     else:
@@ -39,13 +39,26 @@ def log_in():
     if initialized:
         st.session_state.logged_in = True
         st.session_state.chat_config = key_handler.get_chat_function()
+        # Drafts are made by the CV Promoter API, which receives the provider and key with each request
+        st.session_state.llm_provider = api_key_type
+        st.session_state.llm_api_key = api_key
 
 
 if not st.session_state["logged_in"]:
     st.title("Bring your own key")
 
-    api_key_type = st.selectbox("Select the type of your API key", ("OpenAI", "Azure"))
-    api_key = st.text_input("Enter your API key", key="api_key", type="password", on_change=log_in)
+    # The offline stand-in model is for development only; it is offered when CV_PROMOTER_ENABLE_OFFLINE is set
+    api_key_types = ("OpenAI", "Azure", "Offline") if api_config.ENABLE_OFFLINE else ("OpenAI", "Azure")
+    api_key_type = st.selectbox("Select the type of your API key", api_key_types)
+    if api_key_type == "Offline":
+        # Local stand-in model for development and load testing; drafts are placeholders
+        if st.button("Continue with the offline model"):
+            st.session_state.logged_in = True
+            st.session_state.chat_config = api_config.get_chat_config("Offline")
+            st.session_state.llm_provider = "Offline"
+            st.rerun()
+    else:
+        api_key = st.text_input("Enter your API key", key="api_key", type="password", on_change=log_in)
 
 else:
     st.title("Home")